@@ -1,6 +1,17 @@
-from flask import Flask, request, jsonify
+import os
+import json
+import time
+from flask import Flask, request, jsonify, Response
 import trade_worker
 import logging
+import threading
+from state_store import create_state_store
+from trade_journal import JOURNAL_ENABLED, secrets_recoverable
+import trade_recovery
+import batch_worker
+import metrics
+from log_pipeline import log_pipeline
+import shard_supervisor
 
 app = Flask(__name__)
 
@@ -9,6 +20,49 @@ app = Flask(__name__)
 # ==============================
 trade_statuses = {}
 
+# SHARD_COUNT > 0: 매매는 user_id 해시로 샤드 프로세스들에서 실행, 이 프로세스는 라우팅만(gunicorn 워커 1개로 운영)
+# - 샤드 감독자가 상태저장소 역할(조회/중단/long-poll 을 소유 샤드로 전달), 재시작 복구도 샤드별로
+# - 샤드 기동(복구 포함)은 gunicorn 부팅 타임아웃보다 길 수 있어 백그라운드로, 다 뜨기 전 요청은 "샤드 없음" 응답
+# - 감독자는 저널 경로당 1개만 뜸(두 번째 워커는 부팅 실패) → Procfile 이 워커를 1개로 고정
+# - 샤드 장애 시 인수에 저널의 API 시크릿이 필요하므로 JOURNAL_SECRET_KEY 가 없으면 기동 거부
+if shard_supervisor.SHARD_COUNT:
+    state_store = shard_supervisor.supervisor
+else:
+    # 여러 gunicorn 워커가 공유하는 상태 저장소(STATE_BACKEND=sqlite, WEB_CONCURRENCY>1 이면 기본), 워커 1개면 프로세스 내 딕셔너리
+    # - 매매는 claim에 성공한 프로세스 1곳에서만 실행, 조회/중단은 어느 워커로 와도 저장소를 통해 처리
+    state_store = create_state_store(trade_statuses)
+    trade_worker.attach_state_store(state_store, trade_statuses)
+
+_started = False
+
+def startup():
+    """
+    서버 기동 작업(샤드 기동 또는 재시작 복구), 프로세스당 1회
+    - import 만으로는 실행하지 않음(테스트/벤치마크가 저널 파일을 만들거나 거래소를 호출하지 않도록)
+    """
+    global _started
+    if _started:
+        return
+    _started = True
+    if JOURNAL_ENABLED and not secrets_recoverable():
+        logging.error("[저널] JOURNAL_SECRET_KEY 미설정(또는 pycryptodome 없음): API 시크릿을 기록하지 않아 "
+                      "재시작 시 진행 중인 매매를 복구할 수 없습니다")
+    if shard_supervisor.SHARD_COUNT:
+        shard_supervisor.supervisor.start_background()
+    elif trade_recovery.RECOVER_ON_START:
+        # 재시작 시 저널에 남은 매매 복구(거래소 대조 포함, 서버 기동을 막지 않도록 백그라운드)
+        threading.Thread(
+            target=trade_recovery.recover_trades, args=(trade_statuses, state_store.claim),
+            name="trade-recovery", daemon=True
+        ).start()
+
+def create_app():
+    """
+    gunicorn 진입점(Procfile: "api_server:create_app()"), 워커마다 기동 작업 후 app 반환
+    """
+    startup()
+    return app
+
 # ==============================
 # 2. 매매 시작 API (POST)
 # ==============================
@@ -31,9 +85,13 @@ def start_trade():
     stop_loss = data.get("stop_loss")
     immediate = data.get("immediate", False)
 
-    # 이미 해당 user_id로 매매 중이면 거부
-    if trade_statuses.get(user_id, {}).get("running"):
-        return jsonify({"success": False, "msg": "이미 매매 중입니다.", "info": trade_statuses[user_id]["info"]})
+    if shard_supervisor.SHARD_COUNT:
+        return jsonify(shard_supervisor.supervisor.start_trade(user_id, data))
+
+    # 이미 해당 user_id로 매매 중이면 거부(다른 워커 프로세스 포함)
+    if not state_store.claim(user_id):
+        current = state_store.get(user_id) or {}
+        return jsonify({"success": False, "msg": "이미 매매 중입니다.", "info": current.get("info", {})})
 
     # 쓰레드 시작시 user_id, trade_statuses 전체 딕셔너리 전달
     ok, msg = trade_worker.start_trade_thread(
@@ -52,21 +110,159 @@ def start_trade():
     )
     return jsonify({"success": ok, "msg": msg, "info": trade_statuses.get(user_id, {}).get("info", {})})
 
+# ==============================
+# 2-1. 묶음(여러 심볼) 매매 시작 API (POST)
+# ==============================
+@app.route("/start_trades", methods=["POST"])
+def start_trades():
+    """
+    legs: [{"symbol", "position_type", "fixed_loss", "take_profit"(선택)}, ...]
+    - 같은 진입/청산 시각에 모든 다리를 동시에 발사, 다리별 상태는 /trade_status?user_id=<user_id>#<n>
+    """
+    data = request.json or {}
+
+    user_id = data.get("user_id")
+    api_key = data.get("api_key")
+    api_secret = data.get("api_secret")
+    if not user_id or not api_key or not api_secret:
+        return jsonify({"success": False, "msg": "user_id, API 키/시크릿 입력 필요"})
+
+    legs = data.get("legs")
+    err = batch_worker.validate_legs(legs)
+    if err:
+        return jsonify({"success": False, "msg": err})
+    entry_time = data.get("entry_time")
+    exit_time = data.get("exit_time")
+    immediate = data.get("immediate", False)
+
+    if shard_supervisor.SHARD_COUNT:
+        return jsonify(shard_supervisor.supervisor.start_trades(user_id, data))
+
+    if not state_store.claim(user_id):
+        current = state_store.get(user_id) or {}
+        return jsonify({"success": False, "msg": "이미 매매 중입니다.", "info": current.get("info", {})})
+    busy = batch_worker.claim_legs(state_store, user_id, len(legs))
+    if busy is not None:
+        state_store.release(user_id)
+        return jsonify({"success": False, "msg": f"이미 매매 중인 다리가 있습니다: {busy}"})
+    leg_ids = [batch_worker.leg_id(user_id, i) for i in range(len(legs))]
+
+    ok, msg = batch_worker.start_batch_thread(
+        user_id=user_id,
+        trade_statuses=trade_statuses,
+        api_key=api_key,
+        api_secret=api_secret,
+        legs=legs,
+        entry_time=entry_time,
+        exit_time=exit_time,
+        immediate=immediate
+    )
+    return jsonify({"success": ok, "msg": msg, "legs": leg_ids})
+
 # ==============================
 # 3. 매매 상태 확인 API (GET)
 # ==============================
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "32"))            # Procfile --threads 와 같은 값(대기 요청 상한 기준)
+STATUS_MAX_WAIT_SEC = float(os.getenv("STATUS_MAX_WAIT_SEC", "25"))   # long-poll 최대 대기
+# 동시 long-poll 상한(넘으면 기다리지 않고 바로 응답), 기본은 쓰레드의 1/4
+STATUS_MAX_WAITERS = int(os.getenv("STATUS_MAX_WAITERS", str(max(1, GUNICORN_THREADS // 4))))
+
+class HeldSlots:
+    """
+    쓰레드를 오래 붙잡는 요청(long-poll/SSE) 동시 개수 상한
+    - gthread 워커의 쓰레드(GUNICORN_THREADS)가 전부 대기에 묶여 일반 API가 멈추지 않도록
+    """
+
+    def __init__(self, kind, limit):
+        self.kind = kind
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.used >= self.limit:
+                held_rejected.inc((self.kind,))
+                return False
+            self.used += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.used -= 1
+
+held_rejected = metrics.registry.counter("held_requests_rejected_total", "상한 초과로 대기하지 못한 요청 수(kind=long_poll|sse)",
+                                         ("kind",))
+
+# 프로세스 공용 인스턴스
+status_waiters = HeldSlots("long_poll", STATUS_MAX_WAITERS)
+
+# 기본(compact) 응답에서 빼는 거래소 원본 응답들(view=full 일 때만 포함)
+RAW_INFO_KEYS = ("entry_order", "tp_order", "sl_order", "exit_order")
+
+def compact_info(info):
+    return {k: v for k, v in list(info.items()) if k not in RAW_INFO_KEYS}
+
+def status_etag(version, view):
+    return f'"{state_store.epoch}.{version}.{view}"'
+
+def known_version(if_none_match, view):
+    """
+    If-None-Match 의 ETag가 현재 epoch/view 것이면 그 버전 반환
+    """
+    tag = (if_none_match or "").split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    parts = tag.strip('"').split(".")
+    if len(parts) != 3 or parts[0] != state_store.epoch or parts[2] != view:
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
 @app.route("/trade_status")
 def get_trade_status():
+    """
+    - 응답마다 version + ETag, If-None-Match 일치 시 304(본문 없음)
+    - wait=초: 알고 있는 버전에서 바뀔 때까지(최대 STATUS_MAX_WAIT_SEC) 대기 후 응답(long-poll)
+    - view=full 이면 거래소 원본 주문응답 포함
+    """
     user_id = request.args.get("user_id")
     if not user_id:
         return jsonify({"success": False, "msg": "user_id 필요"})
+    view = "full" if request.args.get("view") == "full" else "compact"
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0.0), STATUS_MAX_WAIT_SEC)
+    except ValueError:
+        wait = 0.0
 
-    user_status = trade_statuses.get(user_id, {})
-    return jsonify({
+    known = known_version(request.headers.get("If-None-Match"), view)
+    if wait and known is not None and status_waiters.try_acquire():
+        try:
+            user_status = state_store.wait(user_id, known, wait) or {}
+        finally:
+            status_waiters.release()
+    else:
+        user_status = state_store.get(user_id) or {}
+
+    version = user_status.get("version", 0)
+    etag = status_etag(version, view)
+    if known == version:
+        return "", 304, {"ETag": etag}
+
+    info = user_status.get("info")
+    if info is not None and view == "compact":
+        info = compact_info(info)
+    response = jsonify({
         "running": user_status.get("running"),
-        "info": user_status.get("info"),
-        "error": user_status.get("error")
+        "info": info,
+        "error": user_status.get("error"),
+        "version": version
     })
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 # ==============================
 # 4. 잔고 조회 API (GET)
@@ -91,11 +287,13 @@ def stop_trade():
     user_id = data.get("user_id")
     api_key = data.get("api_key")
     api_secret = data.get("api_secret")
-    logging.info(f"[LOG] /stop_trade 호출됨 (user_id={user_id})")
+    logging.info("[LOG] /stop_trade 호출됨 (user_id=%s)", user_id)
 
-    # 해당 유저의 상태만 변경
+    # 해당 유저의 상태만 변경(이 프로세스 소유가 아니면 소유 프로세스에 중단 요청 전달)
     if user_id in trade_statuses:
-        trade_statuses[user_id]["running"] = False
+        trade_worker.request_stop(trade_statuses, user_id)
+    else:
+        state_store.request_stop(user_id)
 
         # try:
         #     symbol = trade_statuses[user_id]["info"].get("symbol")
@@ -108,7 +306,203 @@ def stop_trade():
     return jsonify({"success": True, "msg": "매매 중단 및 포지션 강제 종료 요청됨."})
 
 # ==============================
-# 6. 메인
+# 6. 거래소 시계 동기화 상태 API (GET)
+# ==============================
+@app.route("/clock_status")
+def clock_status():
+    from entry_dispatcher import entry_dispatcher
+    return jsonify({
+        "clock": trade_worker.clock_sync.stats(),
+        "scheduler": trade_worker.scheduler.stats(),
+        "entry_dispatcher": entry_dispatcher.stats()
+    })
+
+# ==============================
+# 7. 세션 풀 상태 API (GET)
+# ==============================
+@app.route("/pool_status")
+def pool_status():
+    return jsonify(trade_worker.session_pool.stats())
+
+# ==============================
+# 8. 호출량 제한(버킷) 상태 API (GET)
+# ==============================
+@app.route("/rate_limits")
+def rate_limits():
+    return jsonify(trade_worker.rate_limiter.stats())
+
+# ==============================
+# 9. 재시작 복구/저널 상태 API (GET)
+# ==============================
+@app.route("/recovery_status")
+def recovery_status():
+    return jsonify({
+        "recovery": trade_recovery.last_report,
+        "journal": trade_recovery.journal.stats()
+    })
+
+# ==============================
+# 10. 실시간 매매 이벤트 스트림 API (GET, Server-Sent Events)
+# ==============================
+SSE_KEEPALIVE_SEC = float(os.getenv("SSE_KEEPALIVE_SEC", "15"))
+SSE_MAX_STREAM_SEC = float(os.getenv("SSE_MAX_STREAM_SEC", "600"))   # 연결 재활용(클라이언트가 Last-Event-ID로 이어받음)
+# 동시 스트림 상한(넘으면 503 + Retry-After), 기본은 쓰레드의 1/2 → long-poll 과 합쳐도 1/4 은 일반 API 용으로 남음
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", str(max(1, GUNICORN_THREADS // 2))))
+SSE_RETRY_AFTER_SEC = int(os.getenv("SSE_RETRY_AFTER_SEC", "5"))
+
+# 프로세스 공용 인스턴스
+sse_streams = HeldSlots("sse", SSE_MAX_STREAMS)
+
+# (이벤트 이름, 값이 처음 생기면 발생으로 보는 info 필드)
+TRADE_TRANSITIONS = (
+    ("armed", "armed_at"),
+    ("entered", "entry_at"),
+    ("tp_placed", "tp_order_id"),
+    ("sl_placed", "sl_order"),
+    ("exited", "exit_at"),
+)
+
+def status_transitions(prev, cur):
+    """
+    이전/현재 상태 비교로 그 사이 일어난 전이 목록 생성(버전이 여러 개 건너뛰어도 빠짐없이)
+    """
+    prev_info = prev.get("info") or {}
+    info = cur.get("info") or {}
+    events = []
+    for name, field in TRADE_TRANSITIONS:
+        if info.get(field) is not None and prev_info.get(field) is None:
+            value = True if field in RAW_INFO_KEYS else info.get(field)
+            events.append((name, {"symbol": info.get("symbol"), field: value}))
+    if cur.get("error") and cur.get("error") != prev.get("error"):
+        events.append(("error", {"error": cur.get("error")}))
+    if prev.get("running") and not cur.get("running"):
+        events.append(("stopped", {"symbol": info.get("symbol")}))
+    return events
+
+def event_id(version):
+    # 재시작하면 버전이 0부터 다시 시작하므로 epoch 포함
+    return f"{state_store.epoch}.{version}"
+
+def resume_version(last_event_id):
+    """
+    Last-Event-ID 가 현재 epoch 것이면 클라이언트가 마지막으로 받은 상태 버전 반환
+    """
+    epoch, _, version = (last_event_id or "").strip().rpartition(".")
+    if epoch != state_store.epoch:
+        return None
+    try:
+        return int(version)
+    except ValueError:
+        return None
+
+def sse_message(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.route("/trade_events")
+def trade_events():
+    """
+    - 연결 직후 현재 상태(status) 1회, 이후 상태 버전이 바뀔 때마다 전이 이벤트 + status 전송
+    - 변화가 없으면 SSE_KEEPALIVE_SEC마다 주석 줄로 연결 유지
+    - Last-Event-ID(epoch.버전)가 현재 버전이면 status 를 다시 보내지 않고 이어서 대기,
+      그 사이 버전이 바뀌었으면 현재 status 부터 다시(놓친 전이는 status 에 반영돼 있음)
+    - 동시 스트림이 SSE_MAX_STREAMS 이상이면 503(클라이언트는 Retry-After 동안 /trade_status long-poll 로 대신 조회 후 재연결)
+    """
+    user_id = request.args.get("user_id")
+    if not user_id:
+        return jsonify({"success": False, "msg": "user_id 필요"})
+    if not sse_streams.try_acquire():
+        return jsonify({"success": False, "msg": "실시간 연결이 많습니다. 잠시 후 다시 연결하세요."}), 503, \
+            {"Retry-After": str(SSE_RETRY_AFTER_SEC)}
+    resume = resume_version(request.headers.get("Last-Event-ID"))
+
+    def stream():
+        ends_at = time.monotonic() + SSE_MAX_STREAM_SEC
+        prev = None
+        version = None
+        user_status = state_store.get(user_id) or {}
+        yield "retry: 2000\n\n"
+        if resume is not None and resume == user_status.get("version", 0):
+            prev = {**user_status, "info": dict(user_status.get("info") or {})}
+            version = resume
+            user_status = state_store.wait(user_id, version, SSE_KEEPALIVE_SEC) or {}
+        while time.monotonic() < ends_at:
+            current = user_status.get("version", 0)
+            if current != version:
+                if prev is not None:
+                    for event, data in status_transitions(prev, user_status):
+                        yield sse_message(event, data)
+                info = user_status.get("info")
+                yield sse_message("status", {
+                    "running": user_status.get("running"),
+                    "info": compact_info(info) if info is not None else None,
+                    "error": user_status.get("error"),
+                    "version": current
+                }, event_id(current))
+                prev = {**user_status, "info": dict(info or {})}
+                version = current
+            else:
+                yield ": keepalive\n\n"
+            user_status = state_store.wait(user_id, version, SSE_KEEPALIVE_SEC) or {}
+
+    response = Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    # 스트림이 한 번도 시작되지 않고 끊겨도 슬롯 반환
+    response.call_on_close(sse_streams.release)
+    return response
+
+# ==============================
+# 11. Prometheus 지표 API (GET)
+# ==============================
+# 게이지/누적 카운터는 조회 시점에만 계산(매매 경로에는 부담 없음)
+def _engine_active():
+    if trade_worker.TRADE_ENGINE != "async":
+        return 0
+    from async_engine import engine
+    return engine.active
+
+def _dispatcher_pending():
+    from entry_dispatcher import entry_dispatcher
+    return entry_dispatcher.stats()["pending_tickets"]
+
+def _balance_lookups():
+    stats = trade_worker.balance_cache.stats()
+    return [((k,), stats[k]) for k in ("hits", "fetches", "coalesced", "pushes")]
+
+metrics.registry.gauge("trades_running", "이 프로세스에서 실행 중인 매매 수",
+                       lambda: sum(1 for s in list(trade_statuses.values()) if s.get("running")))
+metrics.registry.gauge("process_threads", "프로세스 쓰레드 수", threading.active_count)
+metrics.registry.gauge("async_engine_active", "asyncio 엔진 실행 중 매매 수", _engine_active)
+metrics.registry.gauge("session_pool_sessions", "세션 풀 세션 수(state=all|leased)",
+                       lambda: [(("all",), trade_worker.session_pool.stats()["size"]),
+                                (("leased",), trade_worker.session_pool.stats()["leased"])], ("state",))
+metrics.registry.gauge("scheduler_pending_jobs", "마감 스케줄러 대기 작업 수",
+                       lambda: trade_worker.scheduler.stats()["pending"])
+metrics.registry.gauge("entry_dispatcher_pending_tickets", "진입 디스패처 대기 티켓 수", _dispatcher_pending)
+metrics.registry.gauge("clock_offset_seconds", "거래소 시계 - 로컬 시계", lambda: trade_worker.clock_sync.offset)
+metrics.registry.counter_fn("balance_cache_lookups_total", "잔고 캐시 누적 조회(result=hits|fetches|coalesced|pushes)",
+                            _balance_lookups, ("result",))
+metrics.registry.gauge("held_requests", "쓰레드를 점유 중인 대기 요청 수(kind=long_poll|sse)",
+                       lambda: [(("long_poll",), status_waiters.used), (("sse",), sse_streams.used)], ("kind",))
+metrics.registry.gauge("log_queue_depth", "파일 기록 대기 중인 로그 수", lambda: log_pipeline.stats()["queued"])
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+# ==============================
+# 12. 샤드(매매 워커 프로세스) 상태 API (GET)
+# ==============================
+@app.route("/shard_status")
+def shard_status():
+    if not shard_supervisor.SHARD_COUNT:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **shard_supervisor.supervisor.stats()})
+
+# ==============================
+# 13. 메인
 # ==============================
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000)
+    create_app().run(host="0.0.0.0", port=8000)
@@ -0,0 +1,103 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import trade_worker as tw
+
+# === asyncio 매매 엔진(매매당 코루틴 1개, 이벤트 루프 1개) ===
+ASYNC_IO_WORKERS = int(os.getenv("ASYNC_IO_WORKERS", "64"))   # pybit 호출을 돌릴 쓰레드 수 상한
+
+
+class _LoopEvent:
+    """
+    다른 쓰레드(스케줄러/WebSocket)에서 asyncio.Event를 set 하기 위한 어댑터
+    - trade_worker._wake_events / PositionWatch.wake 와 같은 set() 인터페이스
+    """
+    __slots__ = ("loop", "event")
+
+    def __init__(self, loop, event):
+        self.loop = loop
+        self.event = event
+
+    def set(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+class AsyncTradeEngine:
+    """
+    - 전용 쓰레드에서 이벤트 루프 1개를 돌리고 매매마다 코루틴 1개 실행
+    - 블로킹 pybit 호출은 크기가 제한된 쓰레드풀로 넘김(대기 중인 매매는 쓰레드를 점유하지 않음)
+    - 단계별 로직/상태 기록은 trade_worker.TradeRun 을 그대로 사용(쓰레드 엔진과 같은 코드, 대기 방식만 다름)
+    """
+
+    def __init__(self, io_workers=ASYNC_IO_WORKERS):
+        self.io_workers = io_workers
+        self.loop = None
+        self.executor = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.executor = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="async-io")
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="trade-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def submit(self, **kwargs):
+        """
+        start_trade_thread 와 같은 인자로 매매 코루틴 시작
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._run_trade(**kwargs), self.loop)
+
+    async def _io(self, fn, *args, **kwargs):
+        return await self.loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    async def _run_trade(self, **kwargs):
+        """
+        단계 처리는 trade_worker.TradeRun(쓰레드 엔진과 공용), 블로킹 단계는 쓰레드풀에서 실행하고 대기만 루프에서
+        """
+        wake_event = asyncio.Event()
+        run = tw.TradeRun(**kwargs)
+        self.active += 1
+        try:
+            # 스케줄러/디스패처/WebSocket 쓰레드가 루프 쪽 이벤트를 set
+            await self._io(run.setup, _LoopEvent(self.loop, wake_event))
+            while True:
+                wake_event.clear()
+                timeout = await self._io(run.step)
+                if timeout is run.DONE:
+                    break
+                await self._wait(wake_event, timeout)
+        except Exception as e:
+            await self._io(run.fail, e)
+        finally:
+            await self._io(run.cleanup)
+            self.active -= 1
+
+    @staticmethod
+    async def _wait(event, timeout):
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def stats(self):
+        return {"active": self.active, "io_workers": self.io_workers}
+
+
+# 프로세스 공용 인스턴스
+engine = AsyncTradeEngine()
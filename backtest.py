@@ -0,0 +1,396 @@
+"""
+stop_loss_calc 전략 백테스트(NumPy 벡터화): 모든 진입 시각 × 파라미터 조합을 한 번에 계산
+
+    python backtest.py --symbols BTCUSDT,ETHUSDT --days 365 --tick-offsets 3,5,8 \\
+        --fallback-pcts 0.005,0.01,0.015 --tp-ratios 0.01,0.02,0.03 --hold-bars 28 --out trades.csv
+
+- 손절가: get_long_stop_loss/get_short_stop_loss 와 같은 규칙(직전 마감 캔들 5개의 2차 지지/저항선 ± 틱, 최대 fallback_pct)
+- 수량: trade_worker 와 같은 고정손실 기준(fixed_loss / |진입가 - 손절가|, 최소수량/수량단위 내림)
+- 익절: 진입 수량의 절반을 지정가로(trade_worker.place_tp_limit_order), 나머지는 손절 또는 청산 시각까지 보유
+- 진입가: 진입 캔들 시가, 같은 캔들에서 손절/익절 모두 닿으면 손절 먼저(보수적)
+"""
+import os
+import csv
+import time
+import argparse
+import threading
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from stop_loss_calc import get_long_stop_loss, get_short_stop_loss
+from market_data import LEVEL_WINDOW
+
+BACKTEST_CHUNK_CELLS = int(os.getenv("BACKTEST_CHUNK_CELLS", "8000000"))  # 진입×보유캔들×조합 한 번에 계산할 칸 수
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))  # 심볼/방향 동시 계산 수(NumPy 연산은 GIL 해제)
+TAKER_FEE = 0.00055
+MAKER_FEE = 0.0002
+KST_OFFSET_SEC = 9 * 3600
+
+# 청산 사유
+EXIT_TIME, EXIT_SL, EXIT_TP_SL, EXIT_TP_TIME = 0, 1, 2, 3
+EXIT_REASONS = ("time", "sl", "tp+sl", "tp+time")
+
+
+def param_grid(tick_offsets, fallback_pcts, tp_ratios):
+    """
+    (tick_offset, fallback_pct, take_profit_ratio) 조합 → 컬럼별 배열
+    """
+    combos = list(product(tick_offsets, fallback_pcts, tp_ratios))
+    offsets, fallbacks, ratios = (np.array(col, dtype=float) for col in zip(*combos))
+    return {"tick_offset": offsets, "fallback_pct": fallbacks, "take_profit_ratio": ratios}
+
+
+def _floor_qty(qty, min_qty, step):
+    # trade_worker.floor_qty 와 같은 규칙
+    return np.round(np.floor(np.maximum(qty, min_qty) / step) * step, 8)
+
+
+def _second_levels(window, entry, long):
+    """
+    진입가 아래(롱)/위(숏) 고유 저점/고점 중 두 번째로 가까운 값과 개수(0/1/2 이상)
+    - window: (진입 수, LEVEL_WINDOW), entry: (진입 수,)
+    """
+    if long:
+        vals = np.where(window < entry[:, None], window, -np.inf)
+        first = vals.max(axis=1)
+        second = np.where(vals < first[:, None], vals, -np.inf).max(axis=1)
+        return second, np.isfinite(first).astype(int) + np.isfinite(second)
+    vals = np.where(window > entry[:, None], window, np.inf)
+    first = vals.min(axis=1)
+    second = np.where(vals > first[:, None], vals, np.inf).min(axis=1)
+    return second, np.isfinite(first).astype(int) + np.isfinite(second)
+
+
+def stop_levels(window, entry, long, tick_size, grid):
+    """
+    진입별 × 조합별 손절가/익절가, (진입 수, 조합 수)
+    """
+    second, count = _second_levels(window, entry, long)
+    e = entry[:, None]
+    offset = grid["tick_offset"][None, :] * tick_size
+    fallback = grid["fallback_pct"][None, :]
+    ratio = grid["take_profit_ratio"][None, :]
+    if long:
+        limit = e * (1 - fallback)
+        candidate = second[:, None] - offset
+        sl = np.where(candidate < limit, np.round(limit, 8), candidate)
+        tp = np.round(e * (1 + ratio), 8)
+    else:
+        limit = e * (1 + fallback)
+        candidate = second[:, None] + offset
+        sl = np.where(candidate > limit, np.round(limit, 8), candidate)
+        tp = np.round(e * (1 - ratio), 8)
+    # 지지/저항선이 2개 미만이면 고정 비율 손절
+    sl = np.where(count[:, None] >= 2, sl, np.round(limit, 8))
+    return sl, tp
+
+
+def _first_hit(extreme, level, below):
+    """
+    처음 가격이 level 에 닿는 캔들 번호(없으면 보유캔들 수)
+    - extreme: (진입, 보유캔들) 누적 최저가(below) 또는 누적 최고가, 단조이므로 안 닿은 캔들 수 = 첫 도달 위치
+    - level: (진입, 고유 가격 수)
+    """
+    if below:
+        return np.count_nonzero(extreme[:, :, None] > level[:, None, :], axis=1)
+    return np.count_nonzero(extreme[:, :, None] < level[:, None, :], axis=1)
+
+
+def simulate_symbol(klines, grid, position_type="long", fixed_loss=100.0, hold_bars=28, tick_size=0.01,
+                    qty_step=0.001, min_qty=0.001, entry_times=None, fees=True):
+    """
+    심볼 1개 백테스트, 진입 묶음(chunk)마다 결과 조각을 yield(전체 매매표를 한꺼번에 만들지 않음)
+    - klines: 시간순 (start_ms, open, high, low, close) 배열 또는 OHLC 컬럼 dict
+    - entry_times: KST "HH:MM" 목록(없으면 모든 캔들 시가에서 진입)
+    - hold_bars: 진입 후 청산 시각까지 캔들 수(청산 시각 도달 시 마지막 캔들 종가로 청산)
+    조각: entry_ms/entry_price 는 (진입 수,), 나머지는 (진입 수, 조합 수)
+    """
+    start, opn, high, low, close = _columns(klines)
+    n = len(start)
+    long = position_type == "long"
+    sign = 1.0 if long else -1.0
+    idx = np.arange(LEVEL_WINDOW, max(LEVEL_WINDOW, n - hold_bars + 1))
+    if entry_times:
+        slots = {int(t[:2]) * 60 + int(t[3:5]) for t in entry_times}
+        minute = ((start[idx] // 1000 + KST_OFFSET_SEC) % 86400) // 60
+        idx = idx[np.isin(minute, list(slots))]
+    n_params = len(grid["tick_offset"])
+    if len(idx) == 0:
+        return
+
+    # 손절가는 (tick_offset, fallback_pct), 익절가는 take_profit_ratio 에만 의존 → 고유 조합만 도달 검사
+    _, sl_cols, sl_inv = np.unique(np.column_stack([grid["tick_offset"], grid["fallback_pct"]]), axis=0,
+                                   return_index=True, return_inverse=True)
+    _, tp_cols, tp_inv = np.unique(grid["take_profit_ratio"], return_index=True, return_inverse=True)
+    sl_inv, tp_inv = sl_inv.ravel(), tp_inv.ravel()
+
+    windows = np.lib.stride_tricks.sliding_window_view(low if long else high, LEVEL_WINDOW)
+    fwd_low = np.lib.stride_tricks.sliding_window_view(low, hold_bars)
+    fwd_high = np.lib.stride_tricks.sliding_window_view(high, hold_bars)
+
+    chunk = max(1, BACKTEST_CHUNK_CELLS // (hold_bars * (len(sl_cols) + len(tp_cols))))
+    for lo in range(0, len(idx), chunk):
+        i = idx[lo:lo + chunk]
+        entry = opn[i]
+        sl, tp = stop_levels(windows[i - LEVEL_WINDOW], entry, long, tick_size, grid)
+        qty = _floor_qty(fixed_loss / np.abs(entry[:, None] - sl), min_qty, qty_step)
+        tp_qty = np.minimum(_floor_qty(qty / 2, min_qty, qty_step), qty)
+
+        run_low = np.minimum.accumulate(fwd_low[i], axis=1)
+        run_high = np.maximum.accumulate(fwd_high[i], axis=1)
+        if long:
+            sl_bar = _first_hit(run_low, sl[:, sl_cols], True)[:, sl_inv]
+            tp_bar = _first_hit(run_high, tp[:, tp_cols], False)[:, tp_inv]
+        else:
+            sl_bar = _first_hit(run_high, sl[:, sl_cols], False)[:, sl_inv]
+            tp_bar = _first_hit(run_low, tp[:, tp_cols], True)[:, tp_inv]
+        time_exit = close[i + hold_bars - 1][:, None]
+
+        tp_first = tp_bar < sl_bar
+        sl_hit = sl_bar < hold_bars
+        rest_exit = np.where(sl_hit, sl, time_exit)
+        reason = np.where(tp_first, np.where(sl_hit, EXIT_TP_SL, EXIT_TP_TIME), np.where(sl_hit, EXIT_SL, EXIT_TIME))
+        filled_tp = np.where(tp_first, tp_qty, 0.0)
+        rest_qty = qty - filled_tp
+        e = entry[:, None]
+        pnl = sign * ((tp - e) * filled_tp + (rest_exit - e) * rest_qty)
+        if fees:
+            pnl -= e * qty * TAKER_FEE + tp * filled_tp * MAKER_FEE + rest_exit * rest_qty * TAKER_FEE
+        exit_bar = np.where(sl_hit, sl_bar, hold_bars - 1)
+
+        yield {
+            "entry_ms": start[i],
+            "entry_price": entry,
+            "sl_price": sl,
+            "tp_price": tp,
+            "qty": qty,
+            "tp_qty": filled_tp,
+            "exit_price": rest_exit,
+            "exit_ms": start[i[:, None] + exit_bar],
+            "reason": reason.astype(np.int8),
+            "pnl": pnl,
+        }
+
+
+def flatten(part):
+    """
+    결과 조각 → 매매표 행(진입 × 조합) 컬럼 dict
+    """
+    m, n_params = part["pnl"].shape
+    rows = {"entry_ms": np.repeat(part["entry_ms"], n_params),
+            "param": np.tile(np.arange(n_params, dtype=np.int32), m),
+            "entry_price": np.repeat(part["entry_price"], n_params)}
+    for key in ("sl_price", "tp_price", "qty", "tp_qty", "exit_price", "exit_ms", "reason", "pnl"):
+        rows[key] = part[key].ravel()
+    return rows
+
+
+def _columns(klines):
+    if isinstance(klines, dict):
+        return tuple(np.asarray(klines[k], dtype=float) for k in ("start", "open", "high", "low", "close"))
+    arr = np.asarray(klines, dtype=float)
+    return arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4]
+
+
+class BacktestSummary:
+    """
+    조합별 집계를 조각마다 누적(매매표를 보관하지 않아도 요약 가능)
+    - 최대낙폭: 진입 캔들 시각별로 합친 손익의 누적곡선 기준(같은 시각 진입은 한꺼번에 반영)
+    """
+
+    def __init__(self, grid, timeline):
+        self.grid = grid
+        self.timeline = timeline
+        n_params = len(grid["tick_offset"])
+        self.n_params = n_params
+        self.count = np.zeros(n_params)
+        self.wins = np.zeros(n_params)
+        self.total = np.zeros(n_params)
+        self.gain = np.zeros(n_params)
+        self.loss = np.zeros(n_params)
+        self.reasons = np.zeros((len(EXIT_REASONS), n_params))
+        self.pnl_by_time = np.zeros((n_params, len(timeline)))
+
+    def add(self, part):
+        pnl, reason = part["pnl"], part["reason"]
+        self.count += len(pnl)
+        self.wins += np.count_nonzero(pnl > 0, axis=0)
+        self.total += pnl.sum(axis=0)
+        self.gain += np.maximum(pnl, 0.0).sum(axis=0)
+        self.loss -= np.minimum(pnl, 0.0).sum(axis=0)
+        for code in range(len(EXIT_REASONS)):
+            self.reasons[code] += np.count_nonzero(reason == code, axis=0)
+        # 한 조각 안의 진입 시각은 서로 다름 → 직접 더해도 겹치지 않음
+        pos = np.searchsorted(self.timeline, part["entry_ms"])
+        self.pnl_by_time[:, pos] += pnl.T
+
+    def rows(self):
+        """
+        조합별 매매 수/승률/총손익/평균손익/손익비(profit factor)/최대낙폭/청산사유 비율, 총손익 큰 순
+        """
+        equity = np.cumsum(self.pnl_by_time, axis=1)
+        peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=1)
+        drawdown = (peak - equity).max(axis=1) if equity.shape[1] else np.zeros(self.n_params)
+        grid, count = self.grid, self.count
+        rows = []
+        for p in range(self.n_params):
+            c = count[p]
+            rows.append({
+                "tick_offset": int(grid["tick_offset"][p]),
+                "fallback_pct": float(grid["fallback_pct"][p]),
+                "take_profit_ratio": float(grid["take_profit_ratio"][p]),
+                "trades": int(c),
+                "win_rate": round(float(self.wins[p] / c), 4) if c else None,
+                "total_pnl": round(float(self.total[p]), 4),
+                "avg_pnl": round(float(self.total[p] / c), 4) if c else None,
+                "profit_factor": round(float(self.gain[p] / self.loss[p]), 4) if self.loss[p] else None,
+                "max_drawdown": round(float(drawdown[p]), 4),
+                **{f"exit_{name}": round(float(self.reasons[k, p] / c), 4) if c else None
+                   for k, name in enumerate(EXIT_REASONS)},
+            })
+        return sorted(rows, key=lambda r: r["total_pnl"], reverse=True)
+
+
+def run_backtest(data, grid, position_types=("long",), keep_trades=False, workers=BACKTEST_WORKERS, **kwargs):
+    """
+    여러 심볼/방향 백테스트
+    - data: {symbol: (klines, {"tick_size", "qty_step", "min_qty"})}
+    - keep_trades: 매매별 손익표도 반환(행 수 = 진입 × 조합 × 방향, 큰 그리드에서는 메모리 주의)
+    반환: (조합별 요약 행 목록, 매매표 컬럼 dict 또는 None)
+    """
+    timeline = np.unique(np.concatenate([_columns(klines)[0] for klines, _ in data.values()])) if data else np.array([])
+    summary = BacktestSummary(grid, timeline)
+    parts = []
+    lock = threading.Lock()
+
+    def run(task):
+        symbol_no, klines, spec, position_type = task
+        for part in simulate_symbol(klines, grid, position_type, **{**kwargs, **spec}):
+            if keep_trades:
+                rows = flatten(part)
+                n = len(rows["pnl"])
+                rows["symbol"] = np.full(n, symbol_no, dtype=np.int32)
+                rows["side"] = np.full(n, 1 if position_type == "long" else -1, dtype=np.int8)
+            with lock:
+                summary.add(part)
+                if keep_trades:
+                    parts.append(rows)
+
+    tasks = [(symbol_no, klines, spec, position_type)
+             for symbol_no, (klines, spec) in enumerate(data.values()) for position_type in position_types]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="backtest") as pool:
+        list(pool.map(run, tasks))
+    trades = None
+    if keep_trades:
+        trades = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]} if parts else {"pnl": np.array([])}
+        trades["symbols"] = list(data)
+    return summary.rows(), trades
+
+
+def write_trades_csv(path, trades, grid):
+    symbols = trades["symbols"]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["symbol", "side", "entry_ms", "exit_ms", "tick_offset", "fallback_pct", "take_profit_ratio",
+                         "entry_price", "sl_price", "tp_price", "qty", "tp_qty", "exit_price", "reason", "pnl"])
+        for r in range(len(trades["pnl"])):
+            p = int(trades["param"][r])
+            writer.writerow([
+                symbols[trades["symbol"][r]], "long" if trades["side"][r] > 0 else "short",
+                int(trades["entry_ms"][r]), int(trades["exit_ms"][r]),
+                int(grid["tick_offset"][p]), grid["fallback_pct"][p], grid["take_profit_ratio"][p],
+                trades["entry_price"][r], trades["sl_price"][r], trades["tp_price"][r], trades["qty"][r],
+                trades["tp_qty"][r], trades["exit_price"][r], EXIT_REASONS[trades["reason"][r]],
+                round(float(trades["pnl"][r]), 6),
+            ])
+
+
+def check_against_reference(klines, tick_size, tick_offset=5, fallback_pct=0.01, take_profit_ratio=0.02,
+                            samples=200, seed=0):
+    """
+    무작위 진입 시점에서 stop_loss_calc 원본 함수와 손절가 비교, 불일치 개수 반환
+    """
+    start, opn, high, low, close = _columns(klines)
+    grid = param_grid([tick_offset], [fallback_pct], [take_profit_ratio])
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(LEVEL_WINDOW, len(start), size=min(samples, len(start) - LEVEL_WINDOW))
+    mismatches = 0
+    for long, fn, src in ((True, get_long_stop_loss, low), (False, get_short_stop_loss, high)):
+        windows = np.lib.stride_tricks.sliding_window_view(src, LEVEL_WINDOW)[idx - LEVEL_WINDOW]
+        sl, _ = stop_levels(windows, opn[idx], long, tick_size, grid)
+        for k, i in enumerate(idx):
+            ref, _, _ = fn(list(src[i - LEVEL_WINDOW:i]), float(opn[i]), tick_size, tick_offset, fallback_pct,
+                           take_profit_ratio)
+            if not np.isclose(ref, sl[k, 0], rtol=0, atol=1e-9):
+                mismatches += 1
+    return mismatches
+
+
+def load_klines_csv(path):
+    """
+    start_ms,open,high,low,close 헤더가 있는 CSV
+    """
+    return np.loadtxt(path, delimiter=",", skiprows=1, usecols=(0, 1, 2, 3, 4), ndmin=2)
+
+
+def _floats(text):
+    return [float(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", default="BTCUSDT")
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--csv-dir", help="{SYMBOL}.csv 캔들 파일 폴더(없으면 캔들 저장소를 Bybit과 동기화해 사용)")
+    parser.add_argument("--position-types", default="long,short")
+    parser.add_argument("--fixed-loss", type=float, default=100)
+    parser.add_argument("--hold-bars", type=int, default=28, help="진입~청산 캔들 수(30분봉)")
+    parser.add_argument("--entry-times", default="", help="KST HH:MM 목록(비우면 모든 캔들)")
+    parser.add_argument("--tick-offsets", default="5")
+    parser.add_argument("--fallback-pcts", default="0.01")
+    parser.add_argument("--tp-ratios", default="0.02")
+    parser.add_argument("--no-fees", action="store_true")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", help="매매별 손익표 CSV 경로")
+    args = parser.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    grid = param_grid([int(v) for v in _floats(args.tick_offsets)], _floats(args.fallback_pcts), _floats(args.tp_ratios))
+    data = {}
+    if args.csv_dir:
+        for symbol in symbols:
+            data[symbol] = (load_klines_csv(os.path.join(args.csv_dir, f"{symbol}.csv")),
+                            {"tick_size": 0.01, "qty_step": 0.001, "min_qty": 0.001})
+    else:
+        from session_pool import session_pool
+        from instrument_cache import instrument_cache
+        from kline_store import kline_store
+        session = session_pool.public()
+        instruments = instrument_cache.get_many(symbols, session)
+        end_ms = int(time.time() * 1000)
+        start_ms = end_ms - int(args.days * 86400 * 1000)
+        for symbol in symbols:
+            spec = instruments[symbol]
+            # 저장소에 없는 구간만 받아 추가, 백테스트는 memmap 컬럼 뷰를 그대로 사용
+            kline_store.sync(session, symbol, "30", start_ms=start_ms)
+            data[symbol] = (kline_store.range(symbol, "30", start_ms, end_ms),
+                            {"tick_size": spec["tick_size"], "qty_step": spec["qty_step"], "min_qty": spec["min_qty"]})
+
+    t0 = time.perf_counter()
+    summary, trades = run_backtest(
+        data, grid, tuple(args.position_types.split(",")), keep_trades=bool(args.out), fixed_loss=args.fixed_loss,
+        hold_bars=args.hold_bars, entry_times=[t for t in args.entry_times.split(",") if t.strip()] or None,
+        fees=not args.no_fees,
+    )
+    elapsed = time.perf_counter() - t0
+    print(f"캔들 {sum(len(k) for k, _ in data.values())}개, 조합 {len(grid['tick_offset'])}개, "
+          f"매매 {sum(r['trades'] for r in summary)}건, {elapsed:.2f}초")
+    for row in summary[:args.top]:
+        print(row)
+    if args.out:
+        write_trades_csv(args.out, trades, grid)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import time
+import hashlib
+import threading
+
+from session_pool import session_pool
+
+# === 계정별 잔고 캐시(짧은 TTL + 동시 요청 1회로 합치기 + private WS wallet 푸시) ===
+BALANCE_TTL_SEC = float(os.getenv("BALANCE_TTL_SEC", "5"))
+BALANCE_WS_PUSH = os.getenv("BALANCE_WS_PUSH", "1") == "1"   # private WS 연결이 있는 계정은 wallet 토픽으로 갱신
+BALANCE_ACCOUNT_TYPE = "UNIFIED"
+
+
+def _secret_digest(api_secret):
+    return hashlib.sha256((api_secret or "").encode()).digest()
+
+
+def _parse_wallet(account):
+    """
+    get_wallet_balance / wallet 토픽의 계정 1개 → {"total_equity", "coins": {coin: 항목}}
+    """
+    return {
+        "total_equity": account.get("totalEquity"),
+        "coins": {c.get("coin"): c for c in account.get("coin") or []},
+    }
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BalanceCache:
+    """
+    - API 키별로 전체 코인 잔고를 한 번에(get_wallet_balance, coin 미지정) 받아 TTL 동안 재사용
+    - 같은 키/시크릿 조회가 동시에 들어오면 1건만 거래소로, 나머지는 그 결과를 기다려 공유
+    - 시크릿이 다르면 캐시를 쓰지 않음(API 키만 알아도 잔고가 보이는 일 방지)
+    - private WS wallet 메시지가 오면 그 계정 항목을 바로 갱신(TTL 재시작)
+    - 실패는 캐시하지 않음
+    """
+
+    def __init__(self, ttl=BALANCE_TTL_SEC, pool=None):
+        self.ttl = ttl
+        self.pool = pool or session_pool
+        self._entries = {}    # api_key -> (loaded_at, secret digest, wallet)
+        self._flights = {}    # (api_key, secret digest) -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+        self.coalesced = 0
+        self.pushes = 0
+
+    def _fresh(self, api_key, digest):
+        entry = self._entries.get(api_key)
+        if entry is None:
+            return None
+        loaded_at, entry_digest, wallet = entry
+        if entry_digest != digest or time.monotonic() - loaded_at > self.ttl:
+            return None
+        return wallet
+
+    def wallet(self, api_key, api_secret):
+        """
+        {"total_equity", "coins": {coin: 항목}} 반환, 거래소 호출 실패 시 예외
+        """
+        digest = _secret_digest(api_secret)
+        with self._lock:
+            wallet = self._fresh(api_key, digest)
+            if wallet is not None:
+                self.hits += 1
+                return wallet
+            flight = self._flights.get((api_key, digest))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(api_key, digest)] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            with self.pool.checkout(api_key, api_secret) as session:
+                res = session.get_wallet_balance(accountType=BALANCE_ACCOUNT_TYPE)
+            flight.result = _parse_wallet(res['result']['list'][0])
+            with self._lock:
+                self.fetches += 1
+                self._entries[api_key] = (time.monotonic(), digest, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop((api_key, digest), None)
+            flight.done.set()
+
+    def on_wallet(self, api_key, msg):
+        """
+        private WS wallet 토픽 메시지 반영(이미 조회해 시크릿이 확인된 계정만)
+        """
+        for account in msg.get("data") or []:
+            if account.get("accountType", BALANCE_ACCOUNT_TYPE) != BALANCE_ACCOUNT_TYPE:
+                continue
+            with self._lock:
+                entry = self._entries.get(api_key)
+                if entry is None:
+                    continue
+                self._entries[api_key] = (time.monotonic(), entry[1], _parse_wallet(account))
+                self.pushes += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "accounts": len(self._entries),
+                "in_flight": len(self._flights),
+                "hits": self.hits,
+                "fetches": self.fetches,
+                "coalesced": self.coalesced,
+                "pushes": self.pushes,
+            }
+
+
+# 프로세스 공용 인스턴스
+balance_cache = BalanceCache()
+
@@ -0,0 +1,281 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import trade_worker as tw
+
+# === 묶음(여러 심볼) 매매: 계정 1개, 마감시각 1개, 다리(leg)별 상태 ===
+BATCH_MAX_LEGS = int(os.getenv("BATCH_MAX_LEGS", "20"))
+BATCH_POLL_SEC = float(os.getenv("BATCH_POLL_SEC", "2"))   # 스트림 미사용 시 계정 포지션 일괄 조회 주기
+
+
+def leg_id(user_id, index):
+    """
+    다리별 상태 키(/trade_status, /stop_trade 에 그대로 사용)
+    """
+    return f"{user_id}#{index + 1}"
+
+
+def claim_legs(store, user_id, count):
+    """
+    다리 키 전부의 소유권 획득, 하나라도 이미 실행 중이면 획득한 것까지 되돌리고 그 다리 키 반환(성공 시 None)
+    """
+    claimed = []
+    for i in range(count):
+        lid = leg_id(user_id, i)
+        if not store.claim(lid):
+            for key in claimed:
+                store.release(key)
+            return lid
+        claimed.append(lid)
+    return None
+
+
+def init_batch_status(trade_statuses, user_id, legs, entry_time, exit_time, immediate):
+    trade_statuses[user_id] = {
+        "running": True,
+        "info": {
+            "batch": True,
+            "legs": [leg_id(user_id, i) for i in range(len(legs))],
+            "symbols": [leg["symbol"] for leg in legs],
+            "entry_time": entry_time,
+            "exit_time": exit_time,
+            "immediate": immediate,
+            "fired_at": None,
+            "fire_skew_ms": None,
+            "open_legs": None,
+        },
+        "error": None
+    }
+    tw.publish_status(trade_statuses, user_id)
+
+
+def batch_worker(
+    user_id, trade_statuses,
+    api_key, api_secret,
+    legs, entry_time, exit_time,
+    immediate=False
+):
+    """
+    - 다리마다 일반 매매와 같은 상태/저널 기록(키: user_id#n), 묶음 자체는 trade_statuses[user_id]
+    - 세션 1개, 종목정보 일괄 조회 1회, 사전준비/진입/청산 마감 1세트를 모든 다리가 공유
+    - 진입 시각에 모든 다리를 다리 수만큼의 쓰레드로 동시에 발사
+    - 청산 감시는 계정 포지션 일괄 조회 1회로 모든 다리 확인
+    """
+    session = tw.session_pool.acquire(api_key, api_secret)
+    ids = [leg_id(user_id, i) for i in range(len(legs))]
+    leg_by_id = dict(zip(ids, legs))
+    jobs = []
+    watches = {}
+    feeds = []
+    finished = set()
+    entered = []
+    pool = ThreadPoolExecutor(max_workers=len(legs), thread_name_prefix="batch-leg")
+
+    def leg_active(lid):
+        return trade_statuses[user_id]["running"] and trade_statuses[lid]["running"]
+
+    def finish_leg(lid):
+        if lid in finished:
+            return
+        finished.add(lid)
+        tw.set_running(trade_statuses, lid, False)
+        tw.journal.append(lid, "finished", error=trade_statuses[lid].get('error'))
+
+    def force_exit(lids):
+        leg_list = [(lid, leg_by_id[lid]) for lid in lids]
+        list(pool.map(lambda item: tw.force_exit_position(
+            item[0], item[1]["symbol"], item[1]["position_type"], api_key, api_secret, trade_statuses), leg_list))
+        for lid in lids:
+            finish_leg(lid)
+
+    try:
+        init_batch_status(trade_statuses, user_id, legs, entry_time, exit_time, immediate)
+        for lid, leg in leg_by_id.items():
+            tw.begin_trade(trade_statuses, lid, api_key, api_secret, leg["position_type"], leg["symbol"],
+                           leg["fixed_loss"], entry_time, exit_time, leg.get("take_profit"), None, immediate)
+        # 모든 다리의 종목정보를 한 번에 확보(다리별 단건 조회 없음)
+        tw.instrument_cache.get_many([leg["symbol"] for leg in legs], session)
+
+        prearm_ts, entry_ts, exit_ts, entry_lead = tw.trade_deadlines(entry_time, exit_time)
+        if not immediate:
+            for lid in ids:
+                tw.mark_deadline(trade_statuses, lid, entry_ts)
+        tw.set_info(trade_statuses, user_id, entry_lead_ms=round(entry_lead * 1000, 3))
+
+        # 묶음/다리 어느 키로 중단해도 같은 쓰레드를 깨움
+        wake = threading.Event()
+        for key in (user_id, *ids):
+            tw._wake_events[key] = wake
+        arm_due = threading.Event()
+        entry_due = threading.Event()
+        exit_due = threading.Event()
+
+        def _trigger(flag):
+            def fire():
+                flag.set()
+                wake.set()
+            return fire
+
+        jobs.append(tw.scheduler.schedule(prearm_ts, _trigger(arm_due), f"{user_id}:batch-arm"))
+        jobs.append(tw.scheduler.schedule(entry_ts, _trigger(entry_due), f"{user_id}:batch-entry"))
+        jobs.append(tw.scheduler.schedule(exit_ts, _trigger(exit_due), f"{user_id}:batch-exit"))
+
+        if tw.PRIVATE_WS_ENABLED:
+            for lid, leg in leg_by_id.items():
+                try:
+                    watches[lid] = tw.private_streams.watch(api_key, api_secret, leg["symbol"], wake)
+                except Exception as e:
+                    logging.error("[private WS 연결 실패, REST 폴링으로 진행] %s", e)
+
+        plans = {lid: None for lid in ids}
+        while True:
+            wake.clear()
+            active = [lid for lid in ids if leg_active(lid)]
+            if not active:
+                break
+
+            if tw.MARKET_WS_ENABLED and not feeds and (immediate or arm_due.is_set() or entry_due.is_set()):
+                for symbol in {leg["symbol"] for leg in legs}:
+                    tw.market_data.acquire(symbol)
+                    feeds.append(symbol)
+
+            if immediate or entry_due.is_set():
+                def fire_leg(lid):
+                    leg = leg_by_id[lid]
+                    fired = time.time()
+                    try:
+                        tw.fire_entry(session, trade_statuses, lid, leg["symbol"], leg["position_type"],
+                                      leg["fixed_loss"], leg.get("take_profit"), plans[lid])
+                    except Exception as e:
+                        logging.exception("[묶음 매매 다리 진입 에러] %s: %s", lid, e)
+                        tw.set_running(trade_statuses, lid, False, error=str(e))
+                    return fired
+                fired = list(pool.map(fire_leg, active))
+                # 진입 주문이 실패한 다리(open_position 이 에러 문자열/거절 응답)는 포지션이 없으므로 보호/청산 없이 종료
+                entered = [lid for lid in active
+                           if trade_statuses[lid]["running"] and tw.order_ok(trade_statuses[lid]["info"].get("entry_order"))]
+                for lid in active:
+                    if lid not in entered and trade_statuses[lid]["running"]:
+                        res = trade_statuses[lid]["info"].get("entry_order")
+                        tw.set_running(trade_statuses, lid, False, error=res if isinstance(res, str) else f"진입실패: {res}")
+                tw.set_info(
+                    trade_statuses, user_id,
+                    fired_at=tw.now_kst_str(),
+                    fire_skew_ms=round((max(fired) - min(fired)) * 1000, 3),
+                    open_legs=len(entered),
+                )
+                break
+
+            # 사전준비: 다리별 손절가/수량 계산을 동시에
+            timeout = None
+            if arm_due.is_set():
+                refreshed = pool.map(lambda lid: tw.refresh_plan(
+                    session, trade_statuses, lid, leg_by_id[lid]["symbol"], leg_by_id[lid]["position_type"],
+                    leg_by_id[lid]["fixed_loss"], plans[lid]), active)
+                plans.update(zip(active, refreshed))
+                timeout = tw.PREARM_REFRESH_SEC
+            wake.wait(timeout)
+
+        open_legs = list(entered)
+        next_rest_check = 0.0
+        while open_legs:
+            wake.clear()
+            # 묶음 전체 중단 또는 청산 시각 도달: 남은 다리 동시 강제 청산
+            if not trade_statuses[user_id]["running"] or exit_due.is_set():
+                force_exit(open_legs)
+                open_legs = []
+                break
+
+            # 다리 단위 중단
+            stopped = [lid for lid in open_legs if not trade_statuses[lid]["running"]]
+            if stopped:
+                force_exit(stopped)
+
+            for lid in open_legs:
+                watch = watches.get(lid, (None, None))[1]
+                if lid not in finished and watch is not None and watch.closed:
+                    tw.record_stream_exit(session, trade_statuses, lid, leg_by_id[lid]["symbol"], watch)
+                    finish_leg(lid)
+
+            # 계정 포지션 1회 조회로 모든 다리 청산 여부 확인
+            open_legs = [lid for lid in open_legs if lid not in finished]
+            polling = any(lid not in watches for lid in open_legs)
+            # private WS 재연결 직후엔 유실됐을 수 있는 청산을 바로 확인
+            resync = [w.take_resync() for _, w in watches.values()]
+            if open_legs and (polling or any(resync) or time.monotonic() >= next_rest_check):
+                next_rest_check = time.monotonic() + tw.WS_SAFETY_POLL_SEC
+                try:
+                    positions = tw.get_all_positions(session)
+                except Exception as e:
+                    logging.error("[포지션 일괄 조회 실패] %s", e)
+                    positions = None
+                if positions is not None:
+                    for lid in open_legs:
+                        symbol = leg_by_id[lid]["symbol"]
+                        pos_size = float(positions[symbol]['size']) if symbol in positions else 0.0
+                        watch = watches.get(lid, (None, None))[1]
+                        if tw.poll_position_exit(session, trade_statuses, lid, symbol, watch, pos_size=pos_size):
+                            finish_leg(lid)
+                    open_legs = [lid for lid in open_legs if lid not in finished]
+
+            if open_legs:
+                tw.set_info(trade_statuses, user_id, open_legs=len(open_legs))
+                wake.wait(BATCH_POLL_SEC if polling else max(0.0, next_rest_check - time.monotonic()))
+
+    except Exception as e:
+        logging.exception("[batch_worker 전체 에러] %s", e)
+        tw.set_running(trade_statuses, user_id, trade_statuses[user_id]['running'], error=str(e))
+    finally:
+        for job in jobs:
+            job.cancel()
+        for token, _ in watches.values():
+            tw.private_streams.unwatch(token)
+        for symbol in feeds:
+            tw.market_data.release(symbol)
+        for key in (user_id, *ids):
+            tw._wake_events.pop(key, None)
+        # 진입 후 정리되지 않은 다리는 강제 청산
+        leftover = [lid for lid in ids if lid in trade_statuses and lid not in finished]
+        entered_left = [lid for lid in leftover if lid in entered and trade_statuses[lid]['running']]
+        if entered_left:
+            force_exit(entered_left)
+        for lid in leftover:
+            finish_leg(lid)
+        pool.shutdown(wait=False)
+        tw.set_info(trade_statuses, user_id, open_legs=0)
+        tw.set_running(trade_statuses, user_id, False)
+        tw.session_pool.release(session)
+
+
+def validate_legs(legs):
+    """
+    요청 다리 목록 검사, 문제 있으면 오류 메시지 반환
+    """
+    if not isinstance(legs, list) or not legs:
+        return "legs(다리 목록) 필요"
+    if len(legs) > BATCH_MAX_LEGS:
+        return f"다리는 최대 {BATCH_MAX_LEGS}개"
+    for leg in legs:
+        if not isinstance(leg, dict) or not leg.get("symbol") or leg.get("fixed_loss") in (None, ""):
+            return "다리마다 symbol, fixed_loss 필요"
+        if leg.get("position_type") not in ("long", "short"):
+            return "position_type은 long/short"
+    if len({leg["symbol"] for leg in legs}) != len(legs):
+        return "같은 심볼 다리 중복"
+    return None
+
+
+def start_batch_thread(**kwargs):
+    user_id = kwargs.get("user_id")
+    trade_statuses = kwargs.get("trade_statuses")
+    if user_id in trade_statuses and trade_statuses[user_id].get("running"):
+        return False, "이미 매매 중입니다."
+    tw.instrument_cache.start()
+    tw.clock_sync.start()
+    th = threading.Thread(target=batch_worker, kwargs=kwargs)
+    th.daemon = True
+    th.start()
+    return True, "묶음 매매 시작됨"
@@ -0,0 +1,76 @@
+"""
+벡터화 백테스트 속도 측정(합성 30분봉, 네트워크 없음)
+
+    python benchmarks/bench_backtest.py --symbols 36 --years 3 --grid 3
+
+심볼별 로그 랜덤워크 캔들로 run_backtest(요약까지) 시간을 재고,
+stop_loss_calc 원본 함수와 손절가가 일치하는지 표본 검사 결과와 함께 JSON으로 출력
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import backtest  # noqa: E402
+
+
+def synthetic_klines(bars, seed, start_price=100.0, volatility=0.004, tick=0.01):
+    """
+    30분봉 (start_ms, open, high, low, close), 가격은 tick 단위로 반올림
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, volatility, bars)))
+    opn = np.r_[start_price, close[:-1]]
+    wick = np.abs(rng.normal(0, volatility / 2, (2, bars))) * close
+    high = np.maximum(opn, close) + wick[0]
+    low = np.minimum(opn, close) - wick[1]
+    start = 1_599_998_400_000 + np.arange(bars) * 1_800_000
+    return np.column_stack([start] + [np.round(c / tick) * tick for c in (opn, high, low, close)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=36)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--grid", type=int, default=3, help="파라미터별 값 개수(조합 = grid^3)")
+    parser.add_argument("--hold-bars", type=int, default=28)
+    parser.add_argument("--entry-times", default="", help="KST HH:MM 목록(비우면 모든 캔들에서 진입)")
+    args = parser.parse_args()
+
+    bars = int(args.years * 365 * 48)
+    spec = {"tick_size": 0.01, "qty_step": 0.001, "min_qty": 0.001}
+    data = {f"S{i}USDT": (synthetic_klines(bars, i), spec) for i in range(args.symbols)}
+    grid = backtest.param_grid(
+        [int(v) for v in np.linspace(3, 10, args.grid)],
+        list(np.linspace(0.005, 0.02, args.grid)),
+        list(np.linspace(0.01, 0.04, args.grid)),
+    )
+
+    t0 = time.perf_counter()
+    entry_times = [t for t in args.entry_times.split(",") if t.strip()] or None
+    summary, _ = backtest.run_backtest(data, grid, ("long", "short"), hold_bars=args.hold_bars, entry_times=entry_times)
+    t1 = time.perf_counter()
+    rows = sum(r["trades"] for r in summary)
+    mismatches = backtest.check_against_reference(data["S0USDT"][0], spec["tick_size"])
+
+    print(json.dumps({
+        "symbols": args.symbols,
+        "bars_per_symbol": bars,
+        "combos": len(grid["tick_offset"]),
+        "entry_times": entry_times,
+        "trade_rows": rows,
+        "backtest_sec": round(t1 - t0, 3),
+        "rows_per_sec": round(rows / (t1 - t0)),
+        "reference_mismatches": mismatches,
+        "best": summary[0],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+같은 진입 시각 매매 N건 동시 진입 부하 테스트: 매매별 직접 진입 vs 공용 진입 디스패처
+
+    python benchmarks/bench_entry_herd.py --trades 1000 --symbols 20 --accounts 200
+
+모드별로 별도 프로세스를 띄워 측정, 진입 지연(마감 ~ 거래소에 진입 주문 도착) 분포와
+엔드포인트별 호출 수를 JSON으로 출력
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class HerdExchange:
+    """
+    응답지연 + 동시처리 상한(거래소 쪽 대기열)이 있는 가짜 거래소
+    """
+
+    def __init__(self, latency, jitter, concurrency):
+        self.latency = latency
+        self.jitter = jitter
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.calls = Counter()
+        self.entry_arrivals = []
+        self.lock = threading.Lock()
+
+    def call(self, endpoint):
+        with self.slots:
+            with self.lock:
+                self.calls[endpoint] += 1
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+
+class HerdSession:
+    def __init__(self, exchange):
+        self.ex = exchange
+
+    def get_server_time(self, **kwargs):
+        return {"result": {"timeSecond": str(int(time.time())), "timeNano": str(time.time_ns())}}
+
+    def get_instruments_info(self, symbol=None, **kwargs):
+        self.ex.call("get_instruments_info")
+        symbols = [symbol] if symbol else [f"S{i}USDT" for i in range(200)]
+        return {"result": {"list": [
+            {"symbol": s, "priceFilter": {"tickSize": "0.01"}, "lotSizeFilter": {"minOrderQty": "0.001", "qtyStep": "0.001"}}
+            for s in symbols], "nextPageCursor": ""}}
+
+    def get_tickers(self, symbol, **kwargs):
+        self.ex.call("get_tickers")
+        return {"result": {"list": [{"lastPrice": "100"}]}}
+
+    def get_kline(self, symbol, limit=6, **kwargs):
+        self.ex.call("get_kline")
+        now = int(time.time() // 1800 * 1800 * 1000)
+        return {"result": {"list": [[str(now - 1800000 * i), "100", "101", str(98 + i * 0.1), "100"] for i in range(limit)]}}
+
+    def place_order(self, orderType=None, reduceOnly=False, **kwargs):
+        arrived = time.time()
+        if orderType == "Market" and not reduceOnly:
+            with self.ex.lock:
+                self.ex.entry_arrivals.append(arrived)
+        self.ex.call("place_order")
+        return {"retCode": 0, "result": {"orderId": f"o{time.time_ns()}"}}
+
+    def set_trading_stop(self, **kwargs):
+        self.ex.call("set_trading_stop")
+        return {"retCode": 0, "result": {}}
+
+    def get_positions(self, **kwargs):
+        self.ex.call("get_positions")
+        return {"result": {"list": [{"size": "1"}], "nextPageCursor": ""}}
+
+
+def pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 2) if values else None
+
+
+def run_mode(mode, args):
+    os.environ["ENTRY_DISPATCH"] = "1" if mode == "dispatch" else "0"
+    os.environ["MARKET_WS_ENABLED"] = "0"
+    os.environ["PRIVATE_WS_ENABLED"] = "0"
+    os.environ["JOURNAL_ENABLED"] = "0"
+    os.environ["ENTRY_FAIRNESS"] = args.fairness
+    import trade_worker as tw
+
+    exchange = HerdExchange(args.latency_ms / 1000, args.jitter_ms / 1000, args.server_concurrency)
+    tw.session_pool.session_factory = lambda api_key, api_secret, testnet: HerdSession(exchange)
+    # 서버 IP 호출량 제한 적용 여부(0이면 끔)
+    if args.ip_rate:
+        from rate_limiter import RateLimiter
+        tw.session_pool.limiter = RateLimiter(ip_rate=args.ip_rate, ip_burst=args.ip_rate)
+    else:
+        tw.session_pool.limiter = None
+    tw.clock_sync.server_time_fn = time.time
+
+    # 분 단위 입력 대신 테스트용 마감시각 사용
+    deadline = time.time() + args.lead
+    tw.trade_deadlines = lambda entry_time, exit_time: (deadline - args.prearm, deadline, deadline + 3600, 0.0)
+
+    statuses = {}
+    for i in range(args.trades):
+        tw.start_trade_thread(
+            user_id=f"u{i}", trade_statuses=statuses, api_key=f"k{i % args.accounts}", api_secret="s",
+            position_type="long" if i % 2 else "short", symbol=f"S{i % args.symbols}USDT", fixed_loss=1,
+            entry_time="-", exit_time="-",
+        )
+    registered_by = time.time()
+    while len(exchange.entry_arrivals) < args.trades and time.time() < deadline + 60:
+        time.sleep(0.05)
+    time.sleep(1)
+
+    latencies = [(t - deadline) * 1000 for t in exchange.entry_arrivals]
+    queue = [s["info"].get("entry_queue_ms") for s in statuses.values() if s["info"].get("entry_queue_ms") is not None]
+    return {
+        "mode": mode,
+        "trades": args.trades,
+        "entered": len(latencies),
+        "registered_before_deadline": registered_by < deadline - args.prearm,
+        "entry_latency_ms": {"p50": pct(latencies, 0.5), "p90": pct(latencies, 0.9), "p99": pct(latencies, 0.99),
+                             "max": pct(latencies, 1.0)},
+        "queue_ms": {"p50": pct(queue, 0.5), "p99": pct(queue, 0.99)} if queue else None,
+        "calls": dict(exchange.calls),
+        "threads": threading.active_count(),
+        "ip_rate": args.ip_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=1000)
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--server-concurrency", type=int, default=100)
+    parser.add_argument("--lead", type=float, default=8, help="시작 후 진입 마감까지(초)")
+    parser.add_argument("--prearm", type=float, default=4, help="사전준비 시작(마감 몇 초 전)")
+    parser.add_argument("--fairness", default="round_robin")
+    parser.add_argument("--ip-rate", type=float, default=0, help="서버 IP 초당 호출 한도(0: 제한 없음)")
+    parser.add_argument("--mode", choices=["direct", "dispatch"])
+    args = parser.parse_args()
+
+    if args.mode:
+        # 가짜 거래소 캔들이 진입 경로가 읽는 실제 ./kline_store 에 섞이지 않도록 임시 디렉터리 사용
+        root = tempfile.mkdtemp(prefix="kline_store_")
+        os.environ["KLINE_STORE_DIR"] = root
+        try:
+            print(json.dumps(run_mode(args.mode, args)))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        return
+
+    results = []
+    for mode in ("direct", "dispatch"):
+        cmd = [sys.executable, __file__, "--mode", mode]
+        for name in ("trades", "symbols", "accounts", "latency_ms", "jitter_ms", "server_concurrency", "lead", "prearm", "fairness", "ip_rate"):
+            cmd += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+대기 중(진입 전) 매매 1건당 메모리/CPU 비교: 쓰레드 워커 vs asyncio 엔진
+
+    python benchmarks/bench_idle_trades.py --trades 2000 --idle 10
+
+모드별로 별도 프로세스를 띄워 측정하고 결과를 JSON으로 출력
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class IdleSession:
+    """
+    네트워크 없이 응답하는 최소 세션(진입 전 대기 구간에서 쓰는 호출만)
+    """
+
+    def get_server_time(self, **kwargs):
+        return {"result": {"timeSecond": str(int(time.time())), "timeNano": str(time.time_ns())}}
+
+    def get_instruments_info(self, **kwargs):
+        return {"result": {"list": [], "nextPageCursor": ""}}
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_mode(mode, trades, idle):
+    os.environ["TRADE_ENGINE"] = mode
+    os.environ["MARKET_WS_ENABLED"] = "0"
+    os.environ["PRIVATE_WS_ENABLED"] = "0"
+    import trade_worker
+
+    trade_worker.session_pool.session_factory = lambda api_key, api_secret, testnet: IdleSession()
+    trade_worker.session_pool.limiter = None
+
+    statuses = {}
+    far = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M")
+    far_exit = (datetime.now() + timedelta(days=1, hours=1)).strftime("%Y-%m-%d %H:%M")
+
+    # 공용 쓰레드(스케줄러/동기화 등)를 먼저 띄운 뒤 기준값 측정
+    trade_worker.start_trade_thread(
+        user_id="warmup", trade_statuses=statuses, api_key="k", api_secret="s",
+        position_type="long", symbol="BTCUSDT", fixed_loss=1, entry_time=far, exit_time=far_exit,
+    )
+    time.sleep(1)
+    base_rss = rss_kb()
+    base_threads = threading.active_count()
+
+    for i in range(trades):
+        trade_worker.start_trade_thread(
+            user_id=f"u{i}", trade_statuses=statuses, api_key=f"k{i}", api_secret="s",
+            position_type="long", symbol="BTCUSDT", fixed_loss=1, entry_time=far, exit_time=far_exit,
+        )
+    while sum(1 for s in statuses.values() if s.get("running")) < trades + 1:
+        time.sleep(0.05)
+    time.sleep(1)
+
+    loaded_rss = rss_kb()
+    threads = threading.active_count()
+    cpu0 = time.process_time()
+    time.sleep(idle)
+    cpu = time.process_time() - cpu0
+
+    return {
+        "mode": mode,
+        "trades": trades,
+        "idle_sec": idle,
+        "threads": threads,
+        "threads_per_trade": round((threads - base_threads) / trades, 4),
+        "rss_kb_per_trade": round((loaded_rss - base_rss) / trades, 3),
+        "cpu_ms_per_trade_per_sec": round(cpu * 1000 / trades / idle, 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=1000)
+    parser.add_argument("--idle", type=float, default=10)
+    parser.add_argument("--mode", choices=["thread", "async"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.trades, args.idle)))
+        return
+
+    results = []
+    for mode in ("thread", "async"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--trades", str(args.trades), "--idle", str(args.idle)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
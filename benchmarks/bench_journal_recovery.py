@@ -0,0 +1,140 @@
+"""
+저널 매매 N건 재시작 복구 시간 측정(재생/거래소 대조/재개/압축)
+
+    python benchmarks/bench_journal_recovery.py --trades 10000 --accounts 200 --budget-ms 5000
+
+임시 폴더에 저널을 만들고 네트워크 없는 세션으로 복구, 결과를 JSON으로 출력
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class RecoverySession:
+    """
+    계정 전체 포지션/미체결 주문 조회와 주문 취소/재발송만 흉내내는 세션
+    """
+
+    def __init__(self, positions, open_ids):
+        self.positions = positions
+        self.open_ids = open_ids
+
+    def get_positions(self, **kwargs):
+        return {"result": {"list": self.positions, "nextPageCursor": ""}}
+
+    def get_open_orders(self, **kwargs):
+        return {"result": {"list": [{"orderId": i} for i in self.open_ids], "nextPageCursor": ""}}
+
+    def get_server_time(self, **kwargs):
+        return {"result": {"timeSecond": str(int(time.time())), "timeNano": str(time.time_ns())}}
+
+    def get_instruments_info(self, **kwargs):
+        return {"result": {"list": [], "nextPageCursor": ""}}
+
+    def cancel_order(self, **kwargs):
+        return {"retCode": 0, "result": {}}
+
+    def place_order(self, **kwargs):
+        return {"retCode": 0, "result": {"orderId": "tp-new"}}
+
+    def set_trading_stop(self, **kwargs):
+        return {"retCode": 0, "result": {}}
+
+
+def build_journal(journal, trades, accounts, seal_secret):
+    """
+    매매 4가지 상태를 골고루 기록: 진입 전 / 진입+포지션 유지 / 진입 후 청산됨 / 종료
+    반환: {api_key: (positions, open_ids)}
+    """
+    far = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M")
+    far_exit = (datetime.now() + timedelta(days=1, hours=1)).strftime("%Y-%m-%d %H:%M")
+    exchange = {f"k{a}": ([], set()) for a in range(accounts)}
+    entries = []
+    for i in range(trades):
+        api_key = f"k{i % accounts}"
+        user_id = f"u{i}"
+        symbol = f"SYM{i}USDT"
+        entries.append((user_id, "started", {
+            "api_key": api_key, "api_secret": seal_secret("s"), "position_type": "long", "symbol": symbol,
+            "fixed_loss": 1, "entry_time": far, "exit_time": far_exit,
+            "take_profit": None, "stop_loss": None, "immediate": False,
+        }))
+        entries.append((user_id, "armed", {"ref_price": 100.0, "sl_price": 99.0, "qty": 1.0}))
+        kind = i % 4
+        if kind in (1, 2):
+            entries.append((user_id, "entered", {"entered": True, "entry_ok": True, "side": "Buy", "qty": 1.0,
+                                                 "entry_price": 100.0, "tp_price": 102.0, "sl_price": 99.0}))
+            entries.append((user_id, "tp_placed", {"tp_order_id": f"tp{i}"}))
+            entries.append((user_id, "sl_placed", {"sl_order_id": None, "sl_attached": True}))
+        if kind == 1:
+            positions, open_ids = exchange[api_key]
+            positions.append({"symbol": symbol, "side": "Buy", "size": "1.0", "avgPrice": "100", "stopLoss": "99"})
+            open_ids.add(f"tp{i}")
+        if kind == 3:
+            entries.append((user_id, "finished", {}))
+    for start in range(0, len(entries), 5000):
+        journal.append_many(entries[start:start + 5000])
+    return exchange
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=10000)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=5000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["JOURNAL_PATH"] = os.path.join(tmp, "trade_journal.jsonl")
+    os.environ["JOURNAL_COMPACT_EVERY"] = "0"
+    os.environ["JOURNAL_SECRET_KEY"] = "bench"
+    os.environ["TRADE_ENGINE"] = "async"
+    os.environ["MARKET_WS_ENABLED"] = "0"
+    os.environ["PRIVATE_WS_ENABLED"] = "0"
+    import trade_worker
+    import trade_recovery
+    from trade_journal import journal, seal_secret
+
+    journal.fsync = False
+    exchange = build_journal(journal, args.trades, args.accounts, seal_secret)
+    journal.fsync = True
+    journal_bytes = os.path.getsize(journal.path)
+
+    trade_worker.session_pool.session_factory = lambda api_key, api_secret, testnet: RecoverySession(*exchange.get(api_key, ([], set())))
+    trade_worker.session_pool.limiter = None
+
+    start = time.perf_counter()
+    replayed = len(journal.replay())
+    replay_ms = (time.perf_counter() - start) * 1000
+
+    statuses = {}
+    report = trade_recovery.recover_trades(statuses)
+
+    start = time.perf_counter()
+    after = len(journal.replay())
+    replay_after_compact_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        "trades": args.trades,
+        "accounts": args.accounts,
+        "journal_bytes": journal_bytes,
+        "unfinished": replayed,
+        "replay_ms": round(replay_ms, 2),
+        "recovery": report,
+        "compacted_bytes": os.path.getsize(journal.path),
+        "replay_after_compact_ms": round(replay_after_compact_ms, 2),
+        "unfinished_after": after,
+        "budget_ms": args.budget_ms,
+        "within_budget": report["total_ms"] <= args.budget_ms,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
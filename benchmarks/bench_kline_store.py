@@ -0,0 +1,84 @@
+"""
+디스크 캔들 저장소 측정(가짜 거래소 대상, 네트워크 없음)
+
+    python benchmarks/bench_kline_store.py --symbols 20 --days 90
+
+- initial_sync: 빈 저장소에 days 만큼 30분봉 동기화(페이지 조회 + 컬럼 파일 추가)
+- incremental_sync: 이미 최신인 저장소 재동기화(REST 0회여야 함)
+- range_lookup: 임의 구간 조회(시각→행 계산 + memmap 슬라이스, 복사 없음)
+- cold_open: 새 프로세스 상태(매핑 없음)에서 진입 경로 최근 5개 캔들 조회, REST 경로와 비교
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat=1):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - t0) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    os.environ.update(FAKE_EXCHANGE="1", FAKE_LATENCY_MS=str(args.latency_ms), FAKE_JITTER_MS="0")
+    import kline_store as ks
+    from fake_exchange import exchange
+
+    root = tempfile.mkdtemp(prefix="kline_store_")
+    try:
+        store = ks.KlineStore(root)
+        session = exchange.session_factory(None)
+        symbols = [f"S{i}USDT" for i in range(args.symbols)]
+        for symbol in symbols:
+            exchange.add_symbol(symbol, 100.0 + len(symbol), 0.01, 0.001, 0.001)
+        now_ms = int(time.time() * 1000)
+        start_ms = now_ms - int(args.days * 86400 * 1000)
+
+        _, initial = timed(lambda: [store.sync(session, s, "30", start_ms=start_ms) for s in symbols])
+        rows = sum(len(store.series(s, "30")) for s in symbols)
+        requests = store.sync_requests
+        _, incremental = timed(lambda: [store.sync(session, s, "30") for s in symbols])
+
+        rng = random.Random(0)
+        spans = [(rng.choice(symbols), rng.randint(start_ms, now_ms)) for _ in range(args.lookups)]
+        _, lookup = timed(lambda: [store.range(s, "30", t, t + 48 * 1_800_000) for s, t in spans])
+        lookup /= args.lookups
+
+        cold = ks.KlineStore(root)
+        _, cold_open = timed(lambda: [cold.recent_closed(s, "30", 5) for s in symbols])
+        _, rest = timed(lambda: [session.get_kline(category="linear", symbol=s, interval="30", limit=6) for s in symbols])
+
+        print(json.dumps({
+            "symbols": args.symbols,
+            "rows": rows,
+            "disk_bytes": sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files),
+            "initial_sync_sec": round(initial, 3),
+            "initial_sync_requests": requests,
+            "incremental_sync_ms": round(incremental * 1000, 3),
+            "incremental_sync_requests": store.sync_requests - requests,
+            "range_lookup_us": round(lookup * 1e6, 2),
+            "cold_recent_5_ms_per_symbol": round(cold_open * 1000 / args.symbols, 3),
+            "rest_recent_5_ms_per_symbol": round(rest * 1000 / args.symbols, 3),
+        }, indent=2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
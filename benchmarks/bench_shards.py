@@ -0,0 +1,164 @@
+"""
+샤드(매매 워커 프로세스) 수에 따른 처리량 측정(가짜 거래소 대상, 네트워크 없음)
+
+    python benchmarks/bench_shards.py --shards 1,2,4 --trades 400 --out bench_shards.json
+
+샤드 수마다 별도 프로세스에서 ShardSupervisor 를 띄우고
+- start_per_sec: 매매 N건 시작(즉시 진입) 요청 처리량
+- protected_per_sec: 시작 ~ 모든 매매가 진입 + 익절/손절 보호주문까지 마친 시점 기준 처리량
+- status_per_sec: 여러 쓰레드에서 상태 조회를 라우팅해 받은 처리량
+- kill_recovery_sec: 샤드 1개를 죽인 뒤 그 매매들이 다른 샤드에서 다시 조회될 때까지(--kill, 대체 샤드 기동 + 저널 인수)
+를 측정해 JSON 으로 출력(코어 수도 함께 기록, 코어 수 이상으로는 늘지 않음)
+가짜 거래소는 샤드 프로세스마다 따로 있으므로 체결/가격은 샤드끼리 공유하지 않음
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def protected(status):
+    info = (status or {}).get("info") or {}
+    return info.get("tp_order_id") is not None and info.get("sl_order") is not None
+
+
+def run_shards(count, args):
+    workdir = tempfile.mkdtemp(prefix="bench_shards_")
+    os.environ.update(
+        SHARD_COUNT=str(count),
+        FAKE_EXCHANGE="1",
+        FAKE_LATENCY_MS=str(args.latency_ms),
+        FAKE_JITTER_MS="0",
+        FAKE_VOLATILITY="0",
+        MARKET_WS_ENABLED="0",
+        PRIVATE_WS_ENABLED="0",
+        RECOVER_ON_START="1",
+        JOURNAL_PATH=os.path.join(workdir, "trade_journal.jsonl"),
+        JOURNAL_FSYNC="0",
+        JOURNAL_SECRET_KEY="bench",
+        LOG_FILE=os.path.join(workdir, "log.txt"),
+        LOG_CONSOLE="0",
+        KLINE_STORE_DIR=os.path.join(workdir, "kline_store"),
+    )
+    import shard_supervisor
+    supervisor = shard_supervisor.ShardSupervisor(count)
+    try:
+        t0 = time.perf_counter()
+        supervisor.start()
+        startup = time.perf_counter() - t0
+
+        exit_time = (datetime.now(timezone(timedelta(hours=9))) + timedelta(days=1)).strftime("%Y-%m-%d %H:%M")
+        users = [f"u{i}" for i in range(args.trades)]
+        t0 = time.perf_counter()
+        for i, user_id in enumerate(users):
+            res = supervisor.start_trade(user_id, {
+                "user_id": user_id, "api_key": user_id, "api_secret": "s", "position_type": "long",
+                "symbol": f"S{i % args.symbols}USDT", "fixed_loss": 1,
+                "entry_time": exit_time, "exit_time": exit_time, "immediate": True,
+            })
+            if not res.get("success"):
+                raise RuntimeError(res)
+        started = time.perf_counter() - t0
+
+        pending = set(users)
+        deadline = time.monotonic() + args.timeout
+        while pending and time.monotonic() < deadline:
+            pending = {u for u in pending if not protected(supervisor.get(u))}
+            time.sleep(0.05)
+        protected_sec = time.perf_counter() - t0
+
+        counter = [0]
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def poll():
+            rng = random.Random()
+            n = 0
+            while not stop.is_set():
+                supervisor.get(rng.choice(users))
+                n += 1
+            with lock:
+                counter[0] += n
+
+        threads = [threading.Thread(target=poll) for _ in range(args.clients)]
+        for t in threads:
+            t.start()
+        time.sleep(args.status_sec)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        kill_recovery = None
+        if args.kill and count > 1:
+            victim = min(supervisor._shards)
+            moved = [u for u in users if supervisor._route(u).shard_id == victim]
+            t0 = time.perf_counter()
+            supervisor._shards[victim].process.kill()
+            deadline = time.monotonic() + args.timeout
+            while time.monotonic() < deadline:
+                # 샤드마다 가짜 거래소가 따로라 인수한 샤드에는 포지션이 없음(복구 결과는 종료로 보임) → 조회 가능 여부만
+                if all(supervisor.get(u) is not None for u in moved):
+                    kill_recovery = round(time.perf_counter() - t0, 3)
+                    break
+                time.sleep(0.2)
+
+        return {
+            "shards": count,
+            "trades": args.trades,
+            "startup_sec": round(startup, 3),
+            "start_per_sec": round(args.trades / started, 1),
+            "protected": args.trades - len(pending),
+            "protected_per_sec": round((args.trades - len(pending)) / protected_sec, 1),
+            "status_per_sec": round(counter[0] / args.status_sec, 1),
+            "kill_recovery_sec": kill_recovery,
+            "stats": {k: v for k, v in supervisor.stats().items() if k != "shards"},
+        }
+    finally:
+        supervisor.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", default="1,2,4", help="샤드 수 목록(쉼표)")
+    parser.add_argument("--trades", type=int, default=400)
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=2)
+    parser.add_argument("--clients", type=int, default=16, help="상태 조회 동시 쓰레드 수")
+    parser.add_argument("--status-sec", type=float, default=3)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--kill", type=int, choices=[0, 1], default=1, help="샤드 1개 강제 종료 후 재배정 시간 측정")
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    parser.add_argument("--count", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.count:
+        print(json.dumps(run_shards(args.count, args)))
+        return
+
+    runs = []
+    for count in [int(s) for s in args.shards.split(",") if s.strip()]:
+        cmd = [sys.executable, __file__, "--count", str(count)]
+        for name in ("trades", "symbols", "latency_ms", "clients", "status_sec", "timeout", "kill"):
+            cmd += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    result = {"cpu_count": os.cpu_count(), "runs": runs}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+매매 경로 단계별 지연 측정(가짜 거래소 대상, api_server → trade_worker 전 구간)
+
+    python benchmarks/bench_trade_latency.py --scales 1,10,100,1000 --out bench_latency.json
+    python benchmarks/bench_trade_latency.py --scales 1,100 --compare bench_latency.json
+
+매매 수(scale)마다 별도 프로세스에서 /start_trade 로 N건 시작 → 같은 진입 마감 → 모두 진입 후
+가격을 손절가 아래로 내려 청산시키고 단계별 분포를 측정
+- deadline_to_entry_sent: 진입 마감 ~ 진입 주문 발송
+- entry_rtt: 진입 주문 발송 ~ 응답
+- entry_to_protected: 진입 주문 응답 ~ 익절/손절 보호주문 응답
+- position_gone_to_status: 거래소에서 포지션 0 ~ 상태저장소 반영(/trade_status 에 보이는 시점)
+- api_start_trade / api_trade_status: 요청 처리 시간
+매매당 메모리(RSS 증가분), 쓰레드 수, 엔드포인트별 호출 수와 함께 JSON 으로 저장
+--compare 로 이전 결과와 p50/p99 차이 출력(커밋 간 회귀 비교)
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STAGES = ("deadline_to_entry_sent", "entry_rtt", "entry_to_protected", "position_gone_to_status",
+          "api_start_trade", "api_trade_status")
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 2) if values else None
+
+
+def summarize(values):
+    return {"n": len(values), "p50": pct(values, 0.5), "p90": pct(values, 0.9), "p99": pct(values, 0.99),
+            "max": pct(values, 1.0)}
+
+
+class TimedSession:
+    """
+    가짜 거래소 세션을 감싸 주문/보호주문 발송·응답 시각을 api_key 별로 기록
+    """
+
+    def __init__(self, session, api_key, marks):
+        self._session = session
+        self._api_key = api_key
+        self._marks = marks
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def _timed(self, kind, fn, **kwargs):
+        sent = time.time()
+        try:
+            return fn(**kwargs)
+        finally:
+            self._marks[self._api_key].setdefault(kind, (sent, time.time()))
+
+    def place_order(self, **kwargs):
+        if kwargs.get("reduceOnly"):
+            kind = "tp" if kwargs.get("orderType") == "Limit" else "exit"
+        else:
+            kind = "entry"
+        return self._timed(kind, self._session.place_order, **kwargs)
+
+    def set_trading_stop(self, **kwargs):
+        return self._timed("sl", self._session.set_trading_stop, **kwargs)
+
+
+def run_scale(n, args):
+    os.environ.update(
+        FAKE_EXCHANGE="1",
+        FAKE_LATENCY_MS=str(args.latency_ms),
+        FAKE_JITTER_MS=str(args.jitter_ms),
+        FAKE_VOLATILITY="0",
+        MARKET_WS_ENABLED="0",
+        PRIVATE_WS_ENABLED="0",
+        JOURNAL_ENABLED="0",
+        RECOVER_ON_START="0",
+        STATE_BACKEND="memory",
+        TRADE_ENGINE=args.engine,
+        ENTRY_DISPATCH="1" if args.dispatch else "0",
+        PREARM_SECONDS=str(args.lead / 2),
+    )
+    import api_server
+    import trade_worker as tw
+    from fake_exchange import exchange
+
+    exchange.start(0.02)
+    marks = defaultdict(dict)
+    fake_factory = tw.session_pool.session_factory
+    tw.session_pool.session_factory = lambda api_key, api_secret, testnet: (
+        TimedSession(fake_factory(api_key, api_secret, testnet), api_key, marks)
+        if api_key else fake_factory(api_key, api_secret, testnet))
+    if args.ip_rate:
+        from rate_limiter import RateLimiter
+        tw.session_pool.limiter = RateLimiter(ip_rate=args.ip_rate, ip_burst=args.ip_rate)
+    else:
+        tw.session_pool.limiter = None
+
+    # 상태저장소 반영 시각(매매 종료 = running False 가 처음 보인 시각)
+    store = api_server.state_store
+    published = store.publish
+    stopped_at = {}
+
+    def publish(user_id, status):
+        if not status.get("running") and user_id not in stopped_at:
+            stopped_at[user_id] = time.time()
+        return published(user_id, status)
+
+    store.publish = publish
+    client = api_server.app.test_client()
+
+    # 공용 쓰레드/종목정보 캐시를 띄운 뒤 기준값 측정
+    client.get("/trade_status?user_id=warmup")
+    tw.instrument_cache.start()
+    tw.clock_sync.start()
+    time.sleep(0.5)
+    base_rss, base_threads = rss_kb(), threading.active_count()
+
+    deadline = time.time() + args.lead
+    tw.trade_deadlines = lambda entry_time, exit_time: (deadline - args.lead / 2, deadline, deadline + 3600, 0.0)
+
+    users = [f"u{i}" for i in range(n)]
+    start_ms = []
+    for i, user_id in enumerate(users):
+        t0 = time.perf_counter()
+        res = client.post("/start_trade", json={
+            "user_id": user_id, "api_key": user_id, "api_secret": "s", "position_type": "long",
+            "symbol": f"S{i % args.symbols}USDT", "fixed_loss": 1,
+            "entry_time": "2000-01-01 00:00", "exit_time": "2000-01-01 00:00",
+        })
+        start_ms.append((time.perf_counter() - t0) * 1000)
+        if not res.get_json()["success"]:
+            raise RuntimeError(res.get_json())
+    registered_by = time.time()
+
+    def protected(m):
+        acks = [m[k][1] for k in ("tp", "sl") if k in m]
+        return max(acks) if acks else None
+
+    wait_until = deadline + args.timeout
+    while time.time() < wait_until and sum(1 for u in users if protected(marks[u])) < n:
+        time.sleep(0.05)
+    time.sleep(0.5)
+    peak_rss, peak_threads = rss_kb(), threading.active_count()
+
+    status_ms = []
+    for user_id in users[:min(n, 200)]:
+        t0 = time.perf_counter()
+        client.get(f"/trade_status?user_id={user_id}")
+        status_ms.append((time.perf_counter() - t0) * 1000)
+
+    # 심볼별로 가장 낮은 손절가 아래로 가격을 내려 모든 포지션 청산
+    lowest = {}
+    for i, user_id in enumerate(users):
+        sl = api_server.trade_statuses[user_id]["info"].get("sl_price")
+        symbol = f"S{i % args.symbols}USDT"
+        if sl:
+            lowest[symbol] = min(lowest.get(symbol, sl), sl)
+    for symbol, sl in lowest.items():
+        exchange.set_price(symbol, sl * 0.98)
+    wait_until = time.time() + args.timeout
+    while time.time() < wait_until and len(stopped_at) < n:
+        time.sleep(0.05)
+
+    closed = {api_key: ts for ts, api_key, _, _ in exchange.close_log}
+    stages = {
+        "deadline_to_entry_sent": [(marks[u]["entry"][0] - deadline) * 1000 for u in users if "entry" in marks[u]],
+        "entry_rtt": [(marks[u]["entry"][1] - marks[u]["entry"][0]) * 1000 for u in users if "entry" in marks[u]],
+        "entry_to_protected": [(protected(marks[u]) - marks[u]["entry"][1]) * 1000
+                               for u in users if "entry" in marks[u] and protected(marks[u])],
+        "position_gone_to_status": [(stopped_at[u] - closed[u]) * 1000 for u in users if u in closed and u in stopped_at],
+        "api_start_trade": start_ms,
+        "api_trade_status": status_ms,
+    }
+    exchange.stop()
+    return {
+        "trades": n,
+        "entered": sum(1 for u in users if "entry" in marks[u]),
+        "exited": len(stopped_at),
+        "registered_before_deadline": registered_by < deadline - args.lead / 2,
+        "stages_ms": {name: summarize(values) for name, values in stages.items()},
+        "rss_kb_per_trade": round((peak_rss - base_rss) / n, 1),
+        "threads_base": base_threads,
+        "threads_peak": peak_threads,
+        "threads_per_trade": round((peak_threads - base_threads) / n, 2),
+        "calls": exchange.stats()["calls"],
+    }
+
+
+def compare(old, new):
+    """
+    같은 매매 수끼리 단계별 p50/p99 차이(ms, 양수 = 느려짐)
+    """
+    old_runs = {r["trades"]: r for r in old["runs"]}
+    rows = []
+    for run in new["runs"]:
+        prev = old_runs.get(run["trades"])
+        if prev is None:
+            continue
+        for stage in STAGES:
+            a, b = prev["stages_ms"].get(stage, {}), run["stages_ms"].get(stage, {})
+            if a.get("p50") is None or b.get("p50") is None:
+                continue
+            rows.append({"trades": run["trades"], "stage": stage,
+                         "p50_delta": round(b["p50"] - a["p50"], 2), "p99_delta": round(b["p99"] - a["p99"], 2)})
+        rows.append({"trades": run["trades"], "stage": "rss_kb_per_trade",
+                     "delta": round(run["rss_kb_per_trade"] - prev["rss_kb_per_trade"], 1)})
+    return {"against": old["meta"].get("commit"), "rows": rows}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="1,10,100,1000", help="동시 매매 수 목록(쉼표)")
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--jitter-ms", type=float, default=3)
+    parser.add_argument("--engine", choices=["thread", "async"], default="thread")
+    parser.add_argument("--dispatch", type=int, choices=[0, 1], default=1, help="공용 진입 디스패처 사용")
+    parser.add_argument("--lead", type=float, default=8, help="시작 후 진입 마감까지(초)")
+    parser.add_argument("--timeout", type=float, default=60, help="진입/청산 완료 대기 상한(초)")
+    parser.add_argument("--ip-rate", type=float, default=0, help="서버 IP 초당 호출 한도(0: 제한 없음)")
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scale:
+        # 가짜 거래소 캔들이 진입 경로가 읽는 실제 ./kline_store 에 섞이지 않도록 임시 디렉터리 사용
+        root = tempfile.mkdtemp(prefix="kline_store_")
+        os.environ["KLINE_STORE_DIR"] = root
+        try:
+            print(json.dumps(run_scale(args.scale, args)))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        return
+
+    runs = []
+    for n in [int(s) for s in args.scales.split(",") if s.strip()]:
+        cmd = [sys.executable, __file__, "--scale", str(n)]
+        for name in ("symbols", "latency_ms", "jitter_ms", "engine", "dispatch", "lead", "timeout", "ip_rate"):
+            cmd += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "engine": args.engine,
+            "dispatch": bool(args.dispatch),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "ip_rate": args.ip_rate,
+        },
+        "runs": runs,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            result["compare"] = compare(json.load(f), result)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
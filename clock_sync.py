@@ -0,0 +1,129 @@
+import os
+import time
+import logging
+import threading
+import statistics
+from collections import deque
+from datetime import datetime
+
+import pytz
+from session_pool import session_pool
+
+# === 거래소(Bybit) 서버시각 동기화 ===
+CLOCK_SYNC_INTERVAL_SEC = float(os.getenv("CLOCK_SYNC_INTERVAL_SEC", "30"))
+CLOCK_SYNC_WINDOW = int(os.getenv("CLOCK_SYNC_WINDOW", "16"))
+CLOCK_EARLY_FIRE = os.getenv("CLOCK_EARLY_FIRE", "1") == "1"   # 왕복지연/2 만큼 일찍 주문 발사
+
+
+def bybit_server_time(session):
+    """
+    pybit 세션으로 거래소 서버시각(epoch 초) 조회
+    """
+    res = session.get_server_time()
+    result = res['result']
+    if result.get('timeNano'):
+        return int(result['timeNano']) / 1e9
+    return float(result['timeSecond'])
+
+
+class ClockSync:
+    """
+    - 거래소 서버시각을 주기적으로 샘플링해 로컬시계와의 오차(offset)/왕복지연(RTT) 추정
+    - 최근 샘플 중 RTT가 작은 절반만 골라 offset 중앙값 사용(지연 튀는 샘플 제거)
+    - now(): 보정된 현재시각(epoch 초), fire_lead(): 조기 발사 여유시간(초)
+    - time_source/server_time_fn 교체로 가짜 시계 테스트 가능
+    """
+
+    def __init__(self, server_time_fn=None, time_source=time.time,
+                 window=CLOCK_SYNC_WINDOW, interval=CLOCK_SYNC_INTERVAL_SEC,
+                 early_fire=CLOCK_EARLY_FIRE):
+        self.server_time_fn = server_time_fn or (lambda: bybit_server_time(session_pool.public()))
+        self.time_source = time_source
+        self.interval = interval
+        self.early_fire = early_fire
+        self._samples = deque(maxlen=window)   # (offset, rtt)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.offset = 0.0
+        self.rtt = None
+        self.jitter = None
+        self.last_sync = None
+
+    # --- 샘플링/추정 ---
+    def sample(self):
+        t0 = self.time_source()
+        server = self.server_time_fn()
+        t1 = self.time_source()
+        rtt = t1 - t0
+        offset = server - (t0 + t1) / 2
+        with self._lock:
+            self._samples.append((offset, rtt))
+            self._estimate()
+            self.last_sync = t1
+        return offset, rtt
+
+    def _estimate(self):
+        ranked = sorted(self._samples, key=lambda s: s[1])
+        best = ranked[:max(1, len(ranked) // 2)]
+        offsets = [s[0] for s in best]
+        self.offset = statistics.median(offsets)
+        self.rtt = statistics.median([s[1] for s in best])
+        all_offsets = [s[0] for s in self._samples]
+        self.jitter = statistics.pstdev(all_offsets) if len(all_offsets) > 1 else 0.0
+
+    def sync(self, count=4):
+        """
+        연속 샘플 count회(실패 샘플은 건너뜀), 성공 횟수 반환
+        """
+        ok = 0
+        for _ in range(count):
+            try:
+                self.sample()
+                ok += 1
+            except Exception as e:
+                logging.error("[시계동기화] 서버시각 조회 실패: %s", e)
+        return ok
+
+    # --- 보정 시각 ---
+    def now(self):
+        return self.time_source() + self.offset
+
+    def now_utc(self):
+        return datetime.fromtimestamp(self.now(), tz=pytz.utc)
+
+    def fire_lead(self):
+        if not self.early_fire or self.rtt is None:
+            return 0.0
+        return self.rtt / 2
+
+    # --- 백그라운드 동기화 ---
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sync_loop, name="clock-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _sync_loop(self):
+        while not self._stop.is_set():
+            self.sync()
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "offset_ms": round(self.offset * 1000, 3),
+                "rtt_ms": round(self.rtt * 1000, 3) if self.rtt is not None else None,
+                "jitter_ms": round(self.jitter * 1000, 3) if self.jitter is not None else None,
+                "fire_lead_ms": round(self.fire_lead() * 1000, 3),
+                "samples": len(self._samples),
+                "last_sync": self.last_sync,
+            }
+
+
+# 프로세스 공용 인스턴스
+clock_sync = ClockSync()
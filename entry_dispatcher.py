@@ -0,0 +1,306 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import trade_worker as tw
+
+# === 같은 진입 시각 매매 묶음 처리(thundering herd 방지) ===
+ENTRY_ORDER_CONCURRENCY = int(os.getenv("ENTRY_ORDER_CONCURRENCY", "64"))   # 진입 주문 동시 발송 상한
+ENTRY_PROTECT_CONCURRENCY = int(os.getenv("ENTRY_PROTECT_CONCURRENCY", "64"))  # 익절/손절 발송 동시 처리 상한
+ENTRY_READ_WORKERS = int(os.getenv("ENTRY_READ_WORKERS", "16"))             # 심볼별 공용 조회 동시 실행 수
+ENTRY_FAIRNESS = os.getenv("ENTRY_FAIRNESS", "round_robin")                 # fifo | random | round_robin
+
+
+def order_by_fairness(tickets, policy):
+    """
+    진입 주문 발송 순서
+    - fifo: 등록 순서
+    - random: 매 회차 무작위(항상 늦게 등록한 사람이 뒤로 밀리지 않음)
+    - round_robin: 계정(API 키)별로 한 건씩 번갈아(매매가 많은 계정이 앞쪽을 독차지하지 않음)
+    """
+    tickets = sorted(tickets, key=lambda t: t.seq)
+    if policy == "random":
+        random.shuffle(tickets)
+        return tickets
+    if policy == "round_robin":
+        by_account = OrderedDict()
+        for t in tickets:
+            by_account.setdefault(t.account, deque()).append(t)
+        ordered = []
+        while by_account:
+            for account in list(by_account):
+                queue = by_account[account]
+                ordered.append(queue.popleft())
+                if not queue:
+                    del by_account[account]
+        return ordered
+    return tickets
+
+
+class EntryTicket:
+    """
+    매매 1건의 진입 요청(워커는 done 이 될 때까지 wake 로 대기)
+    """
+    __slots__ = ("seq", "deadline", "session", "trade_statuses", "user_id", "symbol", "position_type",
+                 "fixed_loss", "take_profit", "account", "wake", "cancelled", "done", "error", "queued_ms")
+
+    def __init__(self, seq, deadline, session, trade_statuses, user_id, symbol, position_type,
+                 fixed_loss, take_profit, account, wake):
+        self.seq = seq
+        self.deadline = deadline
+        self.session = session
+        self.trade_statuses = trade_statuses
+        self.user_id = user_id
+        self.symbol = symbol
+        self.position_type = position_type
+        self.fixed_loss = fixed_loss
+        self.take_profit = take_profit
+        self.account = account
+        self.wake = wake
+        self.cancelled = False
+        self.done = False
+        self.error = None
+        self.queued_ms = None
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _EntryGroup:
+    __slots__ = ("deadline", "lead", "tickets", "jobs", "levels", "level_states", "feeds", "fired")
+
+    def __init__(self, deadline, lead):
+        self.deadline = deadline
+        self.lead = lead
+        self.tickets = []
+        self.jobs = []
+        self.levels = {}
+        self.level_states = {}
+        self.feeds = []
+        self.fired = False
+
+
+class EntryDispatcher:
+    """
+    - 진입 시각이 같은 매매를 한 그룹으로 묶고 그룹마다 사전준비/진입 마감 1개만 스케줄
+      (묶는 기준은 명목 진입 시각, 왕복지연/2 앞당김은 그룹 생성 시 1번만 적용)
+    - 사전준비: 그룹의 심볼별 캔들/종목정보를 한 번씩만 조회
+    - 진입: 심볼별 현재가 1회 조회(사전준비 뒤 봉 경계를 넘었으면 캔들도 심볼별 1회 재조회)
+      → 매매별 손절가/수량은 로컬 계산
+      → 공정성 정책 순서로 크기 제한된 쓰레드풀에서 진입 주문, 보호주문은 별도 풀
+    - 매매별 대기시간(마감 ~ 진입 주문 시작)을 trade_statuses 에 entry_queue_ms 로 기록
+    """
+
+    def __init__(self, order_concurrency=ENTRY_ORDER_CONCURRENCY, protect_concurrency=ENTRY_PROTECT_CONCURRENCY,
+                 read_workers=ENTRY_READ_WORKERS, fairness=ENTRY_FAIRNESS):
+        self.order_concurrency = order_concurrency
+        self.protect_concurrency = protect_concurrency
+        self.read_workers = read_workers
+        self.fairness = fairness
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._pools = None
+        self.groups_fired = 0
+        self.tickets_fired = 0
+        self.last_groups = deque(maxlen=20)
+
+    def _ensure_pools(self):
+        if self._pools is None:
+            with self._lock:
+                if self._pools is None:
+                    self._pools = (
+                        ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix="entry-read"),
+                        ThreadPoolExecutor(max_workers=self.order_concurrency, thread_name_prefix="entry-order"),
+                        ThreadPoolExecutor(max_workers=self.protect_concurrency, thread_name_prefix="entry-protect"),
+                    )
+        return self._pools
+
+    def register(self, prearm_ts, deadline, session, trade_statuses, user_id, symbol, position_type,
+                 fixed_loss, take_profit, account, wake):
+        """
+        명목 진입 시각(deadline, 거래소 시계 epoch 초, 앞당김 전)에 합류, 반환된 티켓이 done 이 되면 wake.set()
+        """
+        self._ensure_pools()
+        key = round(deadline, 3)
+        with self._lock:
+            self._seq += 1
+            ticket = EntryTicket(self._seq, deadline, session, trade_statuses, user_id, symbol, position_type,
+                                 fixed_loss, take_profit, account, wake)
+            group = self._groups.get(key)
+            if group is None or group.fired:
+                group = _EntryGroup(deadline, tw.clock_sync.fire_lead())
+                self._groups[key] = group
+                # 스케줄러 쓰레드를 막지 않도록 그룹 처리는 별도 쓰레드에서(그룹 수만큼만 생김)
+                group.jobs.append(tw.scheduler.schedule(
+                    prearm_ts, lambda: self._spawn(self._prearm, group), f"entry-group:{key}:arm"))
+                group.jobs.append(tw.scheduler.schedule(
+                    deadline - group.lead, lambda: self._spawn(self._fire, group, key), f"entry-group:{key}:entry"))
+            group.tickets.append(ticket)
+        return ticket
+
+    @staticmethod
+    def _spawn(target, *args):
+        threading.Thread(target=target, args=args, name="entry-group", daemon=True).start()
+
+    # --- 심볼별 공용 조회 ---
+    def _shared_levels(self, group, symbols):
+        """
+        심볼별 지지/저항선 인덱스를 그룹에 보관
+        - 최신 마감봉이 빠졌으면(사전준비 뒤 :00/:30 봉 경계를 넘음) 심볼별 1회 재조회, 실패하면 level_states=stale
+        """
+        session = tw.session_pool.public()
+        read_pool = self._pools[0]
+        missing = [s for s in symbols if s not in group.levels]
+        if missing:
+            tw.instrument_cache.get_many(missing, session)
+            for symbol, levels in zip(missing, read_pool.map(lambda s: tw.get_level_index(session, s), missing)):
+                group.levels[symbol] = levels
+        stale = [s for s in symbols if not tw.levels_current(group.levels[s])]
+        group.level_states.update((s, "current") for s in symbols if s not in stale)
+        refreshed = read_pool.map(lambda s: tw.refresh_level_index(session, s, group.levels[s]), stale)
+        for symbol, (levels, state) in zip(stale, refreshed):
+            group.levels[symbol] = levels
+            group.level_states[symbol] = state
+
+    def _prearm(self, group):
+        try:
+            symbols = sorted({t.symbol for t in group.tickets if not t.cancelled})
+            if tw.MARKET_WS_ENABLED:
+                for symbol in symbols:
+                    tw.market_data.acquire(symbol)
+                    group.feeds.append(symbol)
+            self._shared_levels(group, symbols)
+            for t in group.tickets:
+                if not t.cancelled:
+                    tw.set_info(t.trade_statuses, t.user_id, armed_at=tw.now_kst_str(), dispatch_group=len(group.tickets))
+        except Exception as e:
+            logging.error("[진입 그룹 사전준비 실패] %s", e)
+
+    def _fire(self, group, key):
+        fire_ts = time.time()
+        with self._lock:
+            group.fired = True
+            if self._groups.get(key) is group:
+                del self._groups[key]
+        tickets = [t for t in group.tickets if not t.cancelled]
+        _, order_pool, protect_pool = self._pools
+        try:
+            symbols = sorted({t.symbol for t in tickets})
+            session = tw.session_pool.public()
+            # 현재가 조회와 캔들 재확인을 동시에
+            price_futures = [self._pools[0].submit(tw.get_price, session, s) for s in symbols]
+            self._shared_levels(group, symbols)
+            prices = dict(zip(symbols, [f.result() for f in price_futures]))
+            instruments = tw.instrument_cache.get_many(symbols, session)
+        except Exception as e:
+            logging.exception("[진입 그룹 공용 조회 실패] %s", e)
+            prices, instruments = {}, {}
+        read_ms = (time.time() - fire_ts) * 1000
+
+        remaining = [len(tickets)]
+        delays = []
+        done_lock = threading.Lock()
+
+        def finish(ticket, error=None):
+            ticket.error = error
+            ticket.done = True
+            ticket.wake.set()
+            with done_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._record_group(group, fire_ts, read_ms, delays)
+
+        def protect(ticket, entry):
+            try:
+                tw.protect_entry(ticket.session, ticket.trade_statuses, ticket.user_id, ticket.symbol, entry)
+                finish(ticket)
+            except Exception as e:
+                logging.exception("[보호주문 에러] %s: %s", ticket.user_id, e)
+                finish(ticket, str(e))
+
+        def enter(ticket):
+            queued_ms = (time.time() - fire_ts) * 1000
+            ticket.queued_ms = queued_ms
+            with done_lock:
+                delays.append(queued_ms)
+            try:
+                if ticket.cancelled:
+                    finish(ticket)
+                    return
+                plan = self._plan(ticket, prices.get(ticket.symbol), group.levels.get(ticket.symbol),
+                                  instruments.get(ticket.symbol), group.level_states.get(ticket.symbol, "current"))
+                tw.set_info(ticket.trade_statuses, ticket.user_id, entry_queue_ms=round(queued_ms, 2))
+                entry = tw.send_entry(ticket.session, ticket.trade_statuses, ticket.user_id, ticket.symbol,
+                                      ticket.position_type, ticket.fixed_loss, ticket.take_profit, plan,
+                                      prices.get(ticket.symbol))
+                # 진입 주문 슬롯은 바로 반납, 보호주문은 별도 풀에서
+                protect_pool.submit(protect, ticket, entry)
+            except Exception as e:
+                logging.exception("[진입 에러] %s: %s", ticket.user_id, e)
+                finish(ticket, str(e))
+
+        if not tickets:
+            self._release_feeds(group)
+            return
+        for ticket in order_by_fairness(tickets, self.fairness):
+            order_pool.submit(enter, ticket)
+        self._release_feeds(group)
+
+    @staticmethod
+    def _plan(ticket, price, levels, instrument, levels_state):
+        """
+        공용 조회값으로 매매별 진입 계획 계산(없으면 None → send_entry 가 직접 조회)
+        - 캔들 확인은 그룹에서 끝냈으므로 levels_state 를 넣어 finalize_entry 가 다시 조회하지 않게 함
+        """
+        if price is None or levels is None or instrument is None:
+            return None
+        plan = tw.compute_entry_plan(ticket.position_type, ticket.fixed_loss, price, levels,
+                                     instrument['tick_size'], instrument['min_qty'], instrument['qty_step'])
+        plan["prepared_at"] = time.time()
+        plan["levels_state"] = levels_state
+        return plan
+
+    def _release_feeds(self, group):
+        for symbol in group.feeds:
+            tw.market_data.release(symbol)
+        group.feeds = []
+
+    def _record_group(self, group, fire_ts, read_ms, delays):
+        delays = sorted(delays)
+        n = len(delays)
+        summary = {
+            "deadline": group.deadline,
+            "lead_ms": round(group.lead * 1000, 3),
+            "tickets": n,
+            "symbols": len({t.symbol for t in group.tickets}),
+            "read_ms": round(read_ms, 2),
+            "queue_p50_ms": round(delays[n // 2], 2) if n else None,
+            "queue_p99_ms": round(delays[min(n - 1, int(n * 0.99))], 2) if n else None,
+            "total_ms": round((time.time() - fire_ts) * 1000, 2),
+        }
+        with self._lock:
+            self.groups_fired += 1
+            self.tickets_fired += n
+            self.last_groups.append(summary)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending_groups": len(self._groups),
+                "pending_tickets": sum(len(g.tickets) for g in self._groups.values()),
+                "groups_fired": self.groups_fired,
+                "tickets_fired": self.tickets_fired,
+                "fairness": self.fairness,
+                "order_concurrency": self.order_concurrency,
+                "last_groups": list(self.last_groups),
+            }
+
+
+# 프로세스 공용 인스턴스
+entry_dispatcher = EntryDispatcher()
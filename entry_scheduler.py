@@ -0,0 +1,109 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+# === 진입/청산 마감시각 스케줄러 ===
+MAX_SLEEP_SEC = 1.0       # 긴 대기도 이 간격마다 시계를 다시 읽어 보정
+SPIN_MARGIN_SEC = 0.002   # 마감 직전 구간은 짧게 양보하며 정밀 대기
+
+
+class ScheduledJob:
+    __slots__ = ("deadline", "callback", "name", "cancelled", "fired_at", "overdue")
+
+    def __init__(self, deadline, callback, name=None, overdue=False):
+        self.deadline = deadline
+        self.overdue = overdue  # 등록 시점에 이미 지난 마감(지연 통계 제외)
+        self.callback = callback
+        self.name = name
+        self.cancelled = False
+        self.fired_at = None
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class DeadlineScheduler:
+    """
+    - 마감시각 min-heap + 단일 타이머 쓰레드(유저 수와 무관하게 쓰레드 1개)
+    - 다음 마감까지만 대기하고, 긴 대기는 MAX_SLEEP_SEC 단위로 끊어 시계 보정값을 반영
+    - clock: 현재 시각(epoch 초)을 돌려주는 함수(거래소 시계 보정 시 교체)
+    - 콜백은 타이머 쓰레드에서 실행되므로 이벤트 set 정도의 짧은 작업만 넣을 것
+    """
+
+    def __init__(self, clock=time.time, max_sleep=MAX_SLEEP_SEC, spin_margin=SPIN_MARGIN_SEC):
+        self.clock = clock
+        self.max_sleep = max_sleep
+        self.spin_margin = spin_margin
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.fired = 0
+        self.max_lateness_ms = 0.0
+
+    def schedule(self, deadline, callback, name=None):
+        job = ScheduledJob(deadline, callback, name, overdue=deadline <= self.clock())
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._seq), job))
+            self._ensure_thread()
+            self._cond.notify()
+        return job
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for _, _, job in self._heap if not job.cancelled)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="deadline-scheduler", daemon=True)
+            self._thread.start()
+
+    def _next_due(self):
+        """
+        마감된 작업 1개를 꺼내 반환, 없으면 대기(조건변수 잠금 상태에서 호출)
+        """
+        while True:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._cond.wait()
+                continue
+            remaining = self._heap[0][0] - self.clock()
+            if remaining <= 0:
+                return heapq.heappop(self._heap)[2]
+            if remaining > self.spin_margin:
+                self._cond.wait(min(remaining - self.spin_margin, self.max_sleep))
+            else:
+                # 마감 직전: 잠금을 잠시 풀고 양보하며 정밀 대기
+                self._cond.release()
+                try:
+                    time.sleep(0)
+                finally:
+                    self._cond.acquire()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next_due()
+            now = self.clock()
+            job.fired_at = now
+            self.fired += 1
+            if not job.overdue:
+                self.max_lateness_ms = max(self.max_lateness_ms, (now - job.deadline) * 1000)
+            try:
+                job.callback()
+            except Exception as e:
+                logging.error("[스케줄러 콜백 에러] %s: %s", job.name, e)
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "fired": self.fired,
+            "max_lateness_ms": round(self.max_lateness_ms, 3),
+        }
+
+
+# 프로세스 공용 인스턴스
+scheduler = DeadlineScheduler()
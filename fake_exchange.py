@@ -0,0 +1,588 @@
+import os
+import math
+import time
+import uuid
+import queue
+import random
+import logging
+import threading
+from collections import Counter, deque
+
+from rate_limiter import ENDPOINT_LIMITS, DEFAULT_KEY_LIMIT, TokenBucket
+
+# === 부하/지연 테스트용 가짜 Bybit 거래소(프로세스 내, pybit HTTP 호출 모양 그대로) ===
+# FAKE_EXCHANGE=1 이면 session_pool 기본 세션이 이 거래소로 연결됨
+FAKE_LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "0"))      # 호출당 왕복지연
+FAKE_JITTER_MS = float(os.getenv("FAKE_JITTER_MS", "0"))        # 왕복지연 ± 흔들림
+FAKE_RATE_LIMIT = os.getenv("FAKE_RATE_LIMIT", "0") == "1"      # 키/엔드포인트별 한도 초과 시 10006 에러
+FAKE_VOLATILITY = float(os.getenv("FAKE_VOLATILITY", "0.0005"))  # 1초당 로그수익률 표준편차
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+FAKE_BALANCE = float(os.getenv("FAKE_BALANCE", "10000"))
+FAKE_SLIPPAGE_PCT = float(os.getenv("FAKE_SLIPPAGE_PCT", "0"))  # 시장가/손절 체결 불리한 방향 미끄러짐
+FAKE_MATCH_SEC = float(os.getenv("FAKE_MATCH_SEC", "0.1"))      # 백그라운드 체결 확인 주기
+
+TAKER_FEE = 0.00055
+MAKER_FEE = 0.0002
+
+# symbol -> (시작가, tickSize, qtyStep, minOrderQty), 목록에 없는 심볼은 처음 쓸 때 자동 생성
+DEFAULT_SYMBOLS = {
+    "BTCUSDT": (60000.0, 0.1, 0.001, 0.001),
+    "ETHUSDT": (3000.0, 0.01, 0.01, 0.01),
+    "SOLUSDT": (150.0, 0.01, 0.1, 0.1),
+    "XRPUSDT": (0.5, 0.0001, 1.0, 1.0),
+}
+DEFAULT_NEW_SYMBOL = (100.0, 0.01, 0.001, 0.001)
+
+
+class FakeBybitError(Exception):
+    """
+    pybit InvalidRequestError 와 같은 용도(retCode != 0)
+    """
+
+    def __init__(self, ret_code, message):
+        super().__init__(f"{message} (ErrCode: {ret_code})")
+        self.status_code = ret_code
+        self.message = message
+
+
+class PricePath:
+    """
+    시각 → 가격: step_sec 간격 로그 랜덤워크(seed 가 같으면 같은 경로)
+    - 과거 history_sec 구간부터 만들어 두어 캔들 조회가 바로 가능
+    - volatility=0 이면 고정가
+    """
+
+    def __init__(self, start, volatility=FAKE_VOLATILITY, step_sec=1.0, seed=FAKE_SEED, origin=None, history_sec=6 * 3600):
+        self.step = step_sec
+        self.volatility = volatility
+        self.origin = (origin if origin is not None else time.time()) - history_sec
+        self._prices = [start]
+        self._rng = random.Random(seed)
+
+    def _index(self, ts):
+        return max(0, int((ts - self.origin) / self.step))
+
+    def _extend(self, idx):
+        prices = self._prices
+        while len(prices) <= idx:
+            prices.append(prices[-1] * math.exp(self._rng.gauss(0.0, self.volatility)))
+
+    def at(self, ts):
+        idx = self._index(ts)
+        self._extend(idx)
+        return self._prices[idx]
+
+    def ohlc(self, start_ts, end_ts):
+        """
+        [start_ts, end_ts] 구간 (시가, 고가, 저가, 종가)
+        """
+        lo, hi = self._index(start_ts), self._index(end_ts)
+        self._extend(hi)
+        window = self._prices[lo:hi + 1]
+        return window[0], max(window), min(window), window[-1]
+
+    def pin(self, price, ts=None):
+        """
+        지금부터 price 에서 다시 출발(테스트에서 급등/급락 재현)
+        """
+        idx = self._index(ts if ts is not None else time.time())
+        self._extend(idx)
+        del self._prices[idx:]
+        self._prices.append(price)
+
+
+class _Account:
+    __slots__ = ("balance", "positions", "orders", "links", "last_match")
+
+    def __init__(self, balance):
+        self.balance = balance
+        self.positions = {}   # symbol -> {"side", "size", "avg", "stop_loss", "updated"}
+        self.orders = {}      # orderId -> {"symbol", "side", "qty", "price", "reduce_only", "created", "link_id"}
+        self.links = set()    # 이미 쓴 orderLinkId(중복이면 110072)
+        self.last_match = time.time()
+
+
+class FakeExchange:
+    """
+    - 계정(API 키)별 지갑/포지션(단방향)/미체결 주문
+    - 시장가: 현재가(± 미끄러짐)로 즉시 체결, 지정가(reduceOnly 익절): 가격이 닿으면 체결
+    - 포지션 손절(stopLoss): 직전 확인 이후 가격 범위가 손절가에 닿으면 전량 청산
+    - 체결 확인은 그 계정 호출 때마다 + start() 시 백그라운드 주기 확인
+    - 호출마다 지연(앞/뒤 절반씩), 한도 초과(FakeBybitError 10006), 엔드포인트별 호출 수 통계
+    - session_factory 를 session_pool 에 넣으면 trade_worker/api_server 가 그대로 사용
+    - private_ws_factory 를 position_stream 에 넣으면 주문/체결/포지션/지갑 변화를 private 스트림 메시지로 전달
+    """
+
+    def __init__(self, latency_ms=FAKE_LATENCY_MS, jitter_ms=FAKE_JITTER_MS, rate_limit=FAKE_RATE_LIMIT,
+                 volatility=FAKE_VOLATILITY, seed=FAKE_SEED, balance=FAKE_BALANCE, slippage_pct=FAKE_SLIPPAGE_PCT,
+                 symbols=None, clock=time.time):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_limit = rate_limit
+        self.volatility = volatility
+        self.seed = seed
+        self.initial_balance = balance
+        self.slippage = slippage_pct
+        self.clock = clock
+        self._instruments = {}
+        self._paths = {}
+        self._accounts = {}
+        self._buckets = {}
+        self._streams = {}    # api_key -> [FakePrivateWebSocket]
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.calls = Counter()
+        self.rejected = Counter()
+        self.fills = 0
+        self.order_log = deque(maxlen=100000)   # (도착시각, api_key, symbol, side, orderType, reduceOnly)
+        self.close_log = deque(maxlen=100000)   # (포지션 0 된 시각, api_key, symbol, 체결가)
+        for symbol, spec in (symbols or DEFAULT_SYMBOLS).items():
+            self.add_symbol(symbol, *spec)
+
+    # --- 종목/가격 ---
+    def add_symbol(self, symbol, price, tick_size, qty_step, min_qty, volatility=None):
+        with self._lock:
+            self._instruments[symbol] = (tick_size, qty_step, min_qty)
+            seed = self.seed * 1000003 + sum(ord(c) for c in symbol)
+            self._paths[symbol] = PricePath(price, self.volatility if volatility is None else volatility,
+                                            seed=seed, origin=self.clock())
+
+    def _symbol(self, symbol):
+        if symbol not in self._instruments:
+            self.add_symbol(symbol, *DEFAULT_NEW_SYMBOL)
+        return symbol
+
+    def price(self, symbol):
+        with self._lock:
+            return self._paths[self._symbol(symbol)].at(self.clock())
+
+    def set_price(self, symbol, price):
+        with self._lock:
+            self._paths[self._symbol(symbol)].pin(price, self.clock())
+
+    def _round_price(self, symbol, price):
+        tick = self._instruments[symbol][0]
+        return round(round(price / tick) * tick, 10)
+
+    # --- 세션 ---
+    def session_factory(self, api_key, api_secret=None, testnet=False):
+        return FakeSession(self, api_key)
+
+    def private_ws_factory(self, api_key, api_secret=None, testnet=False):
+        return FakePrivateWebSocket(self, api_key)
+
+    def _subscribe(self, api_key, ws):
+        with self._lock:
+            self._streams.setdefault(api_key, []).append(ws)
+
+    def _unsubscribe(self, api_key, ws):
+        with self._lock:
+            streams = self._streams.get(api_key) or []
+            if ws in streams:
+                streams.remove(ws)
+            if not streams:
+                self._streams.pop(api_key, None)
+
+    def _publish(self, api_key, topic, data):
+        for ws in self._streams.get(api_key) or ():
+            ws.publish(topic, data)
+
+    def _publish_order(self, api_key, order_id, order, status):
+        if api_key in self._streams:
+            self._publish(api_key, "order", [{
+                "orderId": order_id, "orderLinkId": order.get("link_id", ""), "symbol": order["symbol"],
+                "side": order["side"], "orderType": order.get("type", "Limit"), "price": str(order.get("price") or 0),
+                "qty": str(order["qty"]), "reduceOnly": order["reduce_only"], "orderStatus": status,
+                "updatedTime": str(int(self.clock() * 1000)),
+            }])
+
+    def _account(self, api_key):
+        account = self._accounts.get(api_key)
+        if account is None:
+            account = self._accounts[api_key] = _Account(self.initial_balance)
+        return account
+
+    def _sleep(self, fraction):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, (self.latency + random.uniform(-self.jitter, self.jitter)) * fraction))
+
+    def call(self, api_key, endpoint, handler, *args):
+        """
+        지연 절반 → 한도 확인/체결 확인/처리 → 지연 절반
+        """
+        self._sleep(0.5)
+        try:
+            with self._lock:
+                self.calls[endpoint] += 1
+                if self.rate_limit and api_key:
+                    bucket = self._buckets.get((api_key, endpoint))
+                    if bucket is None:
+                        rate, burst = ENDPOINT_LIMITS.get(endpoint, DEFAULT_KEY_LIMIT)
+                        bucket = self._buckets[(api_key, endpoint)] = TokenBucket(rate, burst)
+                    if bucket.wait_time(time.monotonic()) > 0:
+                        self.rejected[endpoint] += 1
+                        raise FakeBybitError(10006, "Too many visits!")
+                    bucket.take()
+                if api_key:
+                    self._match(api_key, self._account(api_key))
+                return handler(*args)
+        finally:
+            self._sleep(0.5)
+
+    # --- 체결 ---
+    def _fill(self, api_key, account, symbol, side, qty, price, reduce_only, fee_rate, order_id=None):
+        """
+        단방향 포지션에 체결 반영, 실현손익/수수료는 지갑에 반영(private 스트림 구독 중이면 체결/포지션/지갑 메시지)
+        """
+        pos = account.positions.get(symbol)
+        closing = pos is not None and pos["side"] != side
+        filled = self._apply_fill(api_key, account, symbol, side, qty, price, reduce_only, fee_rate)
+        if api_key in self._streams:
+            if filled > 0:
+                self._publish(api_key, "execution", [{
+                    "symbol": symbol, "side": side, "orderId": order_id or "", "execPrice": str(price),
+                    "execQty": str(filled if reduce_only else qty), "closedSize": str(filled if closing else 0),
+                    "execTime": str(int(self.clock() * 1000)),
+                }])
+            self._publish(api_key, "position", [self._position_row(symbol, account.positions.get(symbol))])
+            self._publish(api_key, "wallet", self._wallet(api_key, None)["result"]["list"])
+        return filled
+
+    def _apply_fill(self, api_key, account, symbol, side, qty, price, reduce_only, fee_rate):
+        pos = account.positions.get(symbol)
+        now = self.clock()
+        account.balance -= qty * price * fee_rate
+        self.fills += 1
+        if pos is None or pos["side"] == side:
+            if reduce_only:
+                return 0.0
+            size = (pos["size"] if pos else 0.0) + qty
+            avg = ((pos["avg"] * pos["size"]) if pos else 0.0) + price * qty
+            account.positions[symbol] = {
+                "side": side, "size": round(size, 10), "avg": avg / size,
+                "stop_loss": pos["stop_loss"] if pos else None, "updated": now,
+            }
+            return qty
+        closed = min(qty, pos["size"])
+        sign = 1 if pos["side"] == "Buy" else -1
+        account.balance += (price - pos["avg"]) * closed * sign
+        remaining = round(pos["size"] - closed, 10)
+        if remaining > 0:
+            pos["size"] = remaining
+            pos["updated"] = now
+        else:
+            del account.positions[symbol]
+            self.close_log.append((time.time(), api_key, symbol, price))
+            # 포지션이 닫히면 남은 reduceOnly 주문은 거래소가 취소
+            for order_id in [oid for oid, o in account.orders.items() if o["symbol"] == symbol and o["reduce_only"]]:
+                self._publish_order(api_key, order_id, account.orders.pop(order_id), "Cancelled")
+            leftover = round(qty - closed, 10)
+            if leftover > 0 and not reduce_only:
+                account.positions[symbol] = {"side": side, "size": leftover, "avg": price, "stop_loss": None, "updated": now}
+        return closed
+
+    def _match(self, api_key, account):
+        now = self.clock()
+        since = account.last_match
+        account.last_match = now
+        if not account.positions and not account.orders:
+            return
+        for symbol in list(account.positions):
+            pos = account.positions.get(symbol)
+            if pos is None or not pos["stop_loss"]:
+                continue
+            _, high, low, _ = self._paths[symbol].ohlc(since, now)
+            stop = pos["stop_loss"]
+            if (pos["side"] == "Buy" and low <= stop) or (pos["side"] == "Sell" and high >= stop):
+                close_side = "Sell" if pos["side"] == "Buy" else "Buy"
+                price = stop * (1 - self.slippage if close_side == "Sell" else 1 + self.slippage)
+                self._fill(api_key, account, symbol, close_side, pos["size"], price, True, TAKER_FEE)
+        for order_id, order in list(account.orders.items()):
+            if order_id not in account.orders:
+                continue
+            _, high, low, _ = self._paths[order["symbol"]].ohlc(since, now)
+            if (order["side"] == "Sell" and high >= order["price"]) or (order["side"] == "Buy" and low <= order["price"]):
+                del account.orders[order_id]
+                self._publish_order(api_key, order_id, order, "Filled")
+                self._fill(api_key, account, order["symbol"], order["side"], order["qty"], order["price"],
+                           order["reduce_only"], MAKER_FEE, order_id)
+
+    def start(self, interval=FAKE_MATCH_SEC):
+        """
+        호출이 없어도 익절/손절이 체결되도록 주기적으로 전체 계정 확인
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._match_loop, args=(interval,), name="fake-exchange", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _match_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                with self._lock:
+                    for api_key, account in self._accounts.items():
+                        self._match(api_key, account)
+            except Exception as e:
+                logging.error("[가짜 거래소 체결 에러] %s", e)
+
+    # --- 엔드포인트 처리(잠금 안에서 호출) ---
+    def _server_time(self):
+        now = self.clock()
+        return _ok({"timeSecond": str(int(now)), "timeNano": str(int(now * 1e9))})
+
+    def _tickers(self, symbol):
+        price = self._paths[self._symbol(symbol)].at(self.clock())
+        p = str(self._round_price(symbol, price))
+        return _ok({"category": "linear", "list": [{"symbol": symbol, "lastPrice": p, "markPrice": p}]})
+
+    def _instruments_info(self, symbol):
+        symbols = [self._symbol(symbol)] if symbol else sorted(self._instruments)
+        items = []
+        for s in symbols:
+            tick, step, min_qty = self._instruments[s]
+            items.append({
+                "symbol": s,
+                "status": "Trading",
+                "priceFilter": {"tickSize": str(tick)},
+                "lotSizeFilter": {"qtyStep": str(step), "minOrderQty": str(min_qty)},
+            })
+        return _ok({"category": "linear", "list": items, "nextPageCursor": ""})
+
+    def _kline(self, symbol, interval, limit, start_ms=None, end_ms=None):
+        path = self._paths[self._symbol(symbol)]
+        span = int(interval) * 60
+        now = self.clock()
+        # end 가 있으면 그 시각이 속한 캔들부터, start 이전 캔들은 제외(최신순)
+        last = now if end_ms is None else min(now, end_ms / 1000)
+        current = int(last // span * span)
+        rows = []
+        for i in range(limit):
+            start = current - i * span
+            if start_ms is not None and start * 1000 < start_ms:
+                break
+            o, h, l, c = path.ohlc(start, min(start + span - 1, now))
+            rows.append([str(start * 1000)] + [str(self._round_price(symbol, v)) for v in (o, h, l, c)] + ["0", "0"])
+        return _ok({"category": "linear", "symbol": symbol, "list": rows})
+
+    def _place_order(self, api_key, symbol, side, order_type, qty, price, reduce_only, stop_loss, link_id=None):
+        symbol = self._symbol(symbol)
+        account = self._account(api_key)
+        if link_id and link_id in account.links:
+            raise FakeBybitError(110072, "OrderLinkedID is duplicate")
+        qty = float(qty)
+        _, step, min_qty = self._instruments[symbol]
+        if qty < min_qty or abs(round(qty / step) * step - qty) > step * 1e-6:
+            raise FakeBybitError(10001, "Qty invalid")
+        pos = account.positions.get(symbol)
+        if reduce_only and (pos is None or pos["side"] == side):
+            raise FakeBybitError(110017, "current position is zero, cannot fix reduce-only order qty")
+        if link_id:
+            account.links.add(link_id)
+        self.order_log.append((time.time(), api_key, symbol, side, order_type, reduce_only))
+        order_id = uuid.uuid4().hex
+        if order_type == "Market":
+            mark = self._paths[symbol].at(self.clock())
+            fill = mark * (1 + self.slippage if side == "Buy" else 1 - self.slippage)
+            self._publish_order(api_key, order_id, {"symbol": symbol, "side": side, "qty": qty, "type": "Market",
+                                                    "reduce_only": reduce_only, "link_id": link_id or ""}, "Filled")
+            self._fill(api_key, account, symbol, side, qty, fill, reduce_only, TAKER_FEE, order_id)
+            if stop_loss and symbol in account.positions:
+                account.positions[symbol]["stop_loss"] = float(stop_loss)
+        else:
+            account.orders[order_id] = {
+                "symbol": symbol, "side": side, "qty": qty, "price": float(price),
+                "reduce_only": reduce_only, "created": self.clock(), "link_id": link_id or "",
+            }
+            self._publish_order(api_key, order_id, account.orders[order_id], "New")
+        return _ok({"orderId": order_id, "orderLinkId": link_id or ""})
+
+    def _trading_stop(self, api_key, symbol, stop_loss):
+        pos = self._account(api_key).positions.get(symbol)
+        if pos is None:
+            raise FakeBybitError(10001, "can not set tp/sl/ts for zero position")
+        pos["stop_loss"] = float(stop_loss) if stop_loss not in (None, "", "0") else None
+        if api_key in self._streams:
+            self._publish(api_key, "position", [self._position_row(symbol, pos)])
+        return _ok({})
+
+    def _cancel(self, api_key, symbol, order_id):
+        account = self._account(api_key)
+        order = account.orders.pop(order_id, None)
+        if order is None:
+            raise FakeBybitError(110001, "order not exists or too late to cancel")
+        self._publish_order(api_key, order_id, order, "Cancelled")
+        return _ok({"orderId": order_id, "orderLinkId": order.get("link_id", "")})
+
+    def _position_row(self, symbol, pos):
+        if pos is None:
+            return {"symbol": symbol, "side": "", "size": "0", "avgPrice": "0", "stopLoss": "", "positionValue": "0"}
+        return {
+            "symbol": symbol,
+            "side": pos["side"],
+            "size": str(pos["size"]),
+            "avgPrice": str(pos["avg"]),
+            "stopLoss": str(pos["stop_loss"]) if pos["stop_loss"] else "",
+            "markPrice": str(self._paths[symbol].at(self.clock())),
+            "positionValue": str(pos["size"] * pos["avg"]),
+            "updatedTime": str(int(pos["updated"] * 1000)),
+        }
+
+    def _positions(self, api_key, symbol):
+        account = self._account(api_key)
+        if symbol:
+            rows = [self._position_row(symbol, account.positions.get(symbol))]
+        else:
+            rows = [self._position_row(s, p) for s, p in account.positions.items()]
+        return _ok({"category": "linear", "list": rows, "nextPageCursor": ""})
+
+    def _open_orders(self, api_key, symbol, link_id=None):
+        account = self._account(api_key)
+        rows = [
+            {"orderId": oid, "orderLinkId": o.get("link_id", ""), "symbol": o["symbol"], "side": o["side"],
+             "qty": str(o["qty"]), "price": str(o["price"]), "reduceOnly": o["reduce_only"], "orderType": "Limit",
+             "orderStatus": "New"}
+            for oid, o in account.orders.items()
+            if (not symbol or o["symbol"] == symbol) and (not link_id or o.get("link_id") == link_id)
+        ]
+        return _ok({"category": "linear", "list": rows, "nextPageCursor": ""})
+
+    def _wallet(self, api_key, coin):
+        account = self._account(api_key)
+        unrealized = sum(
+            (self._paths[s].at(self.clock()) - p["avg"]) * p["size"] * (1 if p["side"] == "Buy" else -1)
+            for s, p in account.positions.items()
+        )
+        equity = account.balance + unrealized
+        coins = [{"coin": "USDT", "walletBalance": str(account.balance), "equity": str(equity),
+                  "unrealisedPnl": str(unrealized)}]
+        if coin:
+            coins = [c for c in coins if c["coin"] in coin.split(",")]
+        return _ok({"list": [{"accountType": "UNIFIED", "totalEquity": str(equity),
+                              "totalWalletBalance": str(account.balance), "coin": coins}]})
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "rejected": dict(self.rejected),
+                "fills": self.fills,
+                "accounts": len(self._accounts),
+                "open_positions": sum(len(a.positions) for a in self._accounts.values()),
+                "open_orders": sum(len(a.orders) for a in self._accounts.values()),
+            }
+
+
+class FakePrivateWebSocket:
+    """
+    pybit unified_trading.WebSocket(channel_type="private") 중 이 저장소가 쓰는 구독만(같은 메시지 모양)
+    - 가짜 거래소의 주문/체결/포지션/지갑 변화를 자체 전달 쓰레드에서 콜백으로 넘김(실제 WS 처럼 호출 쓰레드와 분리)
+    - disconnect(): 연결 끊김 흉내(이후 메시지 유실, is_connected() False)
+    """
+
+    def __init__(self, exchange, api_key):
+        self.exchange = exchange
+        self.api_key = api_key
+        self._callbacks = {}
+        self._queue = queue.Queue()
+        self._connected = True
+        self._thread = threading.Thread(target=self._deliver_loop, name="fake-private-ws", daemon=True)
+        self._thread.start()
+        exchange._subscribe(api_key, self)
+
+    def position_stream(self, callback):
+        self._callbacks["position"] = callback
+
+    def order_stream(self, callback):
+        self._callbacks["order"] = callback
+
+    def execution_stream(self, callback):
+        self._callbacks["execution"] = callback
+
+    def wallet_stream(self, callback):
+        self._callbacks["wallet"] = callback
+
+    def is_connected(self):
+        return self._connected
+
+    def publish(self, topic, data):
+        if self._connected and topic in self._callbacks:
+            self._queue.put({"topic": topic, "creationTime": int(time.time() * 1000), "data": data})
+
+    def disconnect(self):
+        self._connected = False
+        self.exchange._unsubscribe(self.api_key, self)
+
+    def exit(self):
+        self.disconnect()
+        self._queue.put(None)
+
+    def _deliver_loop(self):
+        while True:
+            msg = self._queue.get()
+            if msg is None:
+                return
+            callback = self._callbacks.get(msg["topic"])
+            if callback is None or not self._connected:
+                continue
+            try:
+                callback(msg)
+            except Exception as e:
+                logging.error("[가짜 private WS 콜백 에러] %s", e)
+
+
+def _ok(result):
+    return {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": {}, "time": int(time.time() * 1000)}
+
+
+class FakeSession:
+    """
+    pybit unified_trading.HTTP 중 이 저장소가 쓰는 메서드만(같은 인자 이름/응답 모양)
+    """
+
+    def __init__(self, exchange, api_key=None):
+        self.exchange = exchange
+        self.api_key = api_key
+
+    def get_server_time(self, **kwargs):
+        return self.exchange.call(None, "get_server_time", self.exchange._server_time)
+
+    def get_tickers(self, category="linear", symbol=None, **kwargs):
+        return self.exchange.call(None, "get_tickers", self.exchange._tickers, symbol)
+
+    def get_instruments_info(self, category="linear", symbol=None, **kwargs):
+        return self.exchange.call(None, "get_instruments_info", self.exchange._instruments_info, symbol)
+
+    def get_kline(self, category="linear", symbol=None, interval="30", limit=200, start=None, end=None, **kwargs):
+        return self.exchange.call(None, "get_kline", self.exchange._kline, symbol, interval, int(limit), start, end)
+
+    def place_order(self, category="linear", symbol=None, side=None, orderType="Market", qty=None, price=None,
+                    reduceOnly=False, stopLoss=None, orderLinkId=None, **kwargs):
+        return self.exchange.call(self.api_key, "place_order", self.exchange._place_order,
+                                  self.api_key, symbol, side, orderType, qty, price, bool(reduceOnly), stopLoss,
+                                  orderLinkId)
+
+    def set_trading_stop(self, category="linear", symbol=None, stopLoss=None, **kwargs):
+        return self.exchange.call(self.api_key, "set_trading_stop", self.exchange._trading_stop,
+                                  self.api_key, symbol, stopLoss)
+
+    def cancel_order(self, category="linear", symbol=None, orderId=None, **kwargs):
+        return self.exchange.call(self.api_key, "cancel_order", self.exchange._cancel, self.api_key, symbol, orderId)
+
+    def get_positions(self, category="linear", symbol=None, **kwargs):
+        return self.exchange.call(self.api_key, "get_positions", self.exchange._positions, self.api_key, symbol)
+
+    def get_open_orders(self, category="linear", symbol=None, orderLinkId=None, **kwargs):
+        return self.exchange.call(self.api_key, "get_open_orders", self.exchange._open_orders, self.api_key, symbol,
+                                  orderLinkId)
+
+    def get_wallet_balance(self, accountType="UNIFIED", coin=None, **kwargs):
+        return self.exchange.call(self.api_key, "get_wallet_balance", self.exchange._wallet, self.api_key, coin)
+
+
+# 프로세스 공용 인스턴스(FAKE_EXCHANGE=1 일 때 session_pool 이 사용)
+exchange = FakeExchange()
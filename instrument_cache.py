@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+import threading
+
+from session_pool import session_pool
+
+# === 종목 메타데이터(틱사이즈/최소수량/수량스텝) 프로세스 공용 캐시 ===
+INSTRUMENT_TTL_SEC = float(os.getenv("INSTRUMENT_TTL_SEC", "600"))
+INSTRUMENT_REFRESH_SEC = float(os.getenv("INSTRUMENT_REFRESH_SEC", "300"))
+
+
+def _parse_instrument(item):
+    return {
+        "tick_size": float(item['priceFilter']['tickSize']),
+        "min_qty": float(item['lotSizeFilter']['minOrderQty']),
+        "qty_step": float(item['lotSizeFilter']['qtyStep']),
+    }
+
+
+class InstrumentCache:
+    """
+    - linear 카테고리 전체 종목을 한 번에(페이지 단위) 불러와 메모리에 보관
+    - TTL 지난 항목은 조회 대상에서 제외, 전체 재적재 시 상장폐지 종목은 제거
+    - 백그라운드 쓰레드가 주기적으로 전체 재적재
+    - 캐시에 없는 심볼만 단건 조회로 채움
+    """
+
+    def __init__(self, session_factory=None, ttl=INSTRUMENT_TTL_SEC,
+                 refresh_interval=INSTRUMENT_REFRESH_SEC, category="linear"):
+        self.session_factory = session_factory or session_pool.public
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.category = category
+        self._entries = {}          # symbol -> (loaded_at, info)
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_bulk_load = None
+
+    # --- 조회 ---
+    def _fresh(self, symbol):
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        loaded_at, info = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            return None
+        return info
+
+    def get(self, symbol, session=None):
+        """
+        심볼 메타데이터 dict 반환(tick_size, min_qty, qty_step), 실패 시 None
+        """
+        info = self._fresh(symbol)
+        if info is not None:
+            return info
+        # 같은 심볼을 여러 쓰레드가 동시에 조회하지 않도록 직렬화
+        with self._fetch_lock:
+            info = self._fresh(symbol)
+            if info is not None:
+                return info
+            return self._load_symbol(symbol, session)
+
+    def get_many(self, symbols, session=None):
+        """
+        여러 심볼을 한 번에 조회: 하나라도 없으면 단건 조회 대신 전체 적재 1회
+        반환: {symbol: info}(없는 심볼은 None)
+        """
+        if any(self._fresh(symbol) is None for symbol in symbols):
+            with self._fetch_lock:
+                if any(self._fresh(symbol) is None for symbol in symbols):
+                    try:
+                        self.load_all(session)
+                    except Exception as e:
+                        logging.error("[종목정보 캐시] 전체 적재 실패: %s", e)
+        return {symbol: self.get(symbol, session) for symbol in symbols}
+
+    def _load_symbol(self, symbol, session=None):
+        session = session or self.session_factory()
+        res = session.get_instruments_info(category=self.category, symbol=symbol)
+        items = res['result']['list']
+        if not items:
+            return None
+        info = _parse_instrument(items[0])
+        with self._lock:
+            self._entries[symbol] = (time.monotonic(), info)
+        return info
+
+    # --- 전체 적재 ---
+    def load_all(self, session=None):
+        session = session or self.session_factory()
+        loaded = {}
+        cursor = None
+        while True:
+            params = {"category": self.category, "limit": 1000}
+            if cursor:
+                params["cursor"] = cursor
+            res = session.get_instruments_info(**params)
+            for item in res['result']['list']:
+                try:
+                    loaded[item['symbol']] = _parse_instrument(item)
+                except (KeyError, TypeError, ValueError):
+                    continue
+            cursor = res['result'].get('nextPageCursor')
+            if not cursor:
+                break
+        now = time.monotonic()
+        with self._lock:
+            self._entries = {symbol: (now, info) for symbol, info in loaded.items()}
+        self.last_bulk_load = time.time()
+        return len(loaded)
+
+    # --- 백그라운드 재적재 ---
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="instrument-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                count = self.load_all()
+                logging.info("[종목정보 캐시] %s개 종목 적재", count)
+            except Exception as e:
+                logging.error("[종목정보 캐시] 전체 적재 실패: %s", e)
+            self._stop.wait(self.refresh_interval)
+
+    def stats(self):
+        return {
+            "symbols": len(self._entries),
+            "last_bulk_load": self.last_bulk_load,
+            "ttl": self.ttl,
+        }
+
+
+# 프로세스 공용 인스턴스
+instrument_cache = InstrumentCache()
@@ -0,0 +1,369 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 로컬 실행: 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+# === 디스크 캔들 저장소(심볼/봉간격별 고정폭 컬럼 파일, memory-map) ===
+KLINE_STORE_ENABLED = os.getenv("KLINE_STORE_ENABLED", "1") == "1"
+KLINE_STORE_DIR = os.getenv("KLINE_STORE_DIR", "kline_store")
+KLINE_STORE_SEED_BARS = int(os.getenv("KLINE_STORE_SEED_BARS", "200"))  # 비어 있을 때 처음 받을 마감봉 수
+KLINE_SYNC_WORKERS = int(os.getenv("KLINE_SYNC_WORKERS", "2"))          # 백그라운드 동기화 쓰레드 수
+KLINE_PAGE_LIMIT = 1000                                                 # Bybit get_kline 최대 개수
+
+# 컬럼 이름/형식(파일 1개 = 컬럼 1개, 행 = 캔들 1개)
+COLUMNS = (("start", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("volume", "<f8"))
+ROW_BYTES = {name: np.dtype(dtype).itemsize for name, dtype in COLUMNS}
+
+
+def interval_ms(interval):
+    return int(interval) * 60 * 1000
+
+
+def last_closed_start(interval, now_ms=None):
+    """
+    가장 최근 마감봉 시작시각(ms)
+    """
+    span = interval_ms(interval)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return now_ms - now_ms % span - span
+
+
+def fetch_klines(session, symbol, start_ms, end_ms, interval="30"):
+    """
+    [start_ms, end_ms] 구간 캔들을 최신 쪽부터 페이지 단위로 조회, 시간순 [(start, o, h, l, c, volume)]
+    """
+    span = interval_ms(interval)
+    rows = {}
+    end = end_ms
+    while end >= start_ms:
+        limit = min(KLINE_PAGE_LIMIT, (end - start_ms) // span + 1)
+        res = session.get_kline(category="linear", symbol=symbol, interval=str(interval),
+                                start=start_ms, end=end, limit=limit)
+        page = res["result"]["list"]
+        if not page:
+            break
+        for k in page:
+            start = int(k[0])
+            if start_ms <= start <= end_ms:
+                volume = float(k[5]) if len(k) > 5 and k[5] not in (None, "") else 0.0
+                rows[start] = (start, float(k[1]), float(k[2]), float(k[3]), float(k[4]), volume)
+        oldest = min(int(k[0]) for k in page)
+        # 요청한 end 보다 과거로 내려가지 않는 페이지(start/end 를 무시하는 응답)면 더 받아도 같음
+        if len(page) < limit or oldest <= start_ms or oldest - span >= end:
+            break
+        end = oldest - span
+    return [rows[k] for k in sorted(rows)]
+
+
+class KlineSeries:
+    """
+    심볼 1개/봉간격 1개: {dir}/{symbol}_{interval}/{컬럼}.bin
+    - 캔들은 빈틈 없이 봉간격마다 1행(거래소에 빠진 봉은 직전 종가로 채움) → 시각으로 행 번호를 바로 계산(O(1))
+    - 추가는 다른 컬럼을 먼저, start 컬럼을 마지막에 써서 start 길이까지만 완성된 행으로 봄
+    - 읽기는 np.memmap 뷰(복사 없음), 파일이 커지거나 교체되면 다시 매핑
+    """
+
+    def __init__(self, root, symbol, interval):
+        self.symbol = symbol
+        self.interval = str(interval)
+        self.span = interval_ms(interval)
+        self.path = os.path.join(root, f"{symbol}_{self.interval}")
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._maps = None
+        self._map_key = None
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            if self._lock_fd is None:
+                self._lock_fd = os.open(os.path.join(self.path, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def __len__(self):
+        try:
+            return os.stat(self._file("start")).st_size // ROW_BYTES["start"]
+        except FileNotFoundError:
+            return 0
+
+    def columns(self):
+        """
+        전체 컬럼 {이름: 읽기전용 배열}(memmap 뷰)
+        """
+        try:
+            st = os.stat(self._file("start"))
+        except FileNotFoundError:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+        n = st.st_size // ROW_BYTES["start"]
+        key = (st.st_ino, n)
+        maps = self._maps
+        if maps is None or self._map_key != key:
+            if n == 0:
+                maps = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+            else:
+                # memmap 서브클래스 대신 같은 메모리를 보는 ndarray 뷰(슬라이스가 가벼움)
+                maps = {name: np.memmap(self._file(name), dtype=dtype, mode="r", shape=(n,)).view(np.ndarray)
+                        for name, dtype in COLUMNS}
+            self._maps, self._map_key = maps, key
+        return maps
+
+    def bounds(self):
+        """
+        (행 수, 첫 봉 시작, 마지막 봉 시작), 비었으면 (0, None, None)
+        """
+        cols = self.columns()
+        n = len(cols["start"])
+        if n == 0:
+            return 0, None, None
+        return n, int(cols["start"][0]), int(cols["start"][-1])
+
+    def index_of(self, ts_ms):
+        """
+        ts_ms 가 속한 봉의 행 번호(저장 범위 밖이면 범위 밖 값 그대로)
+        """
+        n, first, _ = self.bounds()
+        if n == 0:
+            return 0
+        return (int(ts_ms) - first) // self.span
+
+    def range(self, start_ms, end_ms):
+        """
+        [start_ms, end_ms] 구간 봉들의 컬럼 뷰(복사 없음)
+        """
+        cols = self.columns()
+        n = len(cols["start"])
+        if n == 0:
+            return cols
+        first = int(cols["start"][0])
+        lo = max(0, -((first - int(start_ms)) // self.span))
+        hi = min(n, (int(end_ms) - first) // self.span + 1)
+        hi = max(lo, hi)
+        return {name: col[lo:hi] for name, col in cols.items()}
+
+    def last(self, count):
+        """
+        최근 count개 봉 [(start, open, high, low, close)](시간순)
+        """
+        cols = self.columns()
+        n = len(cols["start"])
+        lo = max(0, n - count)
+        return list(zip(cols["start"][lo:].tolist(), cols["open"][lo:].tolist(), cols["high"][lo:].tolist(),
+                        cols["low"][lo:].tolist(), cols["close"][lo:].tolist()))
+
+    # --- 쓰기(locked 안에서) ---
+    def _repair(self):
+        # 추가 중 죽어 다른 컬럼만 길어진 경우 start 길이에 맞춰 자르기
+        n = len(self)
+        for name, _ in COLUMNS[1:]:
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > n * ROW_BYTES[name]:
+                os.truncate(path, n * ROW_BYTES[name])
+        return n
+
+    def _fill_gaps(self, rows, last_start, last_close):
+        """
+        봉간격마다 1행이 되도록 빠진 봉을 직전 종가(거래량 0)로 채우고, 이미 있는 봉은 제외
+        """
+        filled = []
+        for row in rows:
+            start = row[0]
+            if last_start is not None:
+                if start <= last_start:
+                    continue
+                t = last_start + self.span
+                while t < start:
+                    filled.append((t, last_close, last_close, last_close, last_close, 0.0))
+                    t += self.span
+            filled.append(row)
+            last_start, last_close = start, row[4]
+        return filled
+
+    def _write(self, rows, mode):
+        arr = np.array(rows, dtype=float).reshape(-1, len(COLUMNS))
+        for k, (name, dtype) in reversed(list(enumerate(COLUMNS))):
+            # start(0번)를 마지막에 기록
+            with open(self._file(name), mode) as f:
+                f.write(arr[:, k].astype(dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def append(self, rows):
+        """
+        시간순 [(start, o, h, l, c, volume)] 중 마지막 봉 이후만 뒤에 추가, 추가된 행 수 반환
+        """
+        n = self._repair()
+        if n:
+            cols = self.columns()
+            last_start, last_close = int(cols["start"][-1]), float(cols["close"][-1])
+        else:
+            last_start = last_close = None
+        rows = self._fill_gaps(rows, last_start, last_close)
+        if rows:
+            self._write(rows, "ab")
+        return len(rows)
+
+    def rewrite(self, rows):
+        """
+        전체를 새로 기록(앞쪽 과거 구간을 추가할 때), 임시 파일 → os.replace 로 교체
+        """
+        rows = self._fill_gaps(rows, None, None)
+        arr = np.array(rows, dtype=float).reshape(-1, len(COLUMNS))
+        for k, (name, dtype) in reversed(list(enumerate(COLUMNS))):
+            tmp = self._file(name) + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(arr[:, k].astype(dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._file(name))
+        return len(rows)
+
+
+class KlineStore:
+    """
+    - 심볼/봉간격별 KlineSeries 관리
+    - sync: 저장된 마지막 봉 이후의 마감봉만 거래소(또는 가짜 거래소) 세션으로 받아 추가
+    - sync_later: 같은 동기화를 백그라운드 쓰레드에서(심볼/봉간격별로 하나만 진행)
+    - 진입 경로: recent_closed 로 최신 마감봉까지 있으면 REST 없이 사용(재시작 직후에도), 읽기만 하고 쓰지 않음
+    - 백테스트: range 로 구간 컬럼 뷰를 복사 없이 사용
+    """
+
+    def __init__(self, root=KLINE_STORE_DIR, seed_bars=KLINE_STORE_SEED_BARS):
+        self.root = root
+        self.seed_bars = seed_bars
+        self._series = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._syncing = set()
+        self.synced_rows = 0
+        self.sync_requests = 0
+
+    def series(self, symbol, interval):
+        key = (symbol, str(interval))
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, KlineSeries(self.root, symbol, interval))
+        return series
+
+    def sync(self, session, symbol, interval="30", start_ms=None, now_ms=None):
+        """
+        최신 마감봉까지 채우기, 추가된 행 수 반환
+        - start_ms: 이 시각부터 있어야 함(저장 범위보다 앞이면 과거 구간을 받아 전체 재작성)
+        - 비어 있고 start_ms 도 없으면 최근 seed_bars 개만
+        """
+        series = self.series(symbol, interval)
+        end_ms = last_closed_start(interval, now_ms)
+        span = series.span
+        n, first, last = series.bounds()
+        if n and last >= end_ms and (start_ms is None or start_ms >= first):
+            return 0
+        added = 0
+        with series.locked():
+            n, first, last = series.bounds()
+            if n and start_ms is not None and start_ms < first:
+                older = fetch_klines(session, symbol, start_ms, first - span, interval)
+                self.sync_requests += 1
+                cols = series.columns()
+                existing = list(zip(*(cols[name].tolist() for name, _ in COLUMNS)))
+                added = series.rewrite(older + existing) - n
+                n, first, last = series.bounds()
+            if n:
+                from_ms = last + span
+            elif start_ms is not None:
+                from_ms = start_ms - start_ms % span
+            else:
+                from_ms = end_ms - (self.seed_bars - 1) * span
+            if from_ms <= end_ms:
+                rows = fetch_klines(session, symbol, from_ms, end_ms, interval)
+                self.sync_requests += 1
+                added += series.append(rows)
+        self.synced_rows += added
+        return added
+
+    def sync_later(self, session, symbol, interval="30", now_ms=None):
+        """
+        sync 를 백그라운드에서 실행(이미 진행 중인 심볼/봉간격이면 무시), 예약했으면 True
+        """
+        key = (symbol, str(interval))
+        with self._lock:
+            if key in self._syncing:
+                return False
+            self._syncing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=KLINE_SYNC_WORKERS, thread_name_prefix="kline-sync")
+        self._executor.submit(self._sync_background, key, session, symbol, interval, now_ms)
+        return True
+
+    def _sync_background(self, key, session, symbol, interval, now_ms):
+        try:
+            self.sync(session, symbol, interval, now_ms=now_ms)
+        except Exception as e:
+            logging.error("[캔들 저장소] %s 백그라운드 동기화 실패: %s", symbol, e)
+        finally:
+            with self._lock:
+                self._syncing.discard(key)
+
+    def recent_closed(self, symbol, interval, count, now_ms=None):
+        """
+        최근 마감봉 count개(시간순), 최신 마감봉이 없거나 개수가 부족하면 None
+        """
+        series = self.series(symbol, interval)
+        n, _, last = series.bounds()
+        if n < count or last != last_closed_start(interval, now_ms):
+            return None
+        return series.last(count)
+
+    def range(self, symbol, interval, start_ms, end_ms):
+        return self.series(symbol, interval).range(start_ms, end_ms)
+
+    def stats(self):
+        with self._lock:
+            series = list(self._series.values())
+        return {
+            "series": {f"{s.symbol}_{s.interval}": len(s) for s in series},
+            "synced_rows": self.synced_rows,
+            "sync_requests": self.sync_requests,
+            "syncing": len(self._syncing),
+        }
+
+
+# 프로세스 공용 인스턴스
+kline_store = KlineStore()
+
+
+def warm_recent_candles(session, symbol, interval, count, now_ms=None):
+    """
+    진입 경로용: 저장소에 최신 마감봉까지 있으면 최근 count개 반환(디스크 읽기만, REST/fsync 없음)
+    - 없으면 백그라운드 동기화만 예약하고 None → 호출자가 REST 1회로 대체, 다음 조회부터 저장소 사용
+    - now_ms: 거래소 기준 현재시각(로컬시계가 늦으면 방금 마감된 봉을 놓치지 않도록)
+    """
+    if not KLINE_STORE_ENABLED:
+        return None
+    try:
+        candles = kline_store.recent_closed(symbol, interval, count, now_ms)
+        if candles is None:
+            kline_store.sync_later(session, symbol, interval, now_ms)
+        return candles
+    except Exception as e:
+        logging.error("[캔들 저장소] %s 조회 실패(REST로 대체): %s", symbol, e)
+        return None
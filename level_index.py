@@ -0,0 +1,130 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from typing import NamedTuple
+
+# === 캔들 묶음(OHLC) 및 지지/저항선 증분 인덱스 ===
+
+
+class OHLC(NamedTuple):
+    """
+    시간순 캔들을 컬럼별 튜플로 보관
+    """
+    start: tuple
+    open: tuple
+    high: tuple
+    low: tuple
+    close: tuple
+
+
+def to_ohlc(candles):
+    """
+    [(start, open, high, low, close), ...] → OHLC
+    """
+    if not candles:
+        return OHLC((), (), (), (), ())
+    return OHLC(*(tuple(col) for col in zip(*candles)))
+
+
+class _SortedCounter:
+    """
+    중복 허용 값들을 (정렬된 고유값 리스트 + 개수)로 관리
+    """
+    __slots__ = ("values", "counts")
+
+    def __init__(self):
+        self.values = []
+        self.counts = {}
+
+    def add(self, v):
+        n = self.counts.get(v, 0)
+        if n == 0:
+            insort(self.values, v)
+        self.counts[v] = n + 1
+
+    def remove(self, v):
+        n = self.counts[v] - 1
+        if n == 0:
+            del self.counts[v]
+            del self.values[bisect_left(self.values, v)]
+        else:
+            self.counts[v] = n
+
+
+class LevelIndex:
+    """
+    - 최근 마감 캔들 window개의 저점/고점을 롤링 유지(캔들 마감마다 push)
+    - 고유 저점/고점을 정렬 상태로 보관 → 진입가 기준 1·2차 지지/저항선을 이분탐색으로 조회
+    """
+
+    def __init__(self, window=5):
+        self.window = window
+        self._candles = deque()
+        self._lows = _SortedCounter()
+        self._highs = _SortedCounter()
+
+    @classmethod
+    def from_candles(cls, candles, window=5):
+        index = cls(window)
+        for candle in candles:
+            index.push(candle)
+        return index
+
+    def push(self, candle):
+        """
+        candle: (start, open, high, low, close)
+        """
+        if self._candles and self._candles[-1][0] == candle[0]:
+            old = self._candles.pop()
+            self._lows.remove(old[3])
+            self._highs.remove(old[2])
+        elif self._candles and self._candles[-1][0] > candle[0]:
+            return
+        self._candles.append(candle)
+        self._lows.add(candle[3])
+        self._highs.add(candle[2])
+        if len(self._candles) > self.window:
+            old = self._candles.popleft()
+            self._lows.remove(old[3])
+            self._highs.remove(old[2])
+
+    def __len__(self):
+        return len(self._candles)
+
+    @property
+    def full(self):
+        return len(self._candles) >= self.window
+
+    @property
+    def last_start(self):
+        return self._candles[-1][0] if self._candles else None
+
+    def ohlc(self):
+        return to_ohlc(list(self._candles))
+
+    def lows(self):
+        return [c[3] for c in self._candles]
+
+    def highs(self):
+        return [c[2] for c in self._candles]
+
+    def window_low(self):
+        return self._lows.values[0] if self._lows.values else None
+
+    def window_high(self):
+        return self._highs.values[-1] if self._highs.values else None
+
+    def supports_below(self, price, n=2):
+        """
+        price보다 낮은 고유 저점을 가까운 순으로 최대 n개
+        """
+        values = self._lows.values
+        i = bisect_left(values, price)
+        return values[max(0, i - n):i][::-1]
+
+    def resistances_above(self, price, n=2):
+        """
+        price보다 높은 고유 고점을 가까운 순으로 최대 n개
+        """
+        values = self._highs.values
+        i = bisect_right(values, price)
+        return values[i:i + n]
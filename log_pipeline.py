@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import metrics
+
+# === 로그 파이프라인(호출 쪽은 큐에 넣기만, 포맷/디스크 쓰기는 백그라운드 쓰레드) ===
+LOG_FILE = os.getenv("LOG_FILE", "log.txt")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON = os.getenv("LOG_JSON", "1") == "1"                                # 파일 기록을 JSON 한 줄씩
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1") == "1"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))      # 이 크기 넘으면 교체(0: 크기 무시)
+LOG_ROTATE_SEC = int(os.getenv("LOG_ROTATE_SEC", "86400"))                  # 이 시간 지나면 교체(0: 시간 무시)
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "100000"))                 # 가득 차면 버림(호출 쪽은 기다리지 않음)
+LOG_SAMPLE_PER_SEC = int(os.getenv("LOG_SAMPLE_PER_SEC", "20"))             # sample 키별 초당 최대 기록 수
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))                    # gunicorn 워커 수(2 이상이면 워커별 파일)
+
+TEXT_FORMAT = '[%(levelname)s] %(asctime)s | %(message)s'
+TEXT_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+# LogRecord 기본 속성(이 외의 속성 = extra 로 넘긴 구조화 필드)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+log_dropped = metrics.registry.counter("log_records_dropped_total", "버린 로그 수(reason=queue_full|sampled)", ("reason",))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    - 메시지 % 포맷/예외 문자열화를 하지 않고 LogRecord 그대로 큐에 넣음(포맷은 쓰기 쓰레드에서)
+    - 큐가 가득 차면 기다리지 않고 버리고 개수만 셈
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_dropped.inc(("queue_full",))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    extra={"sample": 키} 가 붙은 기록만 키별로 초당 LOG_SAMPLE_PER_SEC 건까지 통과
+    - 버린 건수는 다음에 통과하는 기록의 sampled_out 필드로 남김
+    """
+
+    def __init__(self, per_sec=LOG_SAMPLE_PER_SEC):
+        super().__init__()
+        self.per_sec = per_sec
+        self._windows = {}   # 키 -> [현재 초, 통과 수, 버린 수]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None or self.per_sec <= 0:
+            return True
+        now = int(time.monotonic())
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window[0] != now:
+                dropped = window[2] if window else 0
+                window = self._windows[key] = [now, 0, dropped]
+            if window[1] >= self.per_sec:
+                window[2] += 1
+                dropped = None
+            else:
+                window[1] += 1
+                dropped, window[2] = window[2], 0
+        if dropped is None:
+            log_dropped.inc(("sampled",))
+            return False
+        if dropped:
+            record.sampled_out = dropped
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    한 줄 = {"ts", "level", "logger", "thread", "msg", extra 필드..., "exc"}
+    - extra 값(주문 응답 dict 등)은 여기서 처음 문자열화
+    """
+
+    def format(self, record):
+        doc = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in doc:
+                doc[key] = value
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            doc["exc"] = record.exc_text
+        return json.dumps(doc, ensure_ascii=False, default=str)
+
+
+class SizeTimeRotatingFileHandler(RotatingFileHandler):
+    """
+    크기(max_bytes) 또는 시간(rotate_sec) 중 먼저 넘는 쪽에서 log.txt → log.txt.1 ... 로 교체
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, rotate_sec=LOG_ROTATE_SEC, backup_count=LOG_BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.rotate_sec = rotate_sec
+        self._opened_at = os.path.getmtime(filename) if os.path.exists(filename) and os.path.getsize(filename) else time.time()
+
+    def shouldRollover(self, record):
+        if self.rotate_sec and time.time() - self._opened_at >= self.rotate_sec:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self._opened_at = time.time()
+
+
+class LogPipeline:
+    """
+    - 루트 로거에는 큐 핸들러 1개만(호출 비용 = 필터 + put_nowait)
+    - QueueListener 쓰레드가 파일(회전, JSON)/콘솔(텍스트) 핸들러로 기록
+    - 종료 시 큐에 남은 기록까지 비우고 멈춤
+    - gunicorn 워커가 여러 개면 워커별 파일(log.<pid>.txt), 파일 회전은 프로세스 간 안전하지 않으므로
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def setup(self, path=LOG_FILE, level=LOG_LEVEL, json_format=LOG_JSON, console=LOG_CONSOLE):
+        with self._lock:
+            if self.listener is not None:
+                return
+            handlers = []
+            if path and WEB_CONCURRENCY > 1:
+                root, ext = os.path.splitext(path)
+                path = f"{root}.{os.getpid()}{ext}"
+            if path:
+                file_handler = SizeTimeRotatingFileHandler(path)
+                file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT, TEXT_DATEFMT))
+                handlers.append(file_handler)
+            if console:
+                console_handler = logging.StreamHandler(sys.stderr)
+                console_handler.setFormatter(logging.Formatter(TEXT_FORMAT, TEXT_DATEFMT))
+                handlers.append(console_handler)
+            self.queue = queue.Queue(LOG_QUEUE_SIZE)
+            queue_handler = NonBlockingQueueHandler(self.queue)
+            queue_handler.addFilter(SamplingFilter())
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(queue_handler)
+            root.setLevel(level)
+            self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        with self._lock:
+            if self.listener is None:
+                return
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+
+    def stats(self):
+        return {"queued": self.queue.qsize() if self.queue is not None else 0, "running": self.listener is not None}
+
+
+# 프로세스 공용 인스턴스
+log_pipeline = LogPipeline()
@@ -0,0 +1,206 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+from pybit.unified_trading import WebSocket
+
+from level_index import LevelIndex
+from clock_sync import clock_sync
+
+# === 공용 시세 허브(심볼당 public WebSocket 1개) ===
+# 가짜 거래소 사용 시 실제 시세 WebSocket 은 기본으로 끔(가격이 서로 다름)
+MARKET_WS_ENABLED = os.getenv("MARKET_WS_ENABLED", "0" if os.getenv("FAKE_EXCHANGE") == "1" else "1") == "1"
+PRICE_MAX_AGE_SEC = float(os.getenv("PRICE_MAX_AGE_SEC", "2"))    # 이보다 오래된 현재가는 사용 안 함
+CANDLE_HISTORY = int(os.getenv("CANDLE_HISTORY", "50"))           # 심볼/봉간격별 보관 마감캔들 수
+KLINE_INTERVALS = ("30",)
+LEVEL_WINDOW = 5                                                   # 손절 계산에 쓰는 마감캔들 수
+
+
+def _default_ws_factory(symbol):
+    return WebSocket(testnet=False, channel_type="linear")
+
+
+class SymbolFeed:
+    __slots__ = ("symbol", "ws", "connecting", "refs", "last_price", "price_at", "candles", "levels", "lock")
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.lock = threading.Lock()   # candles/levels 갱신(WS 쓰레드와 REST seed 가 같은 봉을 동시에 넣지 않도록)
+        self.ws = None
+        self.connecting = False
+        self.refs = 0
+        self.last_price = None
+        self.price_at = None
+        self.candles = {}   # interval -> deque[(start, open, high, low, close)] (마감 캔들만, 시간순)
+        self.levels = {}    # interval -> LevelIndex(최근 LEVEL_WINDOW개 마감캔들의 지지/저항선)
+
+
+class MarketDataHub:
+    """
+    - 심볼별 참조카운트: 첫 acquire에서 ticker/kline 구독 시작, 마지막 release에서 연결 종료
+    - 현재가와 마감된 캔들을 메모리에 보관, 조회 시 신선도(staleness) 검사
+    - 캐시가 비었거나 오래되면 None 반환 → 호출부가 REST로 조회 후 seed_candles로 채움
+    - 캔들 갱신(WS 콜백/seed)은 심볼별 잠금으로 직렬화, 허브 잠금은 구독 관리에만
+    """
+
+    def __init__(self, ws_factory=None, intervals=KLINE_INTERVALS,
+                 price_max_age=PRICE_MAX_AGE_SEC, history=CANDLE_HISTORY):
+        self.ws_factory = ws_factory or _default_ws_factory
+        self.intervals = intervals
+        self.price_max_age = price_max_age
+        self.history = history
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    # --- 구독 관리 ---
+    def acquire(self, symbol):
+        with self._lock:
+            feed = self._feeds.get(symbol)
+            if feed is None:
+                feed = SymbolFeed(symbol)
+                self._feeds[symbol] = feed
+            feed.refs += 1
+            if feed.ws is not None or feed.connecting:
+                return
+            feed.connecting = True
+        # 연결은 잠금 밖에서(다른 심볼 acquire가 막히지 않도록)
+        ws = None
+        try:
+            ws = self.ws_factory(symbol)
+            ws.ticker_stream(symbol=symbol, callback=lambda msg, f=feed: self._on_ticker(f, msg))
+            for interval in self.intervals:
+                ws.kline_stream(interval=int(interval), symbol=symbol,
+                                callback=lambda msg, f=feed, i=interval: self._on_kline(f, i, msg))
+        except Exception as e:
+            logging.error("[시세허브] %s 구독 실패(REST로 대체): %s", symbol, e)
+            ws = None
+        with self._lock:
+            feed.connecting = False
+            if self._feeds.get(symbol) is feed:
+                feed.ws = ws
+                return
+        # 연결 중에 모두 release된 경우
+        if ws is not None:
+            ws.exit()
+
+    def release(self, symbol):
+        with self._lock:
+            feed = self._feeds.get(symbol)
+            if feed is None:
+                return
+            feed.refs -= 1
+            if feed.refs > 0:
+                return
+            del self._feeds[symbol]
+        if feed.ws is not None:
+            try:
+                feed.ws.exit()
+            except Exception as e:
+                logging.error("[시세허브] %s 연결 종료 에러: %s", symbol, e)
+
+    # --- 스트림 콜백 ---
+    def _on_ticker(self, feed, msg):
+        data = msg.get('data') or {}
+        price = data.get('lastPrice')
+        if price:
+            feed.last_price = float(price)
+            feed.price_at = time.monotonic()
+
+    def _on_kline(self, feed, interval, msg):
+        for k in msg.get('data') or []:
+            if not k.get('confirm'):
+                continue
+            candle = (int(k['start']), float(k['open']), float(k['high']), float(k['low']), float(k['close']))
+            with feed.lock:
+                self._push_candle(feed, interval, candle)
+
+    def _push_candle(self, feed, interval, candle):
+        candles = feed.candles.get(interval)
+        if candles is None:
+            candles = deque(maxlen=self.history)
+            feed.candles[interval] = candles
+        if candles and candles[-1][0] >= candle[0]:
+            if candles[-1][0] != candle[0]:
+                return
+            candles[-1] = candle
+        else:
+            candles.append(candle)
+        # 캔들 마감마다 지지/저항선 인덱스 증분 갱신
+        levels = feed.levels.get(interval)
+        if levels is None:
+            levels = LevelIndex(LEVEL_WINDOW)
+            feed.levels[interval] = levels
+        levels.push(candle)
+
+    # --- 조회 ---
+    def last_price(self, symbol):
+        feed = self._feeds.get(symbol)
+        if feed is None or feed.price_at is None:
+            return None
+        if time.monotonic() - feed.price_at > self.price_max_age:
+            return None
+        return feed.last_price
+
+    def _is_current(self, last_start, interval):
+        """
+        가장 최근 마감봉(현재 진행봉 바로 앞)이 들어와 있는지(거래소 시계 기준)
+        """
+        interval_ms = int(interval) * 60 * 1000
+        now_ms = clock_sync.now() * 1000
+        current_start = now_ms - now_ms % interval_ms
+        return last_start + interval_ms >= current_start
+
+    def closed_candles(self, symbol, interval, count):
+        """
+        최근 마감 캔들 count개(시간순), 부족하거나 최신 마감봉이 빠져 있으면 None
+        """
+        feed = self._feeds.get(symbol)
+        if feed is None:
+            return None
+        candles = feed.candles.get(interval)
+        if not candles or len(candles) < count:
+            return None
+        if not self._is_current(candles[-1][0], interval):
+            return None
+        return list(candles)[-count:]
+
+    def level_index(self, symbol, interval):
+        """
+        최신 상태의 지지/저항선 인덱스, 없거나 오래되었으면 None
+        """
+        feed = self._feeds.get(symbol)
+        if feed is None:
+            return None
+        levels = feed.levels.get(interval)
+        if levels is None or not levels.full or not self._is_current(levels.last_start, interval):
+            return None
+        return levels
+
+    def seed_candles(self, symbol, interval, candles):
+        """
+        REST로 받은 마감 캔들로 캐시 채우기(구독 중인 심볼만)
+        """
+        feed = self._feeds.get(symbol)
+        if feed is None:
+            return
+        with feed.lock:
+            for candle in candles:
+                self._push_candle(feed, interval, candle)
+
+    def stats(self):
+        with self._lock:
+            return {
+                symbol: {
+                    "refs": feed.refs,
+                    "streaming": feed.ws is not None,
+                    "last_price": feed.last_price,
+                    "candles": {i: len(c) for i, c in feed.candles.items()},
+                }
+                for symbol, feed in self._feeds.items()
+            }
+
+
+# 프로세스 공용 인스턴스
+market_data = MarketDataHub()
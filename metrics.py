@@ -0,0 +1,227 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+
+# === 지연/상태 지표(Prometheus 텍스트 형식, /metrics) ===
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# 상한(초), 관측 시 이분탐색으로 칸 1개만 증가
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (지표 라벨, 시작 단계, 끝 단계): 매매 단계 시각 사이 소요시간
+STAGE_PAIRS = (
+    ("deadline_to_sent", "deadline", "order_sent"),
+    ("order_rtt", "order_sent", "order_ack"),
+    ("ack_to_tp_placed", "order_ack", "tp_placed"),
+    ("ack_to_sl_placed", "order_ack", "sl_placed"),
+    ("exit_to_detected", "exit", "exit_detected"),
+)
+
+# 세션 메서드 중 거래소 호출로 보는 것
+CALL_PREFIXES = ("get_", "place_", "cancel_", "amend_", "set_")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    라벨 조합(tuple)별 누적 안 된 칸 카운트 + 합계 + 개수를 리스트 1개로 보관
+    - 관측 시 문자열 생성 없음, 누적/포맷은 조회(render) 때만
+    """
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._size = len(self.buckets) + 1
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [칸별 개수..., +Inf 칸, 합계, 개수]
+                series = self._series[labels] = [0] * self._size + [0.0, 0]
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for upper, count in zip(self.buckets + (float("inf"),), series[:self._size]):
+                cumulative += count
+                le = 'le="' + _fmt(upper) + '"'
+                lines.append(f"{self.name}_bucket{_label_str(self.label_names, labels, le)} {cumulative}")
+            tag = _label_str(self.label_names, labels)
+            lines.append(f"{self.name}_sum{tag} {_fmt(series[-2])}")
+            lines.append(f"{self.name}_count{tag} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_str(self.label_names, labels)} {_fmt(v)}" for labels, v in values]
+        return lines
+
+
+class Gauge:
+    """
+    조회 시점에 fn() 으로 값 계산(숫자 또는 [(라벨 tuple, 값)])
+    - kind="counter": 다른 모듈이 이미 세고 있는 누적값을 그대로 노출(이름은 _total 로 끝나게)
+    """
+
+    def __init__(self, name, help_text, fn, label_names=(), kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.label_names = tuple(label_names)
+        self.kind = kind
+
+    def render(self):
+        value = self.fn()
+        items = value if isinstance(value, list) else [((), value)]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{_label_str(self.label_names, labels)} {_fmt(v)}" for labels, v in items]
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            # 같은 이름 재등록(모듈 재import 등)은 기존 지표 유지
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, label_names, buckets))
+
+    def counter(self, name, help_text, label_names=()):
+        return self._add(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, fn, label_names=(), kind="gauge"):
+        with self._lock:
+            # 게이지는 값 계산 함수만 바꿔 끼움
+            self._metrics[name] = Gauge(name, help_text, fn, label_names, kind)
+            return self._metrics[name]
+
+    def counter_fn(self, name, help_text, fn, label_names=()):
+        """
+        조회 시점에 fn() 으로 읽는 누적 카운터(캐시 적중 수처럼 모듈이 직접 세는 값)
+        """
+        return self.gauge(name, help_text, fn, label_names, kind="counter")
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines += metric.render()
+            except Exception as e:
+                lines.append(f"# {metric.name} 조회 실패: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+# 프로세스 공용 인스턴스
+registry = MetricsRegistry()
+
+exchange_latency = registry.histogram(
+    "bybit_request_duration_seconds", "거래소 호출 소요시간(세션 메서드 단위)", ("endpoint", "symbol", "outcome"))
+trade_stage_latency = registry.histogram(
+    "trade_stage_duration_seconds", "매매 단계 사이 소요시간", ("stage",), STAGE_BUCKETS)
+trade_stage_events = registry.counter("trade_stage_total", "매매 단계 도달 횟수", ("stage",))
+
+
+def _outcome(result):
+    if isinstance(result, dict) and result.get("retCode", 0) != 0:
+        return "error"
+    return "ok"
+
+
+class InstrumentedSession:
+    """
+    pybit HTTP 세션 래퍼: 거래소 호출마다 (엔드포인트, 심볼, 결과)별 소요시간 기록
+    - 메서드 래퍼는 처음 쓸 때 1번만 만들어 인스턴스에 캐시
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+        if not callable(attr) or not name.startswith(CALL_PREFIXES):
+            return attr
+        observe = exchange_latency.observe
+        perf_counter = time.perf_counter
+
+        def call(*args, **kwargs):
+            start = perf_counter()
+            outcome = "exception"
+            try:
+                result = attr(*args, **kwargs)
+                outcome = _outcome(result)
+                return result
+            finally:
+                observe(perf_counter() - start, (name, kwargs.get("symbol") or "", outcome))
+        self.__dict__[name] = call
+        return call
+
+
+def instrument_session(session):
+    return InstrumentedSession(session) if METRICS_ENABLED else session
+
+
+def observe_stages(stages, stamps):
+    """
+    새로 찍힌 단계(stamps)가 끝 단계인 구간의 소요시간 기록
+    """
+    if not METRICS_ENABLED:
+        return
+    for stage in stamps:
+        trade_stage_events.inc((stage,))
+    for label, start, end in STAGE_PAIRS:
+        if end in stamps and start in stages and stages[end] is not None and stages[start] is not None:
+            trade_stage_latency.observe(max(0.0, stages[end] - stages[start]), (label,))
@@ -0,0 +1,275 @@
+import os
+import time
+import logging
+import threading
+import itertools
+
+from pybit.unified_trading import WebSocket
+
+# === 개인(private) WebSocket 포지션/체결 스트림 ===
+PRIVATE_WS_ENABLED = os.getenv("PRIVATE_WS_ENABLED", "0") == "1"
+WS_SAFETY_POLL_SEC = float(os.getenv("WS_SAFETY_POLL_SEC", "30"))   # 스트림 사용 시 REST 재확인 주기
+WS_HEALTH_CHECK_SEC = float(os.getenv("WS_HEALTH_CHECK_SEC", "5"))   # 연결 끊김 확인 주기(끊겼으면 다시 연결)
+FAKE_EXCHANGE = os.getenv("FAKE_EXCHANGE", "0") == "1"
+
+
+def _default_ws_factory(api_key, api_secret):
+    if FAKE_EXCHANGE:
+        from fake_exchange import exchange
+        return exchange.private_ws_factory(api_key, api_secret)
+    # 재연결은 허브가 직접(다시 연결한 뒤 감시자들이 REST로 빠진 메시지를 확인하도록)
+    return WebSocket(testnet=False, channel_type="private", api_key=api_key, api_secret=api_secret,
+                     restart_on_error=False)
+
+
+def _ws_connected(ws):
+    if ws is None:
+        return False
+    is_connected = getattr(ws, "is_connected", None)
+    if is_connected is None:
+        return True
+    try:
+        return bool(is_connected())
+    except Exception:
+        return False
+
+
+class PositionWatch:
+    """
+    워커 1개가 감시하는 (API 키, 심볼) 포지션 상태
+    - 포지션 크기가 0보다 커졌다가 0이 되면 closed
+    - 청산 체결(closedSize > 0)의 가격/시각/가중평균을 보관
+    - 주문 상태(order 토픽)는 주문ID별 마지막 상태만 보관
+    - 연결이 끊겼다 다시 붙으면 resync(그 사이 메시지 유실 가능 → 워커가 REST로 바로 확인)
+    - 변화가 생기면 wake 이벤트로 워커를 즉시 깨움
+    """
+
+    def __init__(self, symbol, wake=None):
+        self.symbol = symbol
+        self.wake = wake
+        self.size = None
+        self.seen_open = False
+        self.closed = False
+        self.exit_price = None
+        self.exit_time_ms = None
+        self.orders = {}      # orderId -> orderStatus
+        self.resync = False
+        self._close_notional = 0.0
+        self._close_qty = 0.0
+
+    @property
+    def exit_vwap(self):
+        if self._close_qty <= 0:
+            return None
+        return self._close_notional / self._close_qty
+
+    def mark_open(self):
+        self.seen_open = True
+
+    def on_position(self, item):
+        size = float(item.get('size') or 0)
+        self.size = size
+        if size > 0:
+            self.seen_open = True
+        elif self.seen_open:
+            self.closed = True
+        self._notify()
+
+    def on_execution(self, item):
+        closed_size = float(item.get('closedSize') or 0)
+        if closed_size <= 0:
+            self.seen_open = True
+            return
+        price = float(item['execPrice'])
+        qty = float(item.get('execQty') or closed_size)
+        self.exit_price = price
+        self.exit_time_ms = int(item['execTime'])
+        self._close_notional += price * qty
+        self._close_qty += qty
+        self._notify()
+
+    def on_order(self, item):
+        self.orders[item.get('orderId')] = item.get('orderStatus')
+        if item.get('orderStatus') in ("Filled", "Cancelled", "Rejected", "Deactivated"):
+            self._notify()
+
+    def on_resync(self):
+        self.resync = True
+        self._notify()
+
+    def take_resync(self):
+        """
+        재연결 뒤 첫 확인이면 True(한 번만)
+        """
+        if not self.resync:
+            return False
+        self.resync = False
+        return True
+
+    def _notify(self):
+        if self.wake is not None:
+            self.wake.set()
+
+
+class PrivateStreamHub:
+    """
+    - API 키당 private WebSocket 1개(position/order/execution 토픽 구독, wallet_sink 가 있으면 wallet 토픽도)
+    - 같은 키의 여러 심볼 감시자에게 메시지 분배, 감시자가 0이 되면 연결 종료
+    - WS_HEALTH_CHECK_SEC 마다 연결 상태 확인, 끊긴 연결은 새로 만들어 다시 구독하고 감시자들에 resync 알림
+    - ws_factory 교체로 로컬 대체 서버/가짜 스트림 연결 가능(FAKE_EXCHANGE=1 이면 가짜 거래소 스트림)
+    - 연결(네트워크)은 잠금 밖에서 만들고 잠금 안에서 교체(한 계정의 느린 연결이 다른 계정 분배를 막지 않도록)
+    """
+
+    def __init__(self, ws_factory=None, health_interval=WS_HEALTH_CHECK_SEC):
+        self.ws_factory = ws_factory or _default_ws_factory
+        self.health_interval = health_interval
+        self._conns = {}      # api_key -> {"ws": ws, "secret": api_secret, "watches": {token: PositionWatch}}
+        self._tokens = {}     # token -> api_key
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._monitor = None
+        self.wallet_sink = None   # (api_key, msg) 콜백, 있으면 연결마다 wallet 토픽도 구독
+        self.reconnects = 0
+
+    def _connect(self, api_key, api_secret):
+        # 메시지는 현재 등록된 연결 것만 분배(교체 전/버려진 연결의 메시지는 무시)
+        ws = self.ws_factory(api_key, api_secret)
+        ws.position_stream(lambda msg, k=api_key, w=ws: self._dispatch(k, msg, "position", w))
+        ws.order_stream(lambda msg, k=api_key, w=ws: self._dispatch(k, msg, "order", w))
+        ws.execution_stream(lambda msg, k=api_key, w=ws: self._dispatch(k, msg, "execution", w))
+        if self.wallet_sink is not None:
+            ws.wallet_stream(lambda msg, k=api_key: self._dispatch_wallet(k, msg))
+        return ws
+
+    def watch(self, api_key, api_secret, symbol, wake=None):
+        """
+        감시 등록 후 (token, PositionWatch) 반환
+        연결 실패 시 예외(아무것도 등록하지 않음 → 호출자는 REST 폴링으로 진행)
+        """
+        watch = PositionWatch(symbol, wake)
+        with self._lock:
+            conn = self._conns.get(api_key)
+            if conn is not None:
+                return self._add_watch(conn, api_key, watch), watch
+        ws = self._connect(api_key, api_secret)
+        with self._lock:
+            conn = self._conns.get(api_key)
+            if conn is None:
+                conn = self._conns[api_key] = {"ws": ws, "secret": api_secret, "watches": {}}
+                ws = None
+            token = self._add_watch(conn, api_key, watch)
+        if ws is not None:
+            # 그 사이 같은 키의 다른 감시자가 먼저 연결함
+            self._close(ws)
+        return token, watch
+
+    def _add_watch(self, conn, api_key, watch):
+        token = next(self._seq)
+        conn["watches"][token] = watch
+        self._tokens[token] = api_key
+        if self._monitor is None and self.health_interval > 0:
+            self._monitor = threading.Thread(target=self._monitor_loop, name="private-ws-monitor", daemon=True)
+            self._monitor.start()
+        return token
+
+    def unwatch(self, token):
+        with self._lock:
+            api_key = self._tokens.pop(token, None)
+            conn = self._conns.get(api_key)
+            if conn is None:
+                return
+            conn["watches"].pop(token, None)
+            if conn["watches"]:
+                return
+            del self._conns[api_key]
+        self._close(conn["ws"])
+
+    @staticmethod
+    def _close(ws):
+        try:
+            ws.exit()
+        except Exception as e:
+            logging.error("[private WS 종료 에러] %s", e)
+
+    # --- 재연결 ---
+    def _monitor_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            with self._lock:
+                if not self._conns:
+                    self._monitor = None
+                    return
+                dead = [api_key for api_key, conn in self._conns.items() if not _ws_connected(conn["ws"])]
+            for api_key in dead:
+                self.reconnect(api_key)
+
+    def reconnect(self, api_key):
+        """
+        키 1개의 연결을 새로 만들고 다시 구독, 감시자들은 resync(REST 확인)로 깨움
+        실패하면 다음 확인 때 다시 시도(그동안 감시자들은 WS_SAFETY_POLL_SEC 주기 REST 확인)
+        """
+        with self._lock:
+            conn = self._conns.get(api_key)
+            if conn is None:
+                return False
+            old, secret = conn["ws"], conn["secret"]
+        try:
+            ws = self._connect(api_key, secret)
+        except Exception as e:
+            logging.error("[private WS 재연결 실패] %s", e)
+            return False
+        with self._lock:
+            if self._conns.get(api_key) is not conn or conn["ws"] is not old:
+                # 그 사이 감시자가 모두 빠졌거나 다른 재연결이 먼저 끝남
+                stale = ws
+            else:
+                conn["ws"] = ws
+                self.reconnects += 1
+                watches = list(conn["watches"].values())
+                stale = None
+        if stale is not None:
+            self._close(stale)
+            return False
+        logging.warning("[private WS 재연결] 감시 %s건 REST 재확인", len(watches))
+        self._close(old)
+        for watch in watches:
+            watch.on_resync()
+        return True
+
+    # --- 메시지 분배 ---
+    def _dispatch(self, api_key, msg, kind, ws=None):
+        with self._lock:
+            conn = self._conns.get(api_key)
+            current = conn is not None and (ws is None or conn["ws"] is ws)
+            watches = list(conn["watches"].values()) if current else []
+        for item in msg.get('data') or []:
+            for watch in watches:
+                if item.get('symbol') != watch.symbol:
+                    continue
+                try:
+                    if kind == "position":
+                        watch.on_position(item)
+                    elif kind == "order":
+                        watch.on_order(item)
+                    else:
+                        watch.on_execution(item)
+                except Exception as e:
+                    logging.error("[private WS 메시지 처리 에러] %s", e)
+
+    def _dispatch_wallet(self, api_key, msg):
+        try:
+            self.wallet_sink(api_key, msg)
+        except Exception as e:
+            logging.error("[private WS wallet 처리 에러] %s", e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "connections": len(self._conns),
+                "watches": len(self._tokens),
+                "reconnects": self.reconnects,
+            }
+
+
+# 프로세스 공용 인스턴스
+private_streams = PrivateStreamHub()
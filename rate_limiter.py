@@ -0,0 +1,233 @@
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+# === Bybit 호출량 제한(token bucket) 및 우선순위 대기열 ===
+IP_RATE_PER_SEC = float(os.getenv("RATE_LIMIT_IP_PER_SEC", "100"))
+IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "200"))
+READ_RESERVE_PCT = float(os.getenv("RATE_LIMIT_READ_RESERVE_PCT", "0.2"))  # IP 예산 중 주문용으로 남겨둘 비율
+
+# 엔드포인트별 (초당 허용량, 버스트) - API 키 단위
+ENDPOINT_LIMITS = {
+    "place_order": (10, 10),
+    "cancel_order": (10, 10),
+    "amend_order": (10, 10),
+    "set_trading_stop": (10, 10),
+    "get_positions": (50, 50),
+    "get_open_orders": (50, 50),
+    "get_wallet_balance": (50, 50),
+}
+DEFAULT_KEY_LIMIT = (20, 20)
+
+# 주문/취소/손절설정은 조회보다 우선
+ORDER_ENDPOINTS = {"place_order", "cancel_order", "amend_order", "set_trading_stop", "cancel_all_orders"}
+
+# 응답 헤더 → 엔드포인트 이름 매핑용
+PATH_TO_ENDPOINT = {
+    "/v5/order/create": "place_order",
+    "/v5/order/cancel": "cancel_order",
+    "/v5/order/amend": "amend_order",
+    "/v5/order/cancel-all": "cancel_all_orders",
+    "/v5/order/realtime": "get_open_orders",
+    "/v5/position/trading-stop": "set_trading_stop",
+    "/v5/position/list": "get_positions",
+    "/v5/account/wallet-balance": "get_wallet_balance",
+    "/v5/market/tickers": "get_tickers",
+    "/v5/market/kline": "get_kline",
+    "/v5/market/instruments-info": "get_instruments_info",
+    "/v5/market/time": "get_server_time",
+}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now, reserve=0.0):
+        """
+        토큰 1개(reserve 이상 남기고)를 쓰려면 기다려야 하는 시간(초)
+        """
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        need = 1 + reserve - self.tokens
+        return 0.0 if need <= 0 else need / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def observe(self, remaining, limit, reset_ts):
+        """
+        거래소 응답 헤더(남은 횟수/한도/리셋시각)로 버킷 보정
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining <= 0 and reset_ts:
+                self.blocked_until = max(self.blocked_until, now + max(0.0, reset_ts - time.time()))
+
+
+class RateLimiter:
+    """
+    - (API 키, 엔드포인트)별 버킷 + 서버 IP 전체 버킷
+    - 주문/취소는 IP 예산을 전부 쓸 수 있고, 조회는 READ_RESERVE_PCT 만큼 남겨둔 상태에서만 진행
+    - 주문 대기자가 있으면 조회는 양보
+    - 한도 초과 시 실패 대신 대기(타이머 기반 재시도)
+    """
+
+    def __init__(self, ip_rate=IP_RATE_PER_SEC, ip_burst=IP_BURST, read_reserve_pct=READ_RESERVE_PCT):
+        self.ip_bucket = TokenBucket(ip_rate, ip_burst)
+        self.read_reserve_pct = read_reserve_pct
+        self.read_reserve = ip_burst * read_reserve_pct
+        self._buckets = {}    # (api_key, endpoint) -> TokenBucket
+        self._cond = threading.Condition()
+        self._orders_waiting = 0
+        self.waited = 0
+        self.total_wait_sec = 0.0
+
+    def _bucket(self, api_key, endpoint):
+        key = (api_key, endpoint)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = ENDPOINT_LIMITS.get(endpoint, DEFAULT_KEY_LIMIT)
+            bucket = TokenBucket(rate, burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    def set_ip_budget(self, ip_rate, ip_burst):
+        """
+        서버 IP 예산 변경(샤딩 시 API 프로세스 몫만 남길 때)
+        """
+        with self._cond:
+            self.ip_bucket = TokenBucket(ip_rate, ip_burst)
+            self.read_reserve = ip_burst * self.read_reserve_pct
+            self._cond.notify_all()
+
+    def acquire(self, api_key, endpoint):
+        """
+        호출 가능해질 때까지 대기, 대기한 시간(초) 반환
+        """
+        is_order = endpoint in ORDER_ENDPOINTS
+        start = time.monotonic()
+        with self._cond:
+            if is_order:
+                self._orders_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    key_wait = self._bucket(api_key, endpoint).wait_time(now) if api_key else 0.0
+                    if is_order:
+                        ip_wait = self.ip_bucket.wait_time(now)
+                    elif self._orders_waiting:
+                        # 주문 대기자에게 양보
+                        ip_wait = max(self.ip_bucket.wait_time(now), 0.05)
+                    else:
+                        ip_wait = self.ip_bucket.wait_time(now, reserve=self.read_reserve)
+                    wait = max(key_wait, ip_wait)
+                    if wait <= 0:
+                        if api_key:
+                            self._bucket(api_key, endpoint).take()
+                        self.ip_bucket.take()
+                        break
+                    self._cond.wait(wait)
+            finally:
+                if is_order:
+                    self._orders_waiting -= 1
+                    self._cond.notify_all()
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self.waited += 1
+            self.total_wait_sec += waited
+        return waited
+
+    def observe_response(self, response, *args, **kwargs):
+        """
+        requests 응답 훅: X-Bapi-Limit-* 헤더로 버킷 보정
+        """
+        try:
+            headers = response.headers
+            remaining = headers.get("X-Bapi-Limit-Status")
+            if remaining is None:
+                return
+            endpoint = PATH_TO_ENDPOINT.get(urlparse(response.url).path)
+            api_key = response.request.headers.get("X-BAPI-API-KEY")
+            if not endpoint or not api_key:
+                return
+            limit = headers.get("X-Bapi-Limit")
+            reset_ms = headers.get("X-Bapi-Limit-Reset-Timestamp")
+            with self._cond:
+                self._bucket(api_key, endpoint).observe(
+                    int(remaining),
+                    int(limit) if limit else None,
+                    int(reset_ms) / 1000 if reset_ms else None,
+                )
+                self._cond.notify_all()
+        except Exception as e:
+            logging.error("[호출량 헤더 처리 에러] %s", e)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            self.ip_bucket._refill(now)
+            keys = {}
+            for (api_key, endpoint), bucket in self._buckets.items():
+                bucket._refill(now)
+                masked = f"{api_key[:4]}***" if api_key else "public"
+                keys.setdefault(masked, {})[endpoint] = {
+                    "tokens": round(bucket.tokens, 2),
+                    "capacity": bucket.capacity,
+                    "blocked_ms": round(max(0.0, bucket.blocked_until - now) * 1000, 1),
+                }
+            return {
+                "ip": {"tokens": round(self.ip_bucket.tokens, 2), "capacity": self.ip_bucket.capacity},
+                "orders_waiting": self._orders_waiting,
+                "waited_calls": self.waited,
+                "total_wait_sec": round(self.total_wait_sec, 3),
+                "keys": keys,
+            }
+
+
+class RateLimitedSession:
+    """
+    pybit HTTP 세션 래퍼: 거래소 호출 메서드 앞에서 rate_limiter.acquire 수행
+    """
+
+    def __init__(self, session, api_key, limiter):
+        self._session = session
+        self._api_key = api_key
+        self._limiter = limiter
+        client = getattr(session, "client", None)
+        if client is not None:
+            client.hooks.setdefault("response", []).append(limiter.observe_response)
+
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+        if not callable(attr) or not name.startswith(("get_", "place_", "cancel_", "amend_", "set_")):
+            return attr
+        limiter = self._limiter
+        api_key = self._api_key
+
+        def call(*args, **kwargs):
+            limiter.acquire(api_key, name)
+            return attr(*args, **kwargs)
+        return call
+
+
+# 프로세스 공용 인스턴스
+rate_limiter = RateLimiter()
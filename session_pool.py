@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from pybit.unified_trading import HTTP
+
+from rate_limiter import rate_limiter, RateLimitedSession
+from metrics import instrument_session
+
+# === API 키별 pybit HTTP 세션 풀(keep-alive 재사용) ===
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "512"))
+SESSION_IDLE_SEC = float(os.getenv("SESSION_IDLE_SEC", "900"))
+FAKE_EXCHANGE = os.getenv("FAKE_EXCHANGE", "0") == "1"   # 부하/지연 테스트: 가짜 거래소(fake_exchange.py)로 연결
+
+
+def _default_session_factory(api_key, api_secret, testnet):
+    if FAKE_EXCHANGE:
+        from fake_exchange import exchange
+        return exchange.session_factory(api_key, api_secret, testnet)
+    if api_key is None:
+        return HTTP(testnet=testnet)
+    return HTTP(testnet=testnet, api_key=api_key, api_secret=api_secret)
+
+
+def _open_connections(session):
+    """
+    세션이 지금까지 연 TCP/TLS 연결 수(urllib3 풀 통계, 확인 불가 시 0)
+    """
+    client = getattr(session, "client", None)
+    if client is None:
+        return 0
+    total = 0
+    for adapter in client.adapters.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            continue
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            total += getattr(pool, "num_connections", 0)
+    return total
+
+
+class _Entry:
+    __slots__ = ("session", "api_secret", "leases", "last_used")
+
+    def __init__(self, session, api_secret):
+        self.session = session
+        self.api_secret = api_secret
+        self.leases = 0
+        self.last_used = time.monotonic()
+
+
+class SessionPool:
+    """
+    - (api_key, testnet) 별로 HTTP 세션 1개를 만들어 재사용(연결 유지로 TLS 핸드셰이크 절약)
+    - acquire/release(또는 checkout 컨텍스트)로 사용 중 개수를 관리, 사용 중인 세션은 제거하지 않음
+    - 최대 개수 초과 시 오래 안 쓴 세션부터, 유휴 시간 초과 세션은 주기적으로 제거
+    - api_key=None 은 공용(public) 조회용 세션
+    - limiter가 있으면 세션을 RateLimitedSession으로 감싸 모든 호출이 호출량 제한을 거치게 함
+    - instrument가 있으면 그 안쪽(호출량 제한 대기 제외)에서 거래소 호출 소요시간 기록
+    """
+
+    def __init__(self, session_factory=None, max_size=SESSION_POOL_SIZE, idle_timeout=SESSION_IDLE_SEC,
+                 limiter=rate_limiter, instrument=instrument_session):
+        self.session_factory = session_factory or _default_session_factory
+        self.limiter = limiter
+        self.instrument = instrument
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()
+        self._by_session = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._closed_handshakes = 0
+
+    def acquire(self, api_key, api_secret=None, testnet=False):
+        key = (api_key, testnet)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.api_secret != api_secret:
+                # 같은 키에 시크릿이 바뀐 경우 새 세션
+                self._drop(key, entry)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                session = self.session_factory(api_key, api_secret, testnet)
+                if self.instrument is not None:
+                    session = self.instrument(session)
+                if self.limiter is not None:
+                    session = RateLimitedSession(session, api_key, self.limiter)
+                entry = _Entry(session, api_secret)
+                self._entries[key] = entry
+                self._by_session[id(entry.session)] = key
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+            self._evict()
+            return entry.session
+
+    def release(self, session):
+        with self._lock:
+            key = self._by_session.get(id(session))
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.leases = max(0, entry.leases - 1)
+            entry.last_used = time.monotonic()
+
+    @contextmanager
+    def checkout(self, api_key, api_secret=None, testnet=False):
+        session = self.acquire(api_key, api_secret, testnet)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def public(self, testnet=False):
+        """
+        키 없는 공용 세션(반납 불필요, 제거 대상 아님)
+        """
+        key = (None, testnet)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.leases = max(entry.leases, 1)
+                return entry.session
+        session = self.acquire(None, None, testnet)
+        return session
+
+    def _drop(self, key, entry):
+        del self._entries[key]
+        self._by_session.pop(id(entry.session), None)
+        self._closed_handshakes += _open_connections(entry.session)
+        # 아직 사용 중인 세션(시크릿 교체 등)은 연결을 닫지 않고 풀에서만 뺌
+        client = getattr(entry.session, "client", None)
+        if client is not None and entry.leases == 0:
+            client.close()
+        self.evictions += 1
+
+    def _evict(self):
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if entry.leases == 0 and now - entry.last_used > self.idle_timeout:
+                self._drop(key, entry)
+        while len(self._entries) > self.max_size:
+            victim = next(((k, e) for k, e in self._entries.items() if e.leases == 0), None)
+            if victim is None:
+                break
+            self._drop(*victim)
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            handshakes = self._closed_handshakes + sum(_open_connections(e.session) for e in self._entries.values())
+            return {
+                "size": len(self._entries),
+                "leased": sum(1 for e in self._entries.values() if e.leases > 0),
+                "hits": self.hits,
+                "misses": self.misses,
+                "handshakes": handshakes,
+                "evictions": self.evictions,
+            }
+
+
+# 프로세스 공용 인스턴스
+session_pool = SessionPool()
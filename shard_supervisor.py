@@ -0,0 +1,642 @@
+import os
+import sys
+import glob
+import time
+import zlib
+import atexit
+import socket
+import logging
+import threading
+import itertools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+
+try:
+    import fcntl
+except ImportError:  # Windows 로컬 실행: 감독자 중복 기동 잠금 없이 동작
+    fcntl = None
+
+# === 매매 샤딩(user_id 해시로 여러 워커 프로세스에 분산, 프로세스마다 GIL/캐시 별도) ===
+# API 프로세스(gunicorn 워커 1개)는 라우팅만, 매매 루프는 샤드 프로세스에서 실행
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))                        # 0: 샤딩 안 함(기존처럼 한 프로세스)
+SHARD_API_IP_SHARE = float(os.getenv("SHARD_API_IP_SHARE", "0.1"))      # 서버 IP 호출 예산 중 API 프로세스(잔고 조회 등) 몫
+SHARD_RESPAWN = os.getenv("SHARD_RESPAWN", "1") == "1"                  # 죽은 샤드 대신 새 샤드 띄우기
+SHARD_RPC_TIMEOUT_SEC = float(os.getenv("SHARD_RPC_TIMEOUT_SEC", "30"))
+SHARD_READY_TIMEOUT_SEC = float(os.getenv("SHARD_READY_TIMEOUT_SEC", "120"))  # 샤드 기동(재시작 복구 포함) 대기
+SHARD_RPC_THREADS = int(os.getenv("SHARD_RPC_THREADS", "64"))           # 샤드 안에서 요청 동시 처리 수(long-poll 포함)
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "trade_journal.jsonl")
+LOG_FILE = os.getenv("LOG_FILE", "log.txt")
+
+
+class ShardUnavailable(Exception):
+    pass
+
+
+def route_key(user_id):
+    """
+    묶음 매매 다리(user#n)는 부모 user_id 와 같은 샤드로
+    """
+    return str(user_id).split("#", 1)[0]
+
+
+def rendezvous(key, shard_ids):
+    """
+    가장 높은 점수의 샤드 선택(샤드가 빠지면 그 샤드 몫만 다른 샤드로 이동)
+    """
+    return max(shard_ids, key=lambda sid: zlib.crc32(f"{sid}:{key}".encode()))
+
+
+def shard_journal_path(shard_id):
+    return f"{JOURNAL_PATH}.shard{shard_id}"
+
+
+def shard_env(shard_id, count, fd):
+    """
+    샤드 프로세스 환경변수: 저널/로그 파일 분리, 상태는 프로세스 내 저장소
+    - 서버 IP 호출 예산은 API 프로세스 몫(SHARD_API_IP_SHARE)을 뺀 나머지를 샤드 수로 나눔
+    """
+    env = dict(os.environ)
+    env.update(
+        SHARD_COUNT="0",
+        SHARD_ID=str(shard_id),
+        SHARD_FD=str(fd),
+        STATE_BACKEND="memory",
+        WEB_CONCURRENCY="1",
+        JOURNAL_PATH=shard_journal_path(shard_id),
+    )
+    if LOG_FILE:
+        root, ext = os.path.splitext(LOG_FILE)
+        env["LOG_FILE"] = f"{root}.shard{shard_id}{ext}"
+    from rate_limiter import IP_RATE_PER_SEC, IP_BURST
+    share = (1 - SHARD_API_IP_SHARE) / count
+    env["RATE_LIMIT_IP_PER_SEC"] = str(IP_RATE_PER_SEC * share)
+    env["RATE_LIMIT_IP_BURST"] = str(max(1.0, IP_BURST * share))
+    return env
+
+
+def has_trade(path, user_id, trade):
+    """
+    path 저널이 같은 매매(trade_id, 없으면 진입시각/심볼)를 이미 넘겨받았는지(그 뒤 종료됐어도 True)
+    """
+    from trade_journal import TradeJournal
+
+    def identity(params):
+        params = params or {}
+        return params.get("trade_id"), params.get("entry_time"), params.get("symbol")
+
+    if not os.path.exists(path):
+        return False
+    want = identity(trade.get("params"))
+    for rec in TradeJournal(path).records():
+        if rec.get("user_id") == user_id and rec.get("event") == "snapshot" \
+                and identity((rec.get("data") or {}).get("params")) == want:
+            return True
+    return False
+
+
+class _Pending:
+    __slots__ = ("done", "ok", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.result = None
+
+
+class ShardClient:
+    """
+    API 프로세스 쪽 샤드 1개: 소켓 쌍(socketpair) 위 multiprocessing Connection 으로 (요청ID, 명령, 인자) 전송
+    - 응답은 읽기 쓰레드가 요청ID로 짝지어 대기 중인 호출자를 깨움(여러 요청 동시 진행)
+    - 연결이 끊기면 대기 중인 호출 모두 ShardUnavailable
+    """
+
+    def __init__(self, shard_id, process, conn):
+        self.shard_id = shard_id
+        self.process = process
+        self.conn = conn
+        self.alive = True
+        self._pending = {}
+        self._seq = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_loop, name=f"shard-{shard_id}-reader", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        try:
+            while True:
+                req_id, ok, result = self.conn.recv()
+                with self._lock:
+                    pending = self._pending.pop(req_id, None)
+                if pending is not None:
+                    pending.ok, pending.result = ok, result
+                    pending.done.set()
+        except (EOFError, OSError):
+            pass
+        self._fail_all()
+
+    def _fail_all(self):
+        with self._lock:
+            self.alive = False
+            pending, self._pending = list(self._pending.values()), {}
+        for p in pending:
+            p.ok, p.result = False, ShardUnavailable(f"샤드 {self.shard_id} 연결 끊김")
+            p.done.set()
+
+    def call(self, op, *args, timeout=SHARD_RPC_TIMEOUT_SEC):
+        pending = _Pending()
+        with self._lock:
+            if not self.alive:
+                raise ShardUnavailable(f"샤드 {self.shard_id} 종료됨")
+            req_id = next(self._seq)
+            self._pending[req_id] = pending
+        try:
+            with self._send_lock:
+                self.conn.send((req_id, op, args))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise ShardUnavailable(f"샤드 {self.shard_id} 전송 실패: {e}")
+        if not pending.done.wait(timeout):
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise ShardUnavailable(f"샤드 {self.shard_id} 응답 없음({op}, {timeout}초)")
+        if pending.ok:
+            return pending.result
+        if isinstance(pending.result, Exception):
+            raise pending.result
+        raise RuntimeError(pending.result)
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        self._fail_all()
+
+
+class ShardSupervisor:
+    """
+    - 샤드 프로세스 N개 실행, user_id 를 rendezvous 해시로 배정(한 번 배정된 사용자는 그 샤드에 고정)
+    - 매매 시작/중단/상태조회를 소유 샤드로 전달, api_server 에는 상태저장소(get/wait/request_stop/epoch)로 보임
+    - 샤드가 죽으면: 새 샤드 기동 → 죽은 샤드 저널의 미종료 매매를 살아있는 샤드들이 나눠 넘겨받아
+      trade_recovery 로 거래소 대조 후 재개(나머지 사용자는 다음 요청부터 해시로 재배정)
+    - 시작 시 현재 샤드가 아닌 저널 파일(이전 실행에서 재기동된 샤드 등)도 같은 방식으로 넘겨받음
+    - 감독자는 저널 경로당 1개만(.supervisor.lock), 샤드가 모두 뜨기 전에는 라우팅하지 않음(샤드 없음 응답)
+    """
+
+    backend = "sharded"
+
+    def __init__(self, count=SHARD_COUNT, respawn=SHARD_RESPAWN):
+        self.count = count
+        self.respawn = respawn
+        self._shards = {}     # shard_id -> ShardClient(살아있는 것만)
+        self._owners = {}     # route_key -> shard_id
+        self._lock = threading.Lock()
+        self._next_id = count
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._monitor = None
+        self._lock_fd = None
+        self.start_error = None
+        self.base_epoch = f"{int(time.time() * 1000):x}"
+        self.generation = 0
+        self.deaths = 0
+        self.adopted = 0
+
+    # --- 기동/종료 ---
+    def _spawn(self, shard_id):
+        parent_sock, child_sock = socket.socketpair()
+        try:
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__)],
+                env=shard_env(shard_id, self.count, child_sock.fileno()),
+                pass_fds=(child_sock.fileno(),),
+            )
+        finally:
+            child_sock.close()
+        client = ShardClient(shard_id, process, Connection(parent_sock.detach()))
+        users = client.call("users", timeout=SHARD_READY_TIMEOUT_SEC)
+        with self._lock:
+            self._shards[shard_id] = client
+            for user_id in users:
+                self._owners[route_key(user_id)] = shard_id
+        logging.info("[샤드] %s번 기동(pid=%s, 복구 매매 %s건)", shard_id, process.pid, len(users))
+        return client
+
+    def _acquire_lock(self):
+        """
+        같은 저널 경로로 감독자가 두 개 뜨지 않도록(gunicorn 워커가 여러 개면 샤드 묶음이 중복돼 저널을 같이 씀)
+        """
+        if fcntl is None or self._lock_fd is not None:
+            return
+        fd = os.open(JOURNAL_PATH + ".supervisor.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise RuntimeError(
+                f"샤드 감독자가 이미 실행 중입니다({JOURNAL_PATH}.supervisor.lock). "
+                "SHARD_COUNT > 0 이면 gunicorn 워커는 1개(WEB_CONCURRENCY=1)로 실행하세요.")
+        self._lock_fd = fd
+
+    @staticmethod
+    def _check_journal():
+        """
+        샤드 장애 시 인수는 저널의 API 시크릿으로만 가능 → 시크릿을 기록할 수 없으면 기동 거부
+        """
+        from trade_journal import secrets_recoverable
+        if not secrets_recoverable():
+            raise RuntimeError("SHARD_COUNT > 0 이면 JOURNAL_ENABLED=1, JOURNAL_SECRET_KEY 설정, pycryptodome 설치가 필요합니다"
+                               "(없으면 죽은 샤드의 매매를 넘겨받아 재개할 수 없음).")
+
+    def start_background(self):
+        """
+        잠금만 바로 잡고 샤드 기동(재시작 복구 포함, 최대 SHARD_READY_TIMEOUT_SEC)은 백그라운드에서
+        - gunicorn 워커 부팅 타임아웃에 걸리지 않도록, 기동 전 요청은 샤드 없음으로 응답
+        """
+        self._check_journal()
+        self._acquire_lock()
+
+        def run():
+            try:
+                self.start()
+            except Exception as e:
+                self.start_error = str(e)
+                logging.exception("[샤드] 기동 실패: %s", e)
+
+        threading.Thread(target=run, name="shard-start", daemon=True).start()
+        return self
+
+    def start(self):
+        if self._monitor is not None:
+            return self
+        self._check_journal()
+        self._acquire_lock()
+        if SHARD_API_IP_SHARE > 0:
+            # 이 프로세스(잔고 조회 등)는 남겨둔 몫만 사용
+            from rate_limiter import rate_limiter, IP_RATE_PER_SEC, IP_BURST
+            rate_limiter.set_ip_budget(IP_RATE_PER_SEC * SHARD_API_IP_SHARE, max(1.0, IP_BURST * SHARD_API_IP_SHARE))
+        orphans = self._orphan_journals(range(self.count))
+        self._next_id = max([self.count] + [sid + 1 for sid in orphans])
+        with ThreadPoolExecutor(max_workers=max(1, self.count)) as pool:
+            list(pool.map(self._spawn, range(self.count)))
+        self._ready.set()
+        for path in orphans.values():
+            self._adopt_journal(path)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="shard-monitor", daemon=True)
+        self._monitor.start()
+        atexit.register(self.shutdown)
+        return self
+
+    def shutdown(self):
+        self._stop.set()
+        with self._lock:
+            shards, self._shards = list(self._shards.values()), {}
+        for client in shards:
+            client.close()
+            client.process.terminate()
+        for client in shards:
+            try:
+                client.process.wait(10)
+            except subprocess.TimeoutExpired:
+                client.process.kill()
+
+    # --- 샤드 장애/재배정 ---
+    def _monitor_loop(self):
+        while not self._stop.wait(0.5):
+            with self._lock:
+                dead = [sid for sid, c in self._shards.items() if c.process.poll() is not None or not c.alive]
+            for shard_id in dead:
+                try:
+                    self._handle_death(shard_id)
+                except Exception as e:
+                    logging.exception("[샤드] %s번 장애 처리 에러: %s", shard_id, e)
+
+    def _handle_death(self, shard_id):
+        with self._lock:
+            client = self._shards.pop(shard_id, None)
+            if client is None:
+                return
+            self.generation += 1
+            self.deaths += 1
+            for key in [k for k, sid in self._owners.items() if sid == shard_id]:
+                del self._owners[key]
+        client.close()
+        if client.process.poll() is None:
+            client.process.kill()
+        logging.error("[샤드] %s번 종료(exit=%s), 매매 재배정 시작", shard_id, client.process.wait())
+        if self.respawn:
+            with self._lock:
+                new_id, self._next_id = self._next_id, self._next_id + 1
+            try:
+                self._spawn(new_id)
+            except Exception as e:
+                logging.error("[샤드] 대체 샤드 %s번 기동 실패: %s", new_id, e)
+        self._adopt_journal(shard_journal_path(shard_id))
+
+    def _orphan_journals(self, current_ids):
+        """
+        현재 샤드가 아닌 샤드 저널 {shard_id: path}
+        """
+        orphans = {}
+        for path in glob.glob(f"{JOURNAL_PATH}.shard*"):
+            suffix = path[len(JOURNAL_PATH) + len(".shard"):]
+            if suffix.isdigit() and int(suffix) not in current_ids:
+                orphans[int(suffix)] = path
+        return orphans
+
+    def _adopt_journal(self, path):
+        """
+        저널의 미종료 매매를 살아있는 샤드들에 해시로 나눠 넘김(받은 샤드가 복구 후 원본 저널에 종료 기록)
+        """
+        from trade_journal import JOURNAL_ENABLED, TradeJournal
+        if not JOURNAL_ENABLED or not os.path.exists(path):
+            return
+        trades = TradeJournal(path).replay()
+        groups = {}
+        for user_id in trades:
+            shard = self._route(user_id)
+            if shard is None:
+                logging.error("[샤드] 살아있는 샤드가 없어 %s 매매 %s건을 넘기지 못함", path, len(trades))
+                return
+            groups.setdefault(shard, []).append(user_id)
+        for shard, user_ids in groups.items():
+            try:
+                report = shard.call("adopt", path, user_ids, timeout=SHARD_READY_TIMEOUT_SEC)
+            except Exception as e:
+                logging.error("[샤드] %s번이 매매 %s건 인수 실패: %s", shard.shard_id, len(user_ids), e)
+                continue
+            with self._lock:
+                for user_id in user_ids:
+                    self._owners[route_key(user_id)] = shard.shard_id
+                self.adopted += len(user_ids) - report.get("kept", 0)
+            logging.info("[샤드] %s번이 %s 매매 %s건 인수: %s", shard.shard_id, path, len(user_ids), report)
+        if not TradeJournal(path).replay():
+            for leftover in (path, path + ".lock"):
+                try:
+                    os.remove(leftover)
+                except FileNotFoundError:
+                    pass
+
+    # --- 라우팅 ---
+    def _route(self, user_id):
+        key = route_key(user_id)
+        if not self._ready.is_set():
+            # 일부 샤드만 떠 있을 때 배정하면 아직 복구 중인 샤드의 사용자를 다른 샤드로 보내게 됨
+            return None
+        with self._lock:
+            if not self._shards:
+                return None
+            shard_id = self._owners.get(key)
+            if shard_id not in self._shards:
+                shard_id = rendezvous(key, list(self._shards))
+            return self._shards[shard_id]
+
+    def call(self, user_id, op, *args, timeout=SHARD_RPC_TIMEOUT_SEC):
+        shard = self._route(user_id)
+        if shard is None:
+            raise ShardUnavailable("살아있는 샤드 없음")
+        return shard.call(op, *args, timeout=timeout)
+
+    def _start(self, op, user_id, data):
+        shard = self._route(user_id)
+        if shard is None:
+            return {"success": False, "msg": "매매 프로세스(샤드) 없음"}
+        try:
+            result = shard.call(op, data)
+        except ShardUnavailable as e:
+            return {"success": False, "msg": f"매매 프로세스(샤드) 오류: {e}"}
+        if result.get("success"):
+            with self._lock:
+                self._owners[route_key(user_id)] = shard.shard_id
+        return result
+
+    def start_trade(self, user_id, data):
+        return self._start("start_trade", user_id, data)
+
+    def start_trades(self, user_id, data):
+        return self._start("start_trades", user_id, data)
+
+    # --- 상태저장소 인터페이스(api_server 조회/중단/long-poll/SSE) ---
+    @property
+    def epoch(self):
+        # 샤드가 바뀌면 버전이 다시 시작하므로 이전 ETag 무효화
+        return f"{self.base_epoch}g{self.generation}"
+
+    def get(self, user_id):
+        try:
+            return self.call(user_id, "get", user_id)
+        except ShardUnavailable as e:
+            logging.error("[샤드] 상태 조회 실패(%s): %s", user_id, e)
+            return None
+
+    def wait(self, user_id, version, timeout):
+        try:
+            return self.call(user_id, "wait", user_id, version, timeout, timeout=timeout + SHARD_RPC_TIMEOUT_SEC)
+        except ShardUnavailable as e:
+            logging.error("[샤드] 상태 대기 실패(%s): %s", user_id, e)
+            return None
+
+    def request_stop(self, user_id):
+        try:
+            return self.call(user_id, "stop", user_id)
+        except ShardUnavailable as e:
+            logging.error("[샤드] 중단 요청 실패(%s): %s", user_id, e)
+            return False
+
+    def publish(self, user_id, status):
+        pass
+
+    def stats(self):
+        with self._lock:
+            shards = list(self._shards.values())
+            owners = len(self._owners)
+        per_shard = {}
+        for client in shards:
+            try:
+                per_shard[client.shard_id] = client.call("stats", timeout=5)
+            except Exception as e:
+                per_shard[client.shard_id] = {"error": str(e)}
+        return {
+            "ready": self._ready.is_set(),
+            "start_error": self.start_error,
+            "shards": per_shard,
+            "routed_users": owners,
+            "generation": self.generation,
+            "deaths": self.deaths,
+            "adopted": self.adopted,
+        }
+
+
+# 프로세스 공용 인스턴스
+supervisor = ShardSupervisor()
+
+
+# === 샤드 프로세스 쪽 ===
+class ShardServer:
+    """
+    샤드 프로세스: API 프로세스 요청을 쓰레드 풀에서 처리(long-poll 대기가 다른 요청을 막지 않도록)
+    """
+
+    def __init__(self, shard_id, conn):
+        import trade_worker as tw
+        import trade_recovery
+        from state_store import MemoryStateStore
+
+        self.shard_id = shard_id
+        self.conn = conn
+        self.tw = tw
+        self.recovery = trade_recovery
+        self.trade_statuses = {}
+        self.store = MemoryStateStore(self.trade_statuses)
+        tw.attach_state_store(self.store, self.trade_statuses)
+        self._send_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=SHARD_RPC_THREADS, thread_name_prefix=f"shard{shard_id}-rpc")
+
+    def recover(self):
+        if self.recovery.RECOVER_ON_START:
+            try:
+                self.recovery.recover_trades(self.trade_statuses, self.store.claim)
+            except Exception as e:
+                logging.exception("[샤드 %s] 재시작 복구 에러: %s", self.shard_id, e)
+
+    def serve(self):
+        while True:
+            try:
+                req_id, op, args = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            self._pool.submit(self._handle, req_id, op, args)
+
+    def _handle(self, req_id, op, args):
+        try:
+            reply = (req_id, True, getattr(self, f"op_{op}")(*args))
+        except Exception as e:
+            logging.exception("[샤드 %s] %s 처리 에러: %s", self.shard_id, op, e)
+            reply = (req_id, False, f"{type(e).__name__}: {e}")
+        try:
+            with self._send_lock:
+                self.conn.send(reply)
+        except (OSError, ValueError) as e:
+            logging.error("[샤드 %s] 응답 전송 실패: %s", self.shard_id, e)
+
+    # --- 명령 ---
+    def op_users(self):
+        return list(self.trade_statuses)
+
+    def op_start_trade(self, data):
+        user_id = data.get("user_id")
+        if not self.store.claim(user_id):
+            current = self.store.get(user_id) or {}
+            return {"success": False, "msg": "이미 매매 중입니다.", "info": current.get("info", {})}
+        ok, msg = self.tw.start_trade_thread(
+            user_id=user_id,
+            trade_statuses=self.trade_statuses,
+            api_key=data.get("api_key"),
+            api_secret=data.get("api_secret"),
+            position_type=data.get("position_type"),
+            symbol=data.get("symbol"),
+            fixed_loss=data.get("fixed_loss"),
+            entry_time=data.get("entry_time"),
+            exit_time=data.get("exit_time"),
+            take_profit=data.get("take_profit"),
+            stop_loss=data.get("stop_loss"),
+            immediate=data.get("immediate", False)
+        )
+        return {"success": ok, "msg": msg, "info": self.trade_statuses.get(user_id, {}).get("info", {})}
+
+    def op_start_trades(self, data):
+        import batch_worker
+        user_id = data.get("user_id")
+        if not self.store.claim(user_id):
+            current = self.store.get(user_id) or {}
+            return {"success": False, "msg": "이미 매매 중입니다.", "info": current.get("info", {})}
+        legs = data.get("legs")
+        busy = batch_worker.claim_legs(self.store, user_id, len(legs))
+        if busy is not None:
+            self.store.release(user_id)
+            return {"success": False, "msg": f"이미 매매 중인 다리가 있습니다: {busy}"}
+        leg_ids = [batch_worker.leg_id(user_id, i) for i in range(len(legs))]
+        ok, msg = batch_worker.start_batch_thread(
+            user_id=user_id,
+            trade_statuses=self.trade_statuses,
+            api_key=data.get("api_key"),
+            api_secret=data.get("api_secret"),
+            legs=legs,
+            entry_time=data.get("entry_time"),
+            exit_time=data.get("exit_time"),
+            immediate=data.get("immediate", False)
+        )
+        return {"success": ok, "msg": msg, "legs": leg_ids}
+
+    def op_get(self, user_id):
+        return self.store.get(user_id)
+
+    def op_wait(self, user_id, version, timeout):
+        return self.store.wait(user_id, version, timeout)
+
+    def op_stop(self, user_id):
+        return self.tw.request_stop(self.trade_statuses, user_id)
+
+    def op_adopt(self, path, user_ids):
+        """
+        죽은 샤드 저널의 매매를 이 샤드 저널로 옮겨 복구
+        - 원본에 넘겨받는 저널(handoff_to) 기록 → 이 저널에 snapshot → 복구 → 원본에 종료 순서
+        - 중간에 죽어 원본에 매매가 남아 있어도, handoff_to 저널에 같은 매매가 있으면 다시 넘겨받지 않고 종료만 기록
+        - 재개/정리하지 못한 매매(시크릿 없음, 거래소 조회 실패 등)는 원본에 되돌려 남김(다음 기동 때 다시 인수)
+        - 이 샤드에서 같은 사용자가 매매 중이면 저널 기록이 겹치므로 넘겨받지 않음
+        """
+        from trade_journal import TradeJournal, journal
+        source = TradeJournal(path)
+        trades = source.replay()
+        picked = {user_id: trades[user_id] for user_id in user_ids if user_id in trades}
+        moved, fresh, adopted = [], {}, set()
+        for user_id, trade in picked.items():
+            target = trade["info"].get("handoff_to")
+            if target and has_trade(target, user_id, trade):
+                if target != journal.path:
+                    moved.append(user_id)
+                    continue
+            elif (self.store.get(user_id) or {}).get("running"):
+                continue
+            else:
+                fresh[user_id] = trade
+            adopted.add(user_id)
+        source.append_many([(user_id, "handoff", {"handoff_to": journal.path}) for user_id in fresh])
+        journal.append_many([(user_id, "snapshot", trade) for user_id, trade in fresh.items()])
+        outcomes = {}
+        report = self.recovery.recover_trades(self.trade_statuses, self.store.claim, user_ids=adopted, outcomes=outcomes)
+        handled = [user_id for user_id in adopted if outcomes.get(user_id) in self.recovery.HANDLED]
+        kept = [user_id for user_id in picked if user_id not in handled and user_id not in moved]
+        journal.append_many([(user_id, "finished", {}) for user_id in kept if user_id in adopted])
+        source.append_many([(user_id, "handoff", {"handoff_to": None}) for user_id in kept]
+                            + [(user_id, "finished", {}) for user_id in handled + moved])
+        source.compact()
+        if kept:
+            logging.error("[샤드] %s 매매 %s건을 재개하지 못해 원본 저널에 남김: %s",
+                          path, len(kept), {user_id: outcomes.get(user_id, "skipped") for user_id in kept})
+        return dict(report, kept=len(kept))
+
+    def op_stats(self):
+        return {
+            "pid": os.getpid(),
+            "trades": len(self.trade_statuses),
+            "running": sum(1 for s in list(self.trade_statuses.values()) if s.get("running")),
+            "threads": threading.active_count(),
+        }
+
+
+def shard_main():
+    shard_id = int(os.environ["SHARD_ID"])
+    conn = Connection(int(os.environ["SHARD_FD"]))
+    server = ShardServer(shard_id, conn)
+    server.recover()
+    server.serve()
+    # API 프로세스가 사라지면 샤드도 종료(매매는 저널로 다음 기동 때 복구)
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    shard_main()
@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+# === 매매 상태 저장소(여러 gunicorn 워커가 공유) ===
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))      # gunicorn 워커 수(Procfile --workers 와 같은 값)
+# memory | sqlite, 워커가 여러 개면 기본 sqlite(프로세스 내 딕셔너리로는 조회/중단/중복확인이 다른 워커로 감)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "memory")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "trade_state.db")
+OWNER_TTL_SEC = float(os.getenv("STATE_OWNER_TTL_SEC", "15"))  # 하트비트가 이보다 오래되면 죽은 프로세스로 간주
+STATE_POLL_SEC = float(os.getenv("STATE_POLL_SEC", "0.5"))     # 하트비트/중단요청 확인/쓰기 반영 주기
+
+
+def owner_id():
+    """
+    현재 프로세스 식별자(gunicorn 워커마다 다름, fork 이후에 호출할 것)
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _dumps(status):
+    return json.dumps(status, ensure_ascii=False, default=str)
+
+
+class _VersionWaiters:
+    """
+    유저별 상태 버전 변경 대기(long-poll), 해당 유저의 대기자만 깨움
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conds = {}    # user_id -> [Condition, 대기자 수]
+
+    def notify(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._conds.get(user_id)
+                if entry is not None:
+                    entry[0].notify_all()
+
+    def wait(self, user_id, timeout, unchanged=None):
+        """
+        unchanged(): 잠금 안에서 한 번 더 확인(확인~대기 사이 변경 놓침 방지)
+        """
+        with self._lock:
+            if unchanged is not None and not unchanged():
+                return
+            entry = self._conds.get(user_id)
+            if entry is None:
+                entry = self._conds[user_id] = [threading.Condition(self._lock), 0]
+            entry[1] += 1
+            try:
+                entry[0].wait(timeout)
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._conds.pop(user_id, None)
+
+
+class MemoryStateStore:
+    """
+    - 단일 프로세스용: 프로세스 내 trade_statuses 딕셔너리를 그대로 조회
+    - 워커 1개로만 운영할 때(기존 동작과 동일)
+    - publish마다 유저별 버전 증가(재시작하면 epoch가 바뀌어 이전 ETag와 겹치지 않음)
+    """
+
+    backend = "memory"
+
+    def __init__(self, trade_statuses, owner=None):
+        self.trade_statuses = trade_statuses
+        self.owner = owner or owner_id()
+        self.epoch = f"{int(time.time() * 1000):x}"
+        self.on_stop = None
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._waiters = _VersionWaiters()
+
+    def claim(self, user_id):
+        with self._lock:
+            return not self.trade_statuses.get(user_id, {}).get("running")
+
+    def release(self, user_id):
+        # claim 이 아무것도 기록하지 않으므로 되돌릴 것 없음
+        pass
+
+    def publish(self, user_id, status):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._waiters.notify((user_id,))
+
+    def get(self, user_id):
+        status = self.trade_statuses.get(user_id)
+        if status is None:
+            return None
+        return {**status, "version": self._versions.get(user_id, 0)}
+
+    def wait(self, user_id, version, timeout):
+        """
+        버전이 version과 달라지거나 timeout(초)이 지나면 현재 상태 반환
+        """
+        deadline = time.monotonic() + timeout
+        unchanged = lambda: self._versions.get(user_id, 0) == version
+        while unchanged():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._waiters.wait(user_id, remaining, unchanged)
+        return self.get(user_id)
+
+    def request_stop(self, user_id):
+        return user_id in self.trade_statuses
+
+    def start(self):
+        pass
+
+
+class SQLiteStateStore:
+    """
+    - SQLite(WAL) 파일 하나를 여러 프로세스가 공유
+    - claim: 트랜잭션으로 (실행 중 + 소유 프로세스 생존)인 매매가 없을 때만 소유권 획득 → 매매당 프로세스 1개
+    - publish: 유저별 최신 상태만 모아 백그라운드 쓰레드가 일괄 기록(매매 경로에서 디스크 대기 없음)
+    - request_stop: 다른 프로세스가 소유한 매매는 중단요청 플래그만 남기고, 소유 프로세스가 주기적으로 확인해 on_stop 호출
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path=STATE_DB_PATH, owner=None, owner_ttl=OWNER_TTL_SEC, poll_interval=STATE_POLL_SEC):
+        self.path = path
+        self.owner = owner or owner_id()
+        self.owner_ttl = owner_ttl
+        self.poll_interval = poll_interval
+        self.on_stop = None
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._waiters = _VersionWaiters()
+        self._thread = None
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS trades ("
+            " user_id TEXT PRIMARY KEY, owner TEXT, running INTEGER, status TEXT,"
+            " version INTEGER DEFAULT 0, stop_requested INTEGER DEFAULT 0, updated REAL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS owners (owner TEXT PRIMARY KEY, heartbeat REAL)")
+        # DB 파일이 새로 만들어지면 버전이 0부터 다시 시작하므로 epoch로 구분
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (f"{int(time.time() * 1000):x}",))
+        self.epoch = conn.execute("SELECT value FROM meta WHERE key='epoch'").fetchone()[0]
+
+    # --- 소유권 ---
+    def _owner_alive(self, conn, owner, now):
+        row = conn.execute("SELECT heartbeat FROM owners WHERE owner=?", (owner,)).fetchone()
+        return row is not None and now - row[0] <= self.owner_ttl
+
+    def claim(self, user_id):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO owners (owner, heartbeat) VALUES (?, ?)", (self.owner, now))
+            row = conn.execute("SELECT owner, running FROM trades WHERE user_id=?", (user_id,)).fetchone()
+            if row is not None and row[1] and (row[0] == self.owner or self._owner_alive(conn, row[0], now)):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO trades (user_id, owner, running, status, version, stop_requested, updated)"
+                " VALUES (?, ?, 1, NULL, 0, 0, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET owner=excluded.owner, running=1, stop_requested=0, updated=excluded.updated",
+                (user_id, self.owner, now),
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, user_id):
+        """
+        매매를 시작하지 않고 claim 을 되돌림(묶음 매매의 다리 중 하나라도 claim 실패 시)
+        """
+        self._conn().execute("UPDATE trades SET running=0 WHERE user_id=? AND owner=?", (user_id, self.owner))
+
+    # --- 쓰기 ---
+    def publish(self, user_id, status):
+        # 직렬화는 쓰기 쓰레드에서(호출 쓰레드는 얕은 복사만)
+        snapshot = {"running": status.get("running"), "info": dict(status.get("info") or {}), "error": status.get("error")}
+        with self._pending_lock:
+            self._pending[user_id] = snapshot
+        self._flush_event.set()
+
+    def flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "UPDATE trades SET running=?, status=?, version=version+1, updated=? WHERE user_id=? AND owner=?",
+                [(1 if snap["running"] else 0, _dumps(snap), now, user_id, self.owner) for user_id, snap in pending.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._waiters.notify(pending)
+
+    # --- 조회 ---
+    def get(self, user_id):
+        row = self._conn().execute(
+            "SELECT status, running, version, owner, stop_requested FROM trades WHERE user_id=?", (user_id,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        status = json.loads(row[0])
+        status["running"] = bool(row[1])
+        status["version"] = row[2]
+        status["owner"] = row[3]
+        status["stop_requested"] = bool(row[4])
+        return status
+
+    def wait(self, user_id, version, timeout):
+        """
+        버전이 version과 달라지거나 timeout(초)이 지나면 현재 상태 반환
+        - 이 프로세스가 쓴 변경은 즉시 깨어나고, 다른 프로세스의 변경은 poll_interval마다 확인
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.get(user_id)
+            remaining = deadline - time.monotonic()
+            if (status or {}).get("version", 0) != version or remaining <= 0:
+                return status
+            self._waiters.wait(user_id, min(self.poll_interval, remaining))
+
+    def request_stop(self, user_id):
+        cur = self._conn().execute("UPDATE trades SET stop_requested=1 WHERE user_id=? AND running=1", (user_id,))
+        return cur.rowcount > 0
+
+    # --- 백그라운드: 쓰기 반영/하트비트/중단요청 확인 ---
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name="state-store", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        last_beat = 0.0
+        while True:
+            self._flush_event.wait(self.poll_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+                now = time.time()
+                if now - last_beat >= self.poll_interval:
+                    last_beat = now
+                    conn = self._conn()
+                    conn.execute("INSERT OR REPLACE INTO owners (owner, heartbeat) VALUES (?, ?)", (self.owner, now))
+                    rows = conn.execute(
+                        "SELECT user_id FROM trades WHERE owner=? AND running=1 AND stop_requested=1", (self.owner,)
+                    ).fetchall()
+                    for (user_id,) in rows:
+                        if self.on_stop is not None:
+                            self.on_stop(user_id)
+            except Exception as e:
+                logging.error("[상태저장소 에러] %s", e)
+
+
+def create_state_store(trade_statuses, backend=STATE_BACKEND, workers=WEB_CONCURRENCY):
+    if backend == "memory" and workers > 1:
+        raise RuntimeError(f"STATE_BACKEND=memory 는 gunicorn 워커 1개에서만 사용 가능합니다(WEB_CONCURRENCY={workers}). "
+                           "STATE_BACKEND=sqlite 로 설정하세요.")
+    if backend == "sqlite":
+        return SQLiteStateStore()
+    return MemoryStateStore(trade_statuses)
@@ -4,10 +4,12 @@ def get_long_stop_loss(
     tick_size: float = 1.0,
     tick_offset: int = 5,
     fallback_pct: float = 0.01,
-    take_profit_ratio: float = 0.02
+    take_profit_ratio: float = 0.02,
+    supports: list = None
 ):
     """
     롱포지션 손절값 자동 계산 + 시나리오 메시지 + 5개 저점값 표시
+    - supports: 진입가 아래 고유 저점(가까운 순)을 미리 구해둔 경우 전달(LevelIndex.supports_below)
     """
     if not lows or entry_price is None:
         return None, "데이터 부족", None
@@ -16,7 +18,10 @@ def get_long_stop_loss(
     lows_str = ", ".join([str(v) for v in lows])
     lows_msg = f"최근 캔들 5개 저점값: {lows_str}"
 
-    support_candidates_sorted = sorted(set([low for low in lows if low < entry_price]), reverse=True)
+    if supports is not None:
+        support_candidates_sorted = supports
+    else:
+        support_candidates_sorted = sorted(set([low for low in lows if low < entry_price]), reverse=True)
     first_support = f"{support_candidates_sorted[0]}" if len(support_candidates_sorted) >= 1 else "없음"
     second_support = f"{support_candidates_sorted[1]}" if len(support_candidates_sorted) >= 2 else "없음"
     support_msg = f"1차 지지선: {first_support}, 2차 지지선: {second_support}"
@@ -53,10 +58,12 @@ def get_short_stop_loss(
     tick_size: float = 1.0,
     tick_offset: int = 5,
     fallback_pct: float = 0.01,
-    take_profit_ratio: float = 0.02
+    take_profit_ratio: float = 0.02,
+    resistances: list = None
 ):
     """
     숏포지션 손절값 자동 계산 + 시나리오 메시지 + 5개 고점값 표시
+    - resistances: 진입가 위 고유 고점(가까운 순)을 미리 구해둔 경우 전달(LevelIndex.resistances_above)
     """
     if not highs or entry_price is None:
         return None, "데이터 부족", None
@@ -64,7 +71,10 @@ def get_short_stop_loss(
     highs_str = ", ".join([str(v) for v in highs])
     highs_msg = f"최근 캔들 5개 고점값: {highs_str}"
 
-    resistance_candidates_sorted = sorted(set([high for high in highs if high > entry_price]))
+    if resistances is not None:
+        resistance_candidates_sorted = resistances
+    else:
+        resistance_candidates_sorted = sorted(set([high for high in highs if high > entry_price]))
     first_res = f"{resistance_candidates_sorted[0]}" if len(resistance_candidates_sorted) >= 1 else "없음"
     second_res = f"{resistance_candidates_sorted[1]}" if len(resistance_candidates_sorted) >= 2 else "없음"
     resistance_msg = f"1차 저항선: {first_res}, 2차 저항선: {second_res}"
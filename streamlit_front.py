@@ -2,12 +2,184 @@ import streamlit as st
 import requests
 from datetime import datetime
 import uuid
+import json
+import time
+import threading
+from collections import deque
 
 # ================================
 # 1. API 서버 주소
 # ================================
 API_BASE_URL = "https://goldentime-production.up.railway.app"
 
+@st.cache_resource
+def get_http():
+    # API 서버 연결 재사용(keep-alive), 모든 세션 공용
+    return requests.Session()
+
+http = get_http()
+
+# ================================
+# 1-1. 실시간 매매 이벤트(SSE) 구독
+# ================================
+EVENT_LABELS = {
+    "armed": "진입 준비",
+    "entered": "진입 체결",
+    "tp_placed": "익절 주문",
+    "sl_placed": "손절 설정",
+    "exited": "청산",
+    "error": "에러",
+    "stopped": "매매 종료",
+}
+FEED_IDLE_SEC = 60          # 화면 갱신(2초마다)이 이 시간 동안 없으면(탭 닫힘/세션 종료) 연결 종료
+FEED_MAX_BACKOFF_SEC = 60   # 연결 거절/실패 시 재시도 간격 상한
+FEED_POLL_WAIT_SEC = 20     # 스트림 거절 중 /trade_status long-poll 대기
+FEED_MIN_POLL_SEC = 2       # long-poll 이 바로 돌아와도(서버 대기 상한 초과) 이 간격 이상으로만 조회
+
+class TradeEventFeed:
+    """
+    /trade_events 에 연결 1개를 유지하며 받은 상태/이벤트를 메모리에 보관
+    - 화면 갱신은 보관된 값만 읽음(서버 요청 없음)
+    - 끊기면 Last-Event-ID로 이어서 재연결
+    - 서버가 거절(503)하면 Retry-After(연속 실패 시 두 배씩, 최대 FEED_MAX_BACKOFF_SEC) 동안
+      /trade_status long-poll(ETag)로 상태만 받다가 다시 연결
+    - 화면 갱신이 FEED_IDLE_SEC 동안 없으면 종료, 다시 갱신되면 ensure_running 으로 재시작
+    """
+
+    def __init__(self, base_url, user_id):
+        self.base_url = base_url
+        self.url = f"{base_url}/trade_events"
+        self.user_id = user_id
+        self.http = requests.Session()
+        self.status = None
+        self.events = deque(maxlen=50)
+        self.connected = False
+        self.polling = False
+        self.last_id = None
+        self.last_seen = time.time()
+        self._etag = None
+        self._thread = None
+        self.ensure_running()
+
+    def alive(self):
+        return self._thread.is_alive()
+
+    def ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self.last_seen = time.time()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def touch(self):
+        self.last_seen = time.time()
+
+    def _idle(self):
+        return time.time() - self.last_seen > FEED_IDLE_SEC
+
+    def _dispatch(self, event, data):
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return
+        if event == "status":
+            self.status = payload
+        else:
+            self.events.appendleft((datetime.now().strftime("%H:%M:%S"), event, payload))
+
+    @staticmethod
+    def _retry_after(res, default):
+        try:
+            return max(float(res.headers.get("Retry-After", default)), 1.0)
+        except ValueError:
+            return default
+
+    def _poll_status(self, until):
+        """
+        스트림 대신 /trade_status long-poll 로 상태만 갱신(until 까지)
+        """
+        self.polling = True
+        try:
+            while time.time() < until and not self._idle():
+                started = time.time()
+                headers = {"If-None-Match": self._etag} if self._etag else {}
+                try:
+                    res = self.http.get(f"{self.base_url}/trade_status", headers=headers, timeout=(5, FEED_POLL_WAIT_SEC + 10),
+                                        params={"user_id": self.user_id, "wait": FEED_POLL_WAIT_SEC})
+                    if res.status_code == 200:
+                        self.status = res.json()
+                        self._etag = res.headers.get("ETag")
+                except Exception:
+                    pass
+                time.sleep(max(0.0, FEED_MIN_POLL_SEC - (time.time() - started)))
+        finally:
+            self.polling = False
+
+    def _stream(self, res):
+        event, data = "message", []
+        for line in res.iter_lines(decode_unicode=True):
+            if self._idle():
+                return
+            if line == "":
+                if data:
+                    self._dispatch(event, "\n".join(data))
+                event, data = "message", []
+            elif line.startswith(":"):
+                continue
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+                elif field == "id":
+                    self.last_id = value
+
+    def _run(self):
+        backoff = 2.0
+        while not self._idle():
+            headers = {"Accept": "text/event-stream"}
+            if self.last_id:
+                headers["Last-Event-ID"] = self.last_id
+            delay = backoff
+            try:
+                with self.http.get(self.url, params={"user_id": self.user_id}, headers=headers,
+                                   stream=True, timeout=(5, 60)) as res:
+                    if res.status_code == 503:
+                        delay = max(self._retry_after(res, backoff), backoff)
+                        backoff = min(backoff * 2, FEED_MAX_BACKOFF_SEC)
+                    elif res.ok:
+                        self.connected = True
+                        backoff = 2.0
+                        self._stream(res)
+            except Exception:
+                backoff = min(backoff * 2, FEED_MAX_BACKOFF_SEC)
+            self.connected = False
+            if delay > FEED_MIN_POLL_SEC:
+                # 거절/실패 중에도 화면 상태는 계속 갱신
+                self._poll_status(time.time() + delay)
+            else:
+                time.sleep(delay)
+
+@st.experimental_fragment(run_every=2)
+def render_trade_feed(feed):
+    feed.touch()
+    feed.ensure_running()
+    status = feed.status
+    if feed.polling:
+        st.caption("실시간 연결 대기 중(상태는 주기적으로 조회)")
+    if status is None:
+        st.caption("실시간 연결 중..." if not feed.connected else "진행 중인 매매 없음")
+    else:
+        info = status.get("info") or {}
+        st.info(f"{'매매 진행중' if status.get('running') else '대기중'} | {info.get('symbol')} {info.get('position_type')} "
+                f"| 진입가 {info.get('entry_price')} | 익절 {info.get('tp_price')} | 손절 {info.get('sl_price')} "
+                f"| 청산가 {info.get('exit_price')}")
+        if status.get("error"):
+            st.error(status["error"])
+    for at, event, payload in list(feed.events)[:10]:
+        st.write(f"{at} · {EVENT_LABELS.get(event, event)} · {payload}")
+
 # ================================
 # 2. user_id(고유식별자) 생성 및 세션에 저장
 # ================================
@@ -75,7 +247,7 @@ with tabs[0]:
                 "api_secret": api_secret
             }
             try:
-                res = requests.post(f"{API_BASE_URL}/start_trade", json=req_data)
+                res = http.post(f"{API_BASE_URL}/start_trade", json=req_data)
                 if res.ok and res.json().get("success"):
                     st.success("골든타임매매봇 동작 시작!")
                 else:
@@ -94,7 +266,7 @@ with tabs[0]:
                     "api_key": api_key,
                     "api_secret": api_secret
                 }
-                res = requests.get(f"{API_BASE_URL}/trade_status", params=params).json()
+                res = http.get(f"{API_BASE_URL}/trade_status", params=params).json()
                 running = res.get("running")
                 st.info("매매 진행중" if running else "대기중")
             except Exception as e:
@@ -111,11 +283,18 @@ with tabs[0]:
                     "api_key": api_key,
                     "api_secret": api_secret
                 }
-                _ = requests.post(f"{API_BASE_URL}/stop_trade", json=req_data)
+                _ = http.post(f"{API_BASE_URL}/stop_trade", json=req_data)
                 st.warning("골든타임매매봇이 중단됩니다")
             except Exception as e:
                 st.error(f"서버 연결 오류!\n{e}")
 
+    # ----- 실시간 매매 현황(서버 푸시) -----
+    st.markdown("#### 실시간 매매 현황")
+    feed = st.session_state.get("event_feed")
+    if feed is None or not feed.alive():
+        feed = st.session_state["event_feed"] = TradeEventFeed(API_BASE_URL, user_id)
+    render_trade_feed(feed)
+
     # ----- 잔고 확인 -----
     if st.checkbox("잔고 확인"):
         if not api_key or not api_secret:
@@ -128,7 +307,7 @@ with tabs[0]:
                     "api_secret": api_secret,
                     "coin": "USDT"
                 }
-                res = requests.get(f"{API_BASE_URL}/get_balance", params=params).json()
+                res = http.get(f"{API_BASE_URL}/get_balance", params=params).json()
                 st.write(f"코인: {res.get('coin')} / 잔고: {res.get('balance')}")
             except Exception as e:
                 st.error(f"서버 연결 오류!\n{e}")
@@ -0,0 +1,82 @@
+"""
+시계 동기화(ClockSync) offset/RTT 추정 확인(가짜 로컬시계 + 가짜 서버시각, 네트워크 없음)
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clock_sync import ClockSync
+
+
+class FakeClock:
+    """
+    로컬시계(time_source) + 서버시각 조회(server_time_fn)
+    - 조회 한 번에 로컬시계가 up + down 만큼 흐르고, 서버는 요청 도착 시점(up 후)의 자기 시각을 응답
+    """
+
+    def __init__(self, local=1_000_000.0, offset=0.0):
+        self.local = local
+        self.offset = offset        # 실제 서버시각 - 로컬시각
+        self.delays = []            # 조회별 (up, down) 지연, 비면 (0.05, 0.05)
+
+    def time(self):
+        return self.local
+
+    def server_time(self):
+        up, down = self.delays.pop(0) if self.delays else (0.05, 0.05)
+        self.local += up
+        server = self.local + self.offset
+        self.local += down
+        return server
+
+
+class ClockSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(offset=2.5)
+        self.sync = ClockSync(server_time_fn=self.clock.server_time, time_source=self.clock.time,
+                              window=8, early_fire=True)
+
+    def test_symmetric_delay_estimates_offset_and_now(self):
+        self.assertEqual(self.sync.sync(4), 4)
+        self.assertAlmostEqual(self.sync.offset, 2.5, places=6)
+        self.assertAlmostEqual(self.sync.rtt, 0.1, places=6)
+        self.assertAlmostEqual(self.sync.fire_lead(), 0.05, places=6)
+        # 보정시각 = 로컬시계 + offset(로컬시계가 흘러도 그대로 따라감)
+        self.assertAlmostEqual(self.sync.now(), self.clock.local + 2.5, places=6)
+        self.clock.local += 10
+        self.assertAlmostEqual(self.sync.now(), self.clock.local + 2.5, places=6)
+
+    def test_slow_asymmetric_samples_are_ignored(self):
+        # 지연이 큰 샘플은 한쪽 방향 지연 때문에 offset 이 크게 틀어짐 → RTT 작은 절반만 사용
+        self.clock.delays = [(0.01, 0.01), (0.9, 0.1), (0.01, 0.01), (0.8, 0.05), (0.01, 0.01), (1.2, 0.1)]
+        self.assertEqual(self.sync.sync(6), 6)
+        self.assertAlmostEqual(self.sync.offset, 2.5, places=6)
+        self.assertAlmostEqual(self.sync.rtt, 0.02, places=6)
+        self.assertGreater(self.sync.jitter, 0)
+
+    def test_failed_samples_are_skipped(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) % 2:
+                raise ConnectionError("timeout")
+            return self.clock.server_time()
+
+        self.sync.server_time_fn = flaky
+        self.assertEqual(self.sync.sync(4), 2)
+        self.assertAlmostEqual(self.sync.offset, 2.5, places=6)
+        self.assertEqual(self.sync.stats()["samples"], 2)
+
+    def test_no_samples_means_no_correction(self):
+        self.assertEqual(self.sync.now(), self.clock.local)
+        self.assertEqual(self.sync.fire_lead(), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+private 스트림 허브(PrivateStreamHub) 분배/재연결 확인(가짜 거래소의 private 스트림 사용, 네트워크 없음)
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_exchange import FakeExchange
+from position_stream import PrivateStreamHub
+
+
+def wait_until(cond, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    return cond()
+
+
+class PrivateStreamHubTest(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = FakeExchange(latency_ms=0, jitter_ms=0, volatility=0)
+        self.hub = PrivateStreamHub(ws_factory=self.exchange.private_ws_factory, health_interval=0.05)
+        self.session = self.exchange.session_factory("key")
+        self.wake = threading.Event()
+        self.token, self.watch = self.hub.watch("key", "secret", "BTCUSDT", self.wake)
+
+    def tearDown(self):
+        self.hub.unwatch(self.token)
+
+    def order(self, side, order_type="Market", qty="0.01", **kwargs):
+        res = self.session.place_order(category="linear", symbol="BTCUSDT", side=side, orderType=order_type,
+                                       qty=qty, **kwargs)
+        return res["result"]["orderId"]
+
+    def test_position_order_and_exit_fill_dispatch(self):
+        self.order("Buy")
+        self.assertTrue(wait_until(lambda: self.watch.seen_open and self.watch.size == 0.01))
+        tp_id = self.order("Sell", "Limit", qty="0.005", price="70000", reduceOnly=True)
+        self.assertTrue(wait_until(lambda: self.watch.orders.get(tp_id) == "New"))
+        self.assertFalse(self.watch.closed)
+
+        self.wake.clear()
+        self.exchange.set_price("BTCUSDT", 59000.0)
+        self.order("Sell", reduceOnly=True)
+        self.assertTrue(wait_until(lambda: self.watch.closed))
+        self.assertTrue(self.wake.is_set())
+        self.assertAlmostEqual(self.watch.exit_price, 59000.0)
+        self.assertAlmostEqual(self.watch.exit_vwap, 59000.0)
+        self.assertIsNotNone(self.watch.exit_time_ms)
+        # 포지션이 닫히며 거래소가 취소한 익절 주문
+        self.assertTrue(wait_until(lambda: self.watch.orders.get(tp_id) == "Cancelled"))
+
+    def test_other_symbol_not_dispatched(self):
+        res = self.session.place_order(category="linear", symbol="ETHUSDT", side="Buy", orderType="Market", qty="0.1")
+        self.order("Buy")
+        self.assertTrue(wait_until(lambda: self.watch.seen_open))
+        self.assertEqual(self.watch.size, 0.01)
+        self.assertNotIn(res["result"]["orderId"], self.watch.orders)
+
+    def test_reconnect_after_disconnect(self):
+        first = self.hub._conns["key"]["ws"]
+        first.disconnect()
+        self.assertTrue(wait_until(lambda: self.hub.reconnects == 1))
+        self.assertTrue(wait_until(lambda: self.watch.resync))
+        self.assertTrue(self.wake.is_set())
+        # 재연결 알림은 한 번만(워커가 REST로 한 번 확인)
+        self.assertTrue(self.watch.take_resync())
+        self.assertFalse(self.watch.take_resync())
+        second = self.hub._conns["key"]["ws"]
+        self.assertIsNot(second, first)
+        self.assertTrue(second.is_connected())
+
+        # 새 연결로 다시 구독된 메시지 전달
+        self.order("Buy")
+        self.order("Sell", reduceOnly=True)
+        self.assertTrue(wait_until(lambda: self.watch.closed))
+        self.assertEqual(self.hub.stats(), {"connections": 1, "watches": 1, "reconnects": 1})
+
+    def test_shared_connection_and_unwatch(self):
+        token, other = self.hub.watch("key", "secret", "ETHUSDT")
+        self.assertEqual(self.hub.stats()["connections"], 1)
+        ws = self.hub._conns["key"]["ws"]
+        self.hub.unwatch(token)
+        self.assertTrue(ws.is_connected())
+        self.hub.unwatch(self.token)
+        self.assertFalse(ws.is_connected())
+        self.assertEqual(self.hub.stats()["connections"], 0)
+
+
+class PrivateStreamHubConnectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = FakeExchange(latency_ms=0, jitter_ms=0, volatility=0)
+        self.fail_keys = set()
+        self.slow = threading.Event()
+
+        def factory(api_key, api_secret):
+            if api_key in self.fail_keys:
+                raise ConnectionError("handshake failed")
+            if api_key == "slow":
+                self.slow.wait(3)
+            return self.exchange.private_ws_factory(api_key, api_secret)
+
+        self.hub = PrivateStreamHub(ws_factory=factory, health_interval=0)
+
+    def test_failed_connect_not_registered(self):
+        self.fail_keys.add("key")
+        with self.assertRaises(ConnectionError):
+            self.hub.watch("key", "secret", "BTCUSDT")
+        self.assertEqual(self.hub.stats(), {"connections": 0, "watches": 0, "reconnects": 0})
+        # 다음 감시자는 죽은 연결에 붙지 않고 새로 연결
+        self.fail_keys.clear()
+        token, _ = self.hub.watch("key", "secret", "BTCUSDT")
+        self.assertTrue(self.hub._conns["key"]["ws"].is_connected())
+        self.hub.unwatch(token)
+
+    def test_slow_connect_does_not_block_other_keys(self):
+        slow = threading.Thread(target=self.hub.watch, args=("slow", "secret", "BTCUSDT"), daemon=True)
+        slow.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        token, _ = self.hub.watch("key", "secret", "BTCUSDT")
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.slow.set()
+        slow.join(3)
+        self.assertEqual(self.hub.stats()["connections"], 2)
+        self.hub.unwatch(token)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 로컬 실행: 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+try:
+    from Crypto.Cipher import AES
+except ImportError:  # pycryptodome 미설치: API 시크릿을 저널에 남기지 않음
+    AES = None
+
+# === 매매 상태 전이 저널(append-only, 재시작 복구용) ===
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "1") == "1"
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "trade_journal.jsonl")
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "1") == "1"                 # 기록마다 디스크 동기화
+JOURNAL_COMPACT_EVERY = int(os.getenv("JOURNAL_COMPACT_EVERY", "5000"))  # 기록 N건마다 백그라운드 압축
+JOURNAL_SECRET_KEY = os.getenv("JOURNAL_SECRET_KEY", "")                 # API 시크릿 암호화 키(없으면 시크릿 미기록 → 복구 불가)
+
+SEALED_PREFIX = "gcm1:"
+
+# 기록하는 전이: 시작 → 사전준비 → 진입 → 익절/손절 발송 → 청산 → 종료(종료된 매매는 압축 시 삭제)
+EVENTS = ("started", "armed", "entered", "tp_placed", "sl_placed", "exited", "finished")
+
+
+def secrets_recoverable():
+    """
+    API 시크릿을 저널에 남길 수 있는지(저널 사용 + JOURNAL_SECRET_KEY + pycryptodome), 아니면 재시작/샤드 인수 때 복구 불가
+    """
+    return JOURNAL_ENABLED and bool(JOURNAL_SECRET_KEY) and AES is not None
+
+
+def _cipher_key():
+    return hashlib.sha256(JOURNAL_SECRET_KEY.encode()).digest()
+
+
+def seal_secret(secret):
+    """
+    API 시크릿을 AES-GCM 으로 암호화한 저널용 문자열(키/라이브러리가 없으면 None → 기록하지 않음)
+    """
+    if not secret or not JOURNAL_SECRET_KEY or AES is None:
+        return None
+    if secret.startswith(SEALED_PREFIX):
+        return secret
+    cipher = AES.new(_cipher_key(), AES.MODE_GCM)
+    body, tag = cipher.encrypt_and_digest(secret.encode())
+    return SEALED_PREFIX + base64.b64encode(cipher.nonce + tag + body).decode()
+
+
+def open_secret(sealed):
+    """
+    seal_secret 의 역변환, 복호화할 수 없으면(키 없음/키 변경) None
+    - 이전 버전 저널의 평문 값은 그대로 반환(다음 압축 때 암호화되거나 지워짐)
+    """
+    if not sealed:
+        return None
+    if not sealed.startswith(SEALED_PREFIX):
+        return sealed
+    if not JOURNAL_SECRET_KEY or AES is None:
+        return None
+    try:
+        raw = base64.b64decode(sealed[len(SEALED_PREFIX):])
+        cipher = AES.new(_cipher_key(), AES.MODE_GCM, nonce=raw[:16])
+        return cipher.decrypt_and_verify(raw[32:], raw[16:32]).decode()
+    except ValueError:
+        return None
+
+
+def _sealed(state):
+    # 압축 snapshot 에 평문 시크릿이 남지 않도록
+    params = state.get("params") or {}
+    secret = params.get("api_secret")
+    if not secret or secret.startswith(SEALED_PREFIX):
+        return state
+    return dict(state, params=dict(params, api_secret=seal_secret(secret)))
+
+
+def fold(records):
+    """
+    기록들을 순서대로 합쳐 미종료 매매별 최종 상태로 변환
+    반환: {user_id: {"params": 시작 인자, "info": 누적 값, "events": [전이 이름...]}}
+    """
+    trades = {}
+    for rec in records:
+        user_id = rec.get("user_id")
+        event = rec.get("event")
+        data = rec.get("data") or {}
+        if event == "snapshot":
+            trades[user_id] = data
+        elif event == "started":
+            trades[user_id] = {"params": data, "info": {}, "events": ["started"]}
+        elif event == "finished":
+            trades.pop(user_id, None)
+        elif user_id in trades:
+            trades[user_id]["info"].update(data)
+            trades[user_id]["events"].append(event)
+    return trades
+
+
+class TradeJournal:
+    """
+    - 한 줄 = JSON 기록 1건, 파일 끝에만 추가(O_APPEND) + fsync → 프로세스가 죽어도 기록된 전이는 보존
+    - 마지막 줄이 쓰다 만 상태면 읽을 때 건너뜀
+    - compact: 미종료 매매만 snapshot 1줄씩 새 파일에 쓰고 원자적으로 교체(os.replace)
+    - 압축은 백그라운드 쓰레드에서, 파일 읽기/새 파일 쓰기는 잠금 밖(교체 직전 늘어난 꼬리만 잠금 안에서 옮김)
+    - 여러 gunicorn 워커가 같은 파일을 쓰면 .lock 파일로 프로세스 간 직렬화, 교체된 파일은 자동으로 다시 엶
+    - API 시크릿은 암호화해서만 기록(seal_secret), API 키가 기록되므로 파일 권한 0600
+    - 첫 기록 전에는 파일(.lock 포함)을 만들지 않음(import/조회만으로는 디스크에 아무것도 생기지 않음)
+    """
+
+    def __init__(self, path=JOURNAL_PATH, fsync=JOURNAL_FSYNC, compact_every=JOURNAL_COMPACT_EVERY):
+        self.path = path
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._fh = None
+        self._ino = None
+        self._lock_fd = None
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+        self._since_compact = 0
+        self.appended = 0
+        self.compactions = 0
+        self.last_compact_ms = None
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            if self._lock_fd is None:
+                self._lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open(self):
+        # 다른 프로세스가 압축해 파일이 교체됐으면 새 파일로 다시 열기
+        if self._fh is not None:
+            try:
+                if os.stat(self.path).st_ino == self._ino:
+                    return self._fh
+            except FileNotFoundError:
+                pass
+            self._fh.close()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._fh = os.fdopen(fd, "a", encoding="utf-8")
+        self._ino = os.fstat(fd).st_ino
+        return self._fh
+
+    # --- 쓰기 ---
+    def append(self, user_id, event, **data):
+        self.append_many([(user_id, event, data)])
+
+    def append_many(self, entries):
+        """
+        여러 전이를 한 번의 쓰기/fsync로 기록
+        entries: [(user_id, event, data), ...]
+        """
+        now = time.time()
+        lines = "".join(
+            json.dumps({"ts": now, "user_id": user_id, "event": event, "data": data}, ensure_ascii=False, default=str) + "\n"
+            for user_id, event, data in entries
+        )
+        with self._locked():
+            fh = self._open()
+            fh.write(lines)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+            self.appended += len(entries)
+            self._since_compact += len(entries)
+            need_compact = self.compact_every and self._since_compact >= self.compact_every and not self._compacting
+            if need_compact:
+                self._compacting = True
+        if need_compact:
+            # 매매 쓰레드는 기다리지 않음
+            threading.Thread(target=self._compact_background, name="journal-compact", daemon=True).start()
+
+    def _compact_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logging.error("[저널] 백그라운드 압축 실패: %s", e)
+        finally:
+            self._compacting = False
+
+    # --- 읽기/복구 ---
+    def _read(self, end=None, ino=None):
+        """
+        end: 이 바이트까지만 읽음 / ino: 파일이 그 사이 교체됐으면 None 반환
+        """
+        try:
+            with open(self.path, "rb") as f:
+                if ino is not None and os.fstat(f.fileno()).st_ino != ino:
+                    return None
+                data = f.read() if end is None else f.read(end)
+        except FileNotFoundError:
+            return [] if ino is None else None
+        records = []
+        for lineno, line in enumerate(data.splitlines(), 1):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logging.warning("[저널] %s번째 줄 손상, 건너뜀", lineno)
+        return records
+
+    def replay(self):
+        """
+        저널 전체를 읽어 미종료 매매 상태 반환
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with self._locked():
+            return fold(self._read())
+
+    def records(self):
+        """
+        저널의 기록 전체(합치기 전)
+        """
+        if not os.path.exists(self.path):
+            return []
+        with self._locked():
+            return self._read()
+
+    def compact(self):
+        """
+        미종료 매매만 남기고 저널을 다시 씀, 남은 매매 수 반환
+        - 압축 시작 시점까지를 잠금 밖에서 합쳐 새 파일에 쓰고, 교체 직전 잠금 안에서 그 뒤 기록(꼬리)만 덧붙임
+        - 그 사이 다른 프로세스가 먼저 교체했으면 잠금 안에서 처음부터 다시
+        """
+        if not os.path.exists(self.path):
+            return 0
+        start = time.perf_counter()
+        with self._compact_lock:
+            with self._locked():
+                self._since_compact = 0
+                ino, size = self._inode(), self._size()
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            records = self._read(size, ino) if ino is not None else []
+            trades = self._write_snapshot(tmp, records) if records is not None else None
+            with self._locked():
+                if trades is None or self._inode() != ino:
+                    trades, size = self._write_snapshot(tmp, self._read()), None
+                with open(tmp, "ab") as f:
+                    if size is not None and ino is not None:
+                        with open(self.path, "rb") as src:
+                            src.seek(size)
+                            f.write(src.read())
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                self._fsync_dir()
+                self.compactions += 1
+        self.last_compact_ms = round((time.perf_counter() - start) * 1000, 2)
+        return len(trades)
+
+    @staticmethod
+    def _write_snapshot(tmp, records):
+        trades = fold(records)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            now = time.time()
+            for user_id, state in trades.items():
+                f.write(json.dumps({"ts": now, "user_id": user_id, "event": "snapshot", "data": _sealed(state)},
+                                   ensure_ascii=False, default=str) + "\n")
+        return trades
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _inode(self):
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def _fsync_dir(self):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def stats(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        return {
+            "path": self.path,
+            "bytes": size,
+            "appended": self.appended,
+            "compactions": self.compactions,
+            "last_compact_ms": self.last_compact_ms,
+        }
+
+
+class _NullJournal:
+    """
+    JOURNAL_ENABLED=0 일 때: 기록하지 않음
+    """
+
+    def append(self, user_id, event, **data):
+        pass
+
+    def append_many(self, entries):
+        pass
+
+    def replay(self):
+        return {}
+
+    def records(self):
+        return []
+
+    def compact(self):
+        return 0
+
+    def stats(self):
+        return {"enabled": False}
+
+
+# 프로세스 공용 인스턴스
+journal = TradeJournal() if JOURNAL_ENABLED else _NullJournal()
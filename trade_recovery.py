@@ -0,0 +1,210 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import trade_worker as tw
+from trade_journal import journal, open_secret
+
+# === 재시작 시 저널 기반 매매 복구 ===
+RECOVER_ON_START = os.getenv("RECOVER_ON_START", "1") == "1"
+RECOVERY_WORKERS = int(os.getenv("RECOVERY_WORKERS", "16"))               # 계정별 거래소 대조 동시 실행 수
+RECOVERY_CLAIM_WAIT_SEC = float(os.getenv("RECOVERY_CLAIM_WAIT_SEC", "20"))  # 이전 프로세스 소유권 만료 대기
+
+# 재개(resume/rearm)됐거나 거래소 대조로 정리(closed/expired/missed)된 결과, 나머지는 저널에 남겨 다시 시도
+HANDLED = ("resume", "rearm", "closed", "expired", "missed")
+
+# 마지막 복구 결과(api_server /recovery_status 조회용)
+last_report = None
+
+
+def _paged(fetch, limit, **params):
+    items, cursor = [], ""
+    while True:
+        res = fetch(category="linear", settleCoin="USDT", limit=limit, cursor=cursor, **params)
+        result = res['result']
+        items.extend(result.get('list') or [])
+        cursor = result.get('nextPageCursor')
+        if not cursor:
+            return items
+
+
+def exchange_snapshot(session):
+    """
+    계정 전체 포지션/미체결 주문을 한 번에 조회(매매마다 조회하지 않음)
+    반환: ({symbol: position}, {미체결 주문ID})
+    """
+    positions = tw.get_all_positions(session)
+    open_ids = {o['orderId'] for o in _paged(session.get_open_orders, 50)}
+    return positions, open_ids
+
+
+def plan_recovery(trade, positions, open_ids, now_ts):
+    """
+    저널 상태 + 거래소 상태로 복구 방법 결정(네트워크 호출 없음)
+    반환: (action, info)
+    - resume: 포지션 있음 → 감시 루프 재개(빠진 익절/손절은 다시 발송)
+    - closed: 진입했지만 포지션 없음 → 남은 주문 취소 후 종료
+    - rearm: 아직 진입 전 → 원래 일정대로 다시 예약
+    - expired / missed: 청산 시각 경과 / 진입 시각을 놓침 → 늦은 진입은 하지 않고 종료
+    """
+    params = trade['params']
+    info = dict(trade['info'])
+    # 재시작 전에 보낸 주문과 같은 orderLinkId 를 쓰도록 매매 ID 이어받기
+    info['trade_id'] = params.get('trade_id')
+    side = "Buy" if params['position_type'] == "long" else "Sell"
+    pos = positions.get(params['symbol'])
+    if pos is not None and pos.get('side') == side:
+        size = float(pos['size'])
+        if not info.get('entered'):
+            # 진입 주문은 나갔지만 저널 기록 전에 죽은 경우: 거래소 포지션을 그대로 넘겨받음
+            avg = float(pos.get('avgPrice') or 0)
+            sign = 1 if side == "Buy" else -1
+            info.update(
+                entered=True,
+                adopted=True,
+                qty=size,
+                entry_price=avg,
+                tp_price=float(params['take_profit']) if params.get('take_profit') not in (None, "") else round(avg * (1 + sign * tw.TP_RATIO), 8),
+                sl_price=float(pos.get('stopLoss') or 0) or round(avg * (1 - sign * tw.SL_FALLBACK_PCT), 8),
+            )
+        tp_order_id = info.get('tp_order_id')
+        # 익절 주문이 이미 체결돼 포지션이 줄었으면 다시 내지 않음
+        info['tp_missing'] = (not tp_order_id or tp_order_id not in open_ids) and size >= float(info['qty']) * 0.999
+        info['sl_missing'] = float(pos.get('stopLoss') or 0) == 0
+        return "resume", info
+    if info.get('entered'):
+        return "closed", info
+    _, entry_ts, exit_ts, _ = tw.trade_deadlines(params['entry_time'], params['exit_time'])
+    if now_ts >= exit_ts:
+        return "expired", info
+    if params.get('immediate') or now_ts >= entry_ts:
+        return "missed", info
+    return "rearm", info
+
+
+def _reconcile_account(api_key, api_secret, trades, now_ts):
+    """
+    계정 1개: 거래소 상태 1회 조회 후 매매별 복구 방법 결정, 끝난 매매는 여기서 정리
+    반환: [(user_id, action, params, info)]
+    """
+    with tw.session_pool.checkout(api_key, api_secret) as session:
+        positions, open_ids = exchange_snapshot(session)
+        results = []
+        finished = []
+        for user_id, trade in trades:
+            action, info = plan_recovery(trade, positions, open_ids, now_ts)
+            if action == "closed":
+                symbol = trade['params']['symbol']
+                for order_id in (info.get('tp_order_id'), info.get('sl_order_id')):
+                    if order_id in open_ids:
+                        tw.cancel_order(session, symbol, order_id)
+                finished.append((user_id, "exited", {"exit_source": "recovery"}))
+            if action in ("closed", "expired", "missed"):
+                finished.append((user_id, "finished", {"recovery": action}))
+            results.append((user_id, action, trade['params'], info))
+    journal.append_many(finished)
+    return results
+
+
+def _record_ended(trade_statuses, user_id, action, params, info):
+    # 조회 화면에서 복구 결과를 볼 수 있도록 종료 상태로 남김
+    tw.init_trade_status(
+        trade_statuses, user_id, params['position_type'], params['symbol'], params['fixed_loss'],
+        params['entry_time'], params['exit_time'], params.get('take_profit'), params.get('stop_loss'),
+        params.get('immediate', False),
+    )
+    trade_statuses[user_id]['info'].update(info)
+    msg = {
+        "closed": "재시작 복구: 포지션 청산됨(남은 주문 취소)",
+        "expired": "재시작 복구: 청산 시각 경과",
+        "missed": "재시작 복구: 진입 시각을 놓쳐 진입하지 않음",
+    }[action]
+    tw.set_running(trade_statuses, user_id, False, error=msg)
+
+
+def recover_trades(trade_statuses, claim=None, now_ts=None, user_ids=None, outcomes=None):
+    """
+    저널 재생 → 계정별 거래소 대조 → 감시 재개/재예약/정리 → 저널 압축
+    - claim: 공유 상태저장소의 소유권 획득 함수(여러 워커가 같은 매매를 중복 재개하지 않도록)
+    - user_ids: 이 매매들만 복구(죽은 샤드에서 넘겨받은 매매, 나머지는 이미 실행 중)
+    - outcomes: dict 를 넘기면 매매별 결과(counts 의 키)를 채움, HANDLED 에 든 결과만 재개/정리된 것
+    """
+    outcomes = {} if outcomes is None else outcomes
+    global last_report
+    start = time.perf_counter()
+    now_ts = tw.clock_sync.now() if now_ts is None else now_ts
+    trades = journal.replay()
+    if user_ids is not None:
+        trades = {user_id: trade for user_id, trade in trades.items() if user_id in user_ids}
+    replay_ms = (time.perf_counter() - start) * 1000
+
+    counts = {"resume": 0, "rearm": 0, "closed": 0, "expired": 0, "missed": 0, "failed": 0, "unclaimed": 0,
+              "no_secret": 0}
+    accounts = {}
+    for user_id, trade in trades.items():
+        params = trade.get('params') or {}
+        if not params.get('api_key'):
+            continue
+        secret = open_secret(params.get('api_secret'))
+        if secret is None:
+            # 키 없이 기록됐거나 키가 바뀜: 저널에 남겨 두고 JOURNAL_SECRET_KEY 를 맞춘 뒤 재시작 때 복구
+            logging.warning("[복구 건너뜀] %s: 복호화할 수 있는 API 시크릿 없음(JOURNAL_SECRET_KEY 확인)", user_id)
+            counts["no_secret"] += 1
+            outcomes[user_id] = "no_secret"
+            continue
+        trade = dict(trade, params=dict(params, api_secret=secret))
+        accounts.setdefault((params['api_key'], secret), []).append((user_id, trade))
+
+    to_start = []
+    with ThreadPoolExecutor(max_workers=RECOVERY_WORKERS, thread_name_prefix="recovery") as pool:
+        futures = {pool.submit(_reconcile_account, key, secret, items, now_ts): items
+                   for (key, secret), items in accounts.items()}
+        for future, items in futures.items():
+            try:
+                results = future.result()
+            except Exception as e:
+                # 거래소 조회 실패한 계정은 저널에 그대로 남겨 다음 재시작 때 다시 시도
+                logging.error("[복구 실패] 계정 대조 에러: %s", e)
+                counts["failed"] += len(items)
+                outcomes.update((user_id, "failed") for user_id, _ in items)
+                continue
+            for user_id, action, params, info in results:
+                counts[action] += 1
+                outcomes[user_id] = action
+                if action in ("resume", "rearm"):
+                    to_start.append((user_id, params, info))
+                else:
+                    _record_ended(trade_statuses, user_id, action, params, info)
+    reconcile_ms = (time.perf_counter() - start) * 1000 - replay_ms
+
+    # 이전 프로세스의 소유권이 만료될 때까지 잠시 재시도
+    deadline = time.monotonic() + RECOVERY_CLAIM_WAIT_SEC
+    while to_start:
+        waiting = []
+        for user_id, params, info in to_start:
+            if claim is not None and not claim(user_id):
+                waiting.append((user_id, params, info))
+                continue
+            tw.start_trade_thread(user_id=user_id, trade_statuses=trade_statuses, recovered=info,
+                                  **{k: v for k, v in params.items() if k != 'trade_id'})
+        to_start = waiting
+        if not to_start or time.monotonic() >= deadline:
+            break
+        time.sleep(1)
+    counts["unclaimed"] = len(to_start)
+    outcomes.update((user_id, "unclaimed") for user_id, _, _ in to_start)
+    counts["resume"] -= sum(1 for _, _, info in to_start if info.get('entered'))
+    counts["rearm"] -= sum(1 for _, _, info in to_start if not info.get('entered'))
+
+    journal.compact()
+    last_report = {
+        "trades": len(trades),
+        "accounts": len(accounts),
+        **counts,
+        "replay_ms": round(replay_ms, 2),
+        "reconcile_ms": round(reconcile_ms, 2),
+        "total_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    logging.info("[재시작 복구] %s", last_report)
+    return last_report
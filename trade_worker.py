@@ -1,59 +1,102 @@
 import os
 import time
 import math
+import uuid
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
-from pybit.unified_trading import HTTP
+import requests
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from stop_loss_calc import get_long_stop_loss, get_short_stop_loss
+from instrument_cache import instrument_cache
+from session_pool import session_pool
+from rate_limiter import rate_limiter
+from entry_scheduler import scheduler
+from clock_sync import clock_sync
+from position_stream import private_streams, PRIVATE_WS_ENABLED, WS_SAFETY_POLL_SEC
+from market_data import market_data, MARKET_WS_ENABLED, LEVEL_WINDOW
+from level_index import LevelIndex
+from trade_journal import journal, seal_secret
+from log_pipeline import log_pipeline
+from kline_store import warm_recent_candles, last_closed_start
+from balance_cache import balance_cache, BALANCE_WS_PUSH
+import metrics
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(levelname)s] %(asctime)s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler("log.txt", encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
+# 로그는 큐에 넣기만 하고 포맷/파일 기록(회전, JSON)은 백그라운드 쓰레드에서
+log_pipeline.setup()
+
+# 스케줄러는 거래소 서버시각 기준으로 마감을 판단
+scheduler.clock = clock_sync.now
+
+# 매매 중 열린 private WS 로 잔고 캐시도 갱신
+if BALANCE_WS_PUSH:
+    private_streams.wallet_sink = balance_cache.on_wallet
+
+# === 매매 설정값 ===
+KLINE_INTERVAL = "30"
+TP_RATIO = 0.02
+SL_TICK_OFFSET = 5
+SL_FALLBACK_PCT = 0.01
+PREARM_SECONDS = float(os.getenv("PREARM_SECONDS", "30"))        # 진입 몇 초 전부터 사전 준비할지
+PREARM_REFRESH_SEC = float(os.getenv("PREARM_REFRESH_SEC", "5"))  # 사전 준비값 갱신 주기
+PRICE_RECHECK_PCT = float(os.getenv("PRICE_RECHECK_PCT", "0.003"))  # 진입 직전 가격 변동 허용폭
+ATTACH_SL_ON_ENTRY = os.getenv("ATTACH_SL_ON_ENTRY", "1") == "1"    # 시장가 진입 주문에 손절가 동시 지정
+PROTECT_RETRIES = int(os.getenv("PROTECT_RETRIES", "3"))            # 익절/손절 주문 실패 시 재시도 횟수
+PROTECT_RETRY_DELAY = float(os.getenv("PROTECT_RETRY_DELAY", "0.2"))
+DUPLICATE_LINK_ID = 110072                                          # orderLinkId 중복(같은 주문이 이미 접수됨)
+RETRYABLE_CODES = (10006, 10016)                                    # 호출량 초과, 거래소 내부 에러(다시 보내면 될 수 있음)
+ORDER_WORKERS = int(os.getenv("ORDER_WORKERS", "32"))
+TRADE_ENGINE = os.getenv("TRADE_ENGINE", "thread")                 # thread: 유저당 쓰레드, async: asyncio 엔진
+ENTRY_DISPATCH = os.getenv("ENTRY_DISPATCH", "1") == "1"           # 같은 진입 시각 매매를 공용 디스패처로 묶어 처리
+
+# 익절/손절 주문 동시 발송용 공용 쓰레드풀
+_order_executor = ThreadPoolExecutor(max_workers=ORDER_WORKERS, thread_name_prefix="order")
 
 # === 공통 pybit 유틸리티 함수들 ===
 
 def get_balance(api_key, api_secret, coin: str = "USDT"):
-    session = HTTP(testnet=False, api_key=api_key, api_secret=api_secret)
+    # 전체 코인 잔고를 계정별로 잠깐 캐시(대시보드 새로고침이 주문과 같은 호출 한도를 쓰지 않도록)
     try:
-        res = session.get_wallet_balance(accountType="UNIFIED", coin=coin)
-        return res['result']['list'][0]['totalEquity']
+        return balance_cache.wallet(api_key, api_secret)["total_equity"]
     except Exception as e:
-        logging.error(f"잔고조회 에러: {e}")
+        logging.error("잔고조회 에러: %s", e, extra={"sample": "balance_error"})
         return f"잔고조회 에러: {e}"
 
 def get_price(session, symbol):
+    # 공용 시세허브에 신선한 현재가가 있으면 REST 생략
+    price = market_data.last_price(symbol)
+    if price is not None:
+        return price
     try:
         ticker = session.get_tickers(category="linear", symbol=symbol)
         return float(ticker['result']['list'][0]['lastPrice'])
     except Exception as e:
-        logging.error(f"가격조회 에러: {e}")
+        logging.error("가격조회 에러: %s", e, extra={"sample": "price_error"})
         return None
 
-def open_position(session, symbol, side, qty):
+def open_position(session, symbol, side, qty, stop_loss=None):
     try:
+        params = {}
+        if stop_loss is not None:
+            # 진입과 동시에 전체 포지션 손절 지정(별도 set_trading_stop 왕복 생략)
+            params = {"stopLoss": str(stop_loss), "slTriggerBy": "LastPrice", "tpslMode": "Full"}
         res = session.place_order(
             category="linear",
             symbol=symbol,
             side=side,
             orderType="Market",
             qty=qty,
-            reduceOnly=False
+            reduceOnly=False,
+            **params
         )
         return res
     except Exception as e:
-        logging.error(f"진입실패: {e}")
+        logging.error("진입실패: %s", e)
         return f"진입실패: {e}"
 
-def close_position(session, symbol, side, qty):
+def close_position(session, symbol, side, qty, link_id=None):
     try:
         close_side = "Sell" if side == "Buy" else "Buy"
         res = session.place_order(
@@ -62,77 +105,131 @@ def close_position(session, symbol, side, qty):
             side=close_side,
             orderType="Market",
             qty=qty,
-            reduceOnly=True
+            reduceOnly=True,
+            **link_params(link_id)
         )
         return res
     except Exception as e:
-        logging.error(f"청산실패: {e}")
+        if is_duplicate_link(e):
+            # 앞선 시도(응답 유실)가 이미 접수됨
+            logging.info("[청산] 이미 접수된 주문(orderLinkId=%s)", link_id, extra={"symbol": symbol})
+            return {"retCode": 0, "result": {"orderLinkId": link_id}, "duplicate": True}
+        logging.error("청산실패: %s", e)
         return f"청산실패: {e}"
 
+# === 주문 중복 방지(orderLinkId) ===
+def order_link_id(trade_id, purpose):
+    """
+    매매 1건의 주문 용도별 고정 orderLinkId(36자 이내)
+    - 응답이 유실돼 재시도하거나 재시작 복구로 다시 보내도 거래소가 같은 주문으로 보고 거절(중복 에러)
+    """
+    if not trade_id:
+        return None
+    return f"{trade_id}-{purpose}"
+
+def link_params(link_id):
+    return {"orderLinkId": link_id} if link_id else {}
+
+def is_duplicate_link(e):
+    return getattr(e, "status_code", None) == DUPLICATE_LINK_ID
+
+def find_order_by_link(session, symbol, link_id):
+    """
+    orderLinkId로 미체결 주문 조회(없거나 조회 실패 시 None)
+    """
+    try:
+        res = session.get_open_orders(category="linear", symbol=symbol, orderLinkId=link_id)
+        rows = res['result']['list']
+        return rows[0] if rows else None
+    except Exception as e:
+        logging.error("주문 조회 실패(orderLinkId=%s): %s", link_id, e)
+        return None
+
+def get_instrument(session, symbol):
+    """
+    종목 메타데이터를 공용 캐시에서 조회(캐시에 없을 때만 REST 조회)
+    """
+    return instrument_cache.get(symbol, session)
+
 def get_tick_size(session, symbol):
     try:
-        res = session.get_instruments_info(category="linear", symbol=symbol)
-        tick_size = float(res['result']['list'][0]['priceFilter']['tickSize'])
-        return tick_size
+        return get_instrument(session, symbol)['tick_size']
     except Exception as e:
-        logging.error(f"틱사이즈 조회 실패: {e}")
+        logging.error("틱사이즈 조회 실패: %s", e)
         return 1.0
 
 def get_min_qty(session, symbol):
     try:
-        res = session.get_instruments_info(category="linear", symbol=symbol)
-        min_qty = float(res['result']['list'][0]['lotSizeFilter']['minOrderQty'])
-        return min_qty
+        return get_instrument(session, symbol)['min_qty']
     except Exception as e:
-        logging.error(f"최소 주문수량 조회 실패: {e}")
+        logging.error("최소 주문수량 조회 실패: %s", e)
         return 0.001
 
 def get_qty_step(session, symbol):
     try:
-        res = session.get_instruments_info(category="linear", symbol=symbol)
-        step = float(res['result']['list'][0]['lotSizeFilter']['qtyStep'])
-        return step
+        return get_instrument(session, symbol)['qty_step']
     except Exception as e:
-        logging.error(f"수량 스텝 조회 실패: {e}")
+        logging.error("수량 스텝 조회 실패: %s", e)
         return 0.001
 
-def adjust_qty_by_lot_size(session, symbol, qty):
-    min_qty = get_min_qty(session, symbol)
-    step = get_qty_step(session, symbol)
+def get_lot_size(session, symbol):
+    """
+    (최소수량, 수량스텝)을 캐시 1회 조회로 반환
+    """
+    try:
+        info = get_instrument(session, symbol)
+        return info['min_qty'], info['qty_step']
+    except Exception as e:
+        logging.error("수량 필터 조회 실패: %s", e)
+        return 0.001, 0.001
+
+def floor_qty(qty, min_qty, step):
     qty = max(qty, min_qty)
     adjusted_qty = math.floor(qty / step) * step
     return round(adjusted_qty, 8)
 
+def adjust_qty_by_lot_size(session, symbol, qty):
+    min_qty, step = get_lot_size(session, symbol)
+    return floor_qty(qty, min_qty, step)
+
+def get_recent_candles(session, symbol, interval="30", count=5):
+    """
+    마감된 최근 캔들 count개(시간순, (start, open, high, low, close))
+    - 시세허브에 있으면 메모리에서, 없으면 디스크 캔들 저장소(읽기만) → 그래도 없으면 REST
+      (저장소는 백그라운드에서 빠진 마감봉을 채움, 진입 경로에서 디스크 쓰기/fsync 없음)
+    - 저장소/REST에서 얻은 캔들은 허브에 채움
+    """
+    candles = market_data.closed_candles(symbol, interval, count)
+    if candles is not None:
+        return candles
+    candles = warm_recent_candles(session, symbol, interval, count, int(clock_sync.now() * 1000))
+    if candles is not None:
+        market_data.seed_candles(symbol, interval, candles)
+        return candles
+    res = session.get_kline(
+        category="linear",
+        symbol=symbol,
+        interval=interval,
+        limit=count + 1
+    )
+    klines = res['result']['list']
+    klines = sorted(klines, key=lambda x: int(x[0]))
+    candles = [(int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4])) for k in klines[:-1]]
+    market_data.seed_candles(symbol, interval, candles)
+    return candles
+
 def get_recent_lows(session, symbol, interval="30"):
     try:
-        res = session.get_kline(
-            category="linear",
-            symbol=symbol,
-            interval=interval,
-            limit=6
-        )
-        klines = res['result']['list']
-        klines = sorted(klines, key=lambda x: int(x[0]))
-        lows = [float(k[3]) for k in klines[:-1]]
-        return lows
+        return [c[3] for c in get_recent_candles(session, symbol, interval)]
     except Exception as e:
-        logging.error(f"OHLCV(캔들) 조회 실패: {e}")
+        logging.error("OHLCV(캔들) 조회 실패: %s", e, extra={"sample": "kline_error"})
         return []
 
 def get_recent_highs(session, symbol, interval="30"):
     try:
-        res = session.get_kline(
-            category="linear",
-            symbol=symbol,
-            interval=interval,
-            limit=6
-        )
-        klines = res['result']['list']
-        klines = sorted(klines, key=lambda x: int(x[0]))
-        highs = [float(k[2]) for k in klines[:-1]]
-        return highs
+        return [c[2] for c in get_recent_candles(session, symbol, interval)]
     except Exception as e:
-        logging.error(f"OHLCV(캔들) 조회 실패: {e}")
+        logging.error("OHLCV(캔들) 조회 실패: %s", e, extra={"sample": "kline_error"})
         return []
 
 def get_position_size(session, symbol):
@@ -147,10 +244,27 @@ def get_position_size(session, symbol):
         pos = pos_list[0]
         return float(pos['size'])
     except Exception as e:
-        logging.error(f"포지션 조회 실패: {e}")
+        logging.error("포지션 조회 실패: %s", e, extra={"sample": "position_error"})
         return 0.0
 
-def place_tp_limit_order(session, symbol, side, qty, tp_price):
+def get_all_positions(session):
+    """
+    계정의 linear(USDT) 열린 포지션 전체를 한 번에 조회: {symbol: position}
+    """
+    positions, cursor = {}, ""
+    while True:
+        res = session.get_positions(category="linear", settleCoin="USDT", limit=200, cursor=cursor)
+        for pos in res['result']['list']:
+            if float(pos.get('size') or 0) > 0:
+                positions[pos['symbol']] = pos
+        cursor = res['result'].get('nextPageCursor')
+        if not cursor:
+            return positions
+
+def place_tp_limit_order(session, symbol, side, qty, tp_price, link_id=None):
+    """
+    - link_id: 고정 orderLinkId, 중복 에러면 앞선 시도가 접수된 것이므로 그 주문을 조회해 성공으로 처리
+    """
     close_side = "Sell" if side == "Buy" else "Buy"
     tp_qty = adjust_qty_by_lot_size(session, symbol, qty / 2)
     try:
@@ -162,14 +276,23 @@ def place_tp_limit_order(session, symbol, side, qty, tp_price):
             price=str(tp_price),
             qty=tp_qty,
             reduceOnly=True,
-            timeInForce="GTC"
+            timeInForce="GTC",
+            **link_params(link_id)
         )
-        logging.info(f"[익절 지정가 주문] 가격: {tp_price}, 수량: {tp_qty}, 결과: {tp_order}")
+        logging.info("[익절 지정가 주문] 가격: %s, 수량: %s, 결과: %s", tp_price, tp_qty, tp_order,
+                     extra={"event": "tp_order", "symbol": symbol, "sample": "tp_order"})
         tp_order_id = tp_order['result'].get('orderId') if tp_order and 'result' in tp_order and 'orderId' in tp_order['result'] else None
         return tp_order, tp_order_id
     except Exception as e:
-        logging.error(f"익절 지정가 주문 에러: {e}")
-        return None, None
+        if link_id and is_duplicate_link(e):
+            existing = find_order_by_link(session, symbol, link_id)
+            if existing is not None:
+                logging.info("[익절 지정가 주문] 이미 접수됨(orderLinkId=%s)", link_id,
+                             extra={"event": "tp_order_duplicate", "symbol": symbol})
+                return {"retCode": 0, "result": {"orderId": existing.get('orderId'), "orderLinkId": link_id},
+                        "duplicate": True}, existing.get('orderId')
+        logging.error("익절 지정가 주문 에러: %s", e, extra={"event": "tp_order_error", "symbol": symbol})
+        raise
 
 def place_stop_loss(session, symbol, side, sl_price):
     try:
@@ -179,12 +302,13 @@ def place_stop_loss(session, symbol, side, sl_price):
             stopLoss=str(sl_price),
             slTriggerBy="LastPrice"
         )
-        logging.info(f"[손절 예약] 손절가: {sl_price}, 결과: {sl_result}")
+        logging.info("[손절 예약] 손절가: %s, 결과: %s", sl_price, sl_result,
+                     extra={"event": "sl_order", "symbol": symbol, "sample": "sl_order"})
         sl_order_id = sl_result['result'].get('orderId') if sl_result and 'result' in sl_result and 'orderId' in sl_result['result'] else None
         return sl_result, sl_order_id
     except Exception as e:
-        logging.error(f"손절 예약 에러: {e}")
-        return None, None
+        logging.error("손절 예약 에러: %s", e, extra={"event": "sl_order_error", "symbol": symbol})
+        raise
 
 def cancel_order(session, symbol, order_id):
     if not order_id:
@@ -195,9 +319,281 @@ def cancel_order(session, symbol, order_id):
             symbol=symbol,
             orderId=order_id
         )
-        logging.info(f"[주문취소] 주문ID: {order_id}, 결과: {res}")
+        logging.info("[주문취소] 주문ID: %s, 결과: %s", order_id, res,
+                     extra={"event": "cancel_order", "symbol": symbol, "sample": "cancel_order"})
+    except Exception as e:
+        logging.error("[주문취소 에러] %s", e, extra={"event": "cancel_order_error", "symbol": symbol})
+
+# === 진입 사전 준비(pre-arm) ===
+def now_kst_str():
+    kst = pytz.timezone("Asia/Seoul")
+    return clock_sync.now_utc().astimezone(kst).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+def ts_to_kst_str(ts):
+    kst = pytz.timezone("Asia/Seoul")
+    return datetime.fromtimestamp(ts, tz=pytz.utc).astimezone(kst).strftime("%Y-%m-%d %H:%M:%S")
+
+# 공유 상태 저장소(api_server가 attach_state_store로 지정, 없으면 프로세스 내 딕셔너리만 사용)
+state_store = None
+
+def attach_state_store(store, trade_statuses):
+    global state_store
+    state_store = store
+    # 다른 프로세스에서 들어온 중단 요청은 저장소가 확인해 여기로 전달
+    store.on_stop = lambda user_id: request_stop(trade_statuses, user_id)
+    store.start()
+
+def publish_status(trade_statuses, user_id):
+    if state_store is not None:
+        state_store.publish(user_id, trade_statuses[user_id])
+
+def set_info(trade_statuses, user_id, **fields):
+    trade_statuses[user_id]['info'].update(fields)
+    publish_status(trade_statuses, user_id)
+
+def set_running(trade_statuses, user_id, running, error=None):
+    trade_statuses[user_id]['running'] = running
+    if error is not None:
+        trade_statuses[user_id]['error'] = error
+    publish_status(trade_statuses, user_id)
+
+def mark_stages(trade_statuses, user_id, **stamps):
+    """
+    매매 단계 시각(로컬 epoch 초) 기록 + 단계 사이 소요시간 지표
+    - 발행은 하지 않음(바로 뒤 set_info 가 함께 발행)
+    """
+    stages = trade_statuses[user_id]['info'].setdefault('stages', {})
+    stages.update(stamps)
+    metrics.observe_stages(stages, stamps)
+
+def mark_deadline(trade_statuses, user_id, entry_ts):
+    # 진입 마감(거래소 시계)을 로컬 시계로 바꿔 기록
+    mark_stages(trade_statuses, user_id, deadline=entry_ts - clock_sync.offset)
+
+# 유저별 깨우기 이벤트(trade_statuses는 JSON 직렬화 대상이라 별도 보관)
+_wake_events = {}
+
+def request_stop(trade_statuses, user_id):
+    """
+    매매 중단 플래그를 내리고 대기 중인 워커를 즉시 깨움
+    """
+    if user_id not in trade_statuses:
+        return False
+    set_running(trade_statuses, user_id, False)
+    wake = _wake_events.get(user_id)
+    if wake is not None:
+        wake.set()
+    return True
+
+def compute_entry_plan(position_type, fixed_loss, price, levels, tick_size, min_qty, qty_step):
+    """
+    네트워크 호출 없이 손절가/주문수량 계산
+    - levels: 직전 마감 캔들들의 LevelIndex(지지/저항선 이분탐색)
+    """
+    if position_type == "long":
+        sl_price, scenario_msg, stop_pct = get_long_stop_loss(
+            lows=levels.lows(),
+            entry_price=price,
+            tick_size=tick_size,
+            tick_offset=SL_TICK_OFFSET,
+            fallback_pct=SL_FALLBACK_PCT,
+            take_profit_ratio=TP_RATIO,
+            supports=levels.supports_below(price) if price is not None else None
+        )
+    else:
+        sl_price, scenario_msg, stop_pct = get_short_stop_loss(
+            highs=levels.highs(),
+            entry_price=price,
+            tick_size=tick_size,
+            tick_offset=SL_TICK_OFFSET,
+            fallback_pct=SL_FALLBACK_PCT,
+            take_profit_ratio=TP_RATIO,
+            resistances=levels.resistances_above(price) if price is not None else None
+        )
+    raw_qty = float(fixed_loss) / abs(price - sl_price)
+    return {
+        "side": "Buy" if position_type == "long" else "Sell",
+        "position_type": position_type,
+        "fixed_loss": fixed_loss,
+        "ref_price": price,
+        "levels": levels,
+        "tick_size": tick_size,
+        "min_qty": min_qty,
+        "qty_step": qty_step,
+        "sl_price": sl_price,
+        "stop_loss_msg": scenario_msg,
+        "stop_pct": stop_pct,
+        "qty": floor_qty(raw_qty, min_qty, qty_step),
+    }
+
+def get_level_index(session, symbol, interval=KLINE_INTERVAL):
+    """
+    시세허브의 지지/저항선 인덱스(네트워크 없음), 없으면 캔들 1회 조회로 생성
+    """
+    levels = market_data.level_index(symbol, interval)
+    if levels is not None:
+        return levels
+    try:
+        candles = get_recent_candles(session, symbol, interval, count=LEVEL_WINDOW)
     except Exception as e:
-        logging.error(f"[주문취소 에러] {e}")
+        logging.error("OHLCV(캔들) 조회 실패: %s", e, extra={"sample": "kline_error"})
+        candles = []
+    return LevelIndex.from_candles(candles, window=LEVEL_WINDOW)
+
+def last_closed_bar_start(interval=KLINE_INTERVAL):
+    """
+    지금 보내는 주문이 거래소에 도착하는 시각(거래소 시계 + 왕복지연/2) 기준 마지막 마감봉 시작시각(ms)
+    - 진입은 왕복지연/2 만큼 앞당겨 쏘므로 봉 경계 직전이어도 방금 마감되는 봉을 가리킴
+    """
+    return last_closed_start(interval, int((clock_sync.now() + clock_sync.fire_lead()) * 1000))
+
+def levels_current(levels, interval=KLINE_INTERVAL):
+    """
+    지지/저항선 인덱스에 최신 마감봉까지 들어 있는지(봉 경계를 넘은 뒤 사전준비 값이면 False)
+    """
+    return levels is not None and levels.last_start is not None and levels.last_start >= last_closed_bar_start(interval)
+
+def fetch_level_index(session, symbol, last_start, interval=KLINE_INTERVAL):
+    """
+    last_start 봉까지의 최근 LEVEL_WINDOW개로 지지/저항선 인덱스 생성(REST 캔들 1회), 그 봉이 아직 없으면 None
+    - 봉 경계 직전에 도착한 요청이면 거래소가 last_start 봉을 진행 중으로 주는데, 마감까지 왕복지연/2 이내라 그대로 사용
+    """
+    res = session.get_kline(category="linear", symbol=symbol, interval=interval, limit=LEVEL_WINDOW + 1)
+    rows = sorted(res['result']['list'], key=lambda k: int(k[0]))
+    candles = [(int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4])) for k in rows if int(k[0]) <= last_start]
+    if not candles or candles[-1][0] < last_start:
+        return None
+    candles = candles[-LEVEL_WINDOW:]
+    # 허브에는 거래소가 마감으로 준 봉만(가장 최신 행은 항상 진행 중)
+    market_data.seed_candles(symbol, interval, [c for c in candles if c[0] < int(rows[-1][0])])
+    return LevelIndex.from_candles(candles, window=LEVEL_WINDOW)
+
+def refresh_level_index(session, symbol, levels, interval=KLINE_INTERVAL):
+    """
+    최신 마감봉이 빠진 지지/저항선 인덱스를 허브 → REST 캔들 재조회 순으로 다시 만듦
+    반환: (인덱스, "refreshed"), 재조회 실패 시 (levels 그대로, "stale")
+    """
+    last_start = last_closed_bar_start(interval)
+    fresh = market_data.level_index(symbol, interval)
+    if fresh is None or fresh.last_start < last_start:
+        try:
+            fresh = fetch_level_index(session, symbol, last_start, interval)
+        except Exception as e:
+            logging.error("OHLCV(캔들) 재조회 실패: %s", e, extra={"sample": "kline_error"})
+            fresh = None
+    if fresh is None:
+        return levels, "stale"
+    return fresh, "refreshed"
+
+def prepare_entry(session, symbol, position_type, fixed_loss):
+    """
+    진입 시각 전에 시세/종목정보/캔들을 조회해 주문 직전 상태까지 계산
+    """
+    price = get_price(session, symbol)
+    tick_size = get_tick_size(session, symbol)
+    min_qty, qty_step = get_lot_size(session, symbol)
+    levels = get_level_index(session, symbol)
+    if not levels_current(levels):
+        levels, _ = refresh_level_index(session, symbol, levels)
+    plan = compute_entry_plan(position_type, fixed_loss, price, levels, tick_size, min_qty, qty_step)
+    plan["prepared_at"] = time.time()
+    return plan
+
+def finalize_entry(session, symbol, plan, price=None):
+    """
+    진입 시각 도달 시 캔들 마감과 현재가 재확인
+    - 진입 시각(:00/:30)은 30분봉 마감 시각이라 사전준비 뒤 봉 경계를 넘었으면
+      방금 마감된 봉까지 캔들을 다시 받아 재계산(재조회 실패 시에만 준비된 캔들값 사용, levels_state=stale)
+    - 준비 가격 대비 변동폭이 PRICE_RECHECK_PCT 이내면 준비된 수량/손절가 그대로 사용
+    - 벗어나면 보관된 캔들값으로 로컬 재계산(추가 REST 호출 없음)
+    - price: 호출자가 이미 조회한 현재가(같은 심볼 진입끼리 공유)
+    - plan["levels_state"] 가 이미 있으면(캔들 확인을 이미 마친 plan) 확인 생략
+    """
+    level_state = plan.get("levels_state")
+    levels = plan["levels"]
+    refreshed = False
+    if level_state is None:
+        if levels_current(levels):
+            level_state = "current"
+        else:
+            # 캔들 재조회와 현재가 조회를 동시에
+            price_future = _order_executor.submit(get_price, session, symbol) if price is None else None
+            levels, level_state = refresh_level_index(session, symbol, levels)
+            refreshed = level_state == "refreshed"
+            if price_future is not None:
+                price = price_future.result()
+    if price is None:
+        price = get_price(session, symbol)
+    drift = abs(price - plan["ref_price"]) / plan["ref_price"] if price is not None else None
+    if refreshed or (drift is not None and drift > PRICE_RECHECK_PCT):
+        prepared_at = plan.get("prepared_at")
+        plan = compute_entry_plan(
+            plan["position_type"], plan["fixed_loss"], price if price is not None else plan["ref_price"], levels,
+            plan["tick_size"], plan["min_qty"], plan["qty_step"]
+        )
+        plan["prepared_at"] = prepared_at
+        plan["recomputed"] = True
+    elif price is not None:
+        plan["ref_price"] = price
+    plan["levels_state"] = level_state
+    plan["price_drift_pct"] = round(drift * 100, 4) if drift is not None else None
+    return plan
+
+# === 진입 직후 보호주문(익절/손절) ===
+def order_ok(res):
+    return isinstance(res, dict) and res.get('retCode', 0) == 0
+
+def is_transient(e):
+    """
+    다시 보내면 성공할 수 있는 실패(타임아웃/연결 끊김/HTTP 단계 실패/호출량 초과/거래소 내부 에러)
+    - 포지션 없음, 수량/증거금 부족 같은 거절은 재시도해도 같은 결과
+    """
+    if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError, TimeoutError, ConnectionError)):
+        return True
+    # pybit: HTTP 단계 실패(재시도 소진 포함)는 FailedRequestError, retCode != 0 은 InvalidRequestError(status_code=retCode)
+    return type(e).__name__ == "FailedRequestError" or getattr(e, "status_code", None) in RETRYABLE_CODES
+
+def _with_retry(place, *args, **kwargs):
+    """
+    보호주문 1건 발송, 일시적 실패(is_transient)만 PROTECT_RETRIES회까지 짧게 재시도
+    - 익절은 고정 orderLinkId 로 보내므로 타임아웃 뒤 재시도해도 두 번 접수되지 않음(손절 예약은 같은 값 재설정이라 무해)
+    반환: (결과, 주문ID, 시도횟수, 완료시각), 실패 시 결과/주문ID None
+    """
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            result, order_id = place(*args, **kwargs)
+            return result, order_id, attempts, time.time()
+        except Exception as e:
+            if attempts > PROTECT_RETRIES or not is_transient(e):
+                return None, None, attempts, time.time()
+        time.sleep(PROTECT_RETRY_DELAY)
+
+def protect_position(session, symbol, side, qty, tp_price, sl_price, sl_attached=False, trade_id=None):
+    """
+    익절 지정가와 손절 예약을 동시에 발송하고 결과를 합쳐 반환
+    - sl_attached: 진입 주문에 손절가가 이미 붙어 있으면 손절 예약 생략
+    - trade_id: 익절 주문 orderLinkId 를 만들 매매 ID
+    """
+    tp_future = _order_executor.submit(_with_retry, place_tp_limit_order, session, symbol, side, qty, tp_price,
+                                       link_id=order_link_id(trade_id, "tp"))
+    if sl_attached:
+        sl_result, sl_order_id, sl_attempts, sl_done = {"attached_to_entry": True}, None, 0, None
+    else:
+        sl_future = _order_executor.submit(_with_retry, place_stop_loss, session, symbol, side, sl_price)
+        sl_result, sl_order_id, sl_attempts, sl_done = sl_future.result()
+    tp_result, tp_order_id, tp_attempts, tp_done = tp_future.result()
+    return {
+        "tp_order": tp_result,
+        "tp_order_id": tp_order_id,
+        "tp_attempts": tp_attempts,
+        "tp_done": tp_done,
+        "sl_order": sl_result,
+        "sl_order_id": sl_order_id,
+        "sl_attempts": sl_attempts,
+        "sl_done": sl_done,
+    }
 
 # === 강제 청산/주문취소 ===
 def force_exit_position(user_id, symbol, position_type, api_key, api_secret, trade_statuses):
@@ -206,24 +602,482 @@ def force_exit_position(user_id, symbol, position_type, api_key, api_secret, tra
     - TP/SL 예약주문 모두 취소
     """
     try:
-        session = HTTP(testnet=False, api_key=api_key, api_secret=api_secret)
-        side = "Buy" if position_type == "long" else "Sell"
-        qty = get_position_size(session, symbol)
-
-        if qty > 0:
-            close_order = close_position(session, symbol, side, qty)
-            # trade_statuses[user_id]['info']['exit_order'] = close_order
-            # trade_statuses[user_id]['info']['exit_price'] = get_price(session, symbol)
-            # trade_statuses[user_id]['info']['exit_at'] = now_kst.strftime("%Y-%m-%d %H:%M:%S")
-        # TP/SL 예약주문 취소도 반드시
-        tp_order_id = trade_statuses[user_id]['info'].get('tp_order_id')
-        sl_order_id = trade_statuses[user_id]['info'].get('sl_order_id')
-        cancel_order(session, symbol, tp_order_id)
-        cancel_order(session, symbol, sl_order_id)
-        close_fired = True
+        with session_pool.checkout(api_key, api_secret) as session:
+            side = "Buy" if position_type == "long" else "Sell"
+            qty = get_position_size(session, symbol)
+
+            if qty > 0:
+                close_position(session, symbol, side, qty,
+                               link_id=order_link_id(trade_statuses[user_id]['info'].get('trade_id'), "close"))
+            # TP/SL 예약주문 취소도 반드시
+            tp_order_id = trade_statuses[user_id]['info'].get('tp_order_id')
+            sl_order_id = trade_statuses[user_id]['info'].get('sl_order_id')
+            cancel_order(session, symbol, tp_order_id)
+            cancel_order(session, symbol, sl_order_id)
+            journal.append(user_id, "exited", exit_source="force", closed_qty=qty)
 
     except Exception as e:
-        logging.error(f"[강제종료 오류] {e}")
+        logging.error("[강제종료 오류] %s", e)
+
+# === 매매 단계별 함수(쓰레드/asyncio 엔진 공용) ===
+def init_trade_status(trade_statuses, user_id, position_type, symbol, fixed_loss, entry_time, exit_time,
+                      take_profit=None, stop_loss=None, immediate=False):
+    # 유저별 상태 딕셔너리 생성/초기화
+    trade_statuses[user_id] = {
+        "running": True,
+        "info": {
+            "position_type": position_type,
+            "symbol": symbol,
+            "fixed_loss": fixed_loss,
+            "entry_time": entry_time,
+            "exit_time": exit_time,
+            "take_profit": take_profit,
+            "stop_loss": stop_loss,
+            "entry_price": None,
+            "exit_price": None,
+            "entry_order": None,
+            "tp_order": None,
+            "sl_order": None,
+            "tp_order_id": None,
+            "sl_order_id": None,
+            "tp_price": None,
+            "sl_price": None,
+            "stop_loss_msg": None,
+            "exit_at": None,
+            "armed_at": None,
+            "armed_refreshed_at": None,
+            "fired_at": None,
+            "immediate": immediate
+        },
+        "error": None
+    }
+    publish_status(trade_statuses, user_id)
+
+def begin_trade(trade_statuses, user_id, api_key, api_secret, position_type, symbol, fixed_loss, entry_time, exit_time,
+                take_profit=None, stop_loss=None, immediate=False, recovered=None):
+    """
+    상태 초기화 + 저널에 시작 기록(재시작 복구된 매매는 저널 값으로 상태 복원)
+    """
+    init_trade_status(trade_statuses, user_id, position_type, symbol, fixed_loss, entry_time, exit_time,
+                      take_profit, stop_loss, immediate)
+    # 주문 orderLinkId 용 매매 ID(복구된 매매는 저널의 값 그대로 → 재시작 전에 보낸 주문과 같은 ID)
+    trade_id = (recovered or {}).get("trade_id") or uuid.uuid4().hex[:16]
+    if recovered is None:
+        trade_statuses[user_id]['info']['trade_id'] = trade_id
+        # 시크릿은 암호화해서만 기록(JOURNAL_SECRET_KEY 없으면 기록 안 함 → 재시작 복구 대상에서 빠짐)
+        journal.append(
+            user_id, "started",
+            api_key=api_key, api_secret=seal_secret(api_secret), position_type=position_type, symbol=symbol,
+            fixed_loss=fixed_loss, entry_time=entry_time, exit_time=exit_time,
+            take_profit=take_profit, stop_loss=stop_loss, immediate=immediate, trade_id=trade_id,
+        )
+    else:
+        set_info(trade_statuses, user_id, recovered_at=now_kst_str(), **dict(recovered, trade_id=trade_id))
+
+def resume_protection(session, trade_statuses, user_id, symbol):
+    """
+    재시작 복구 후 거래소에 없는 익절/손절만 다시 발송
+    """
+    info = trade_statuses[user_id]['info']
+    tp_missing, sl_missing = info.get('tp_missing'), info.get('sl_missing')
+    if not tp_missing and not sl_missing:
+        return
+    side = "Buy" if info['position_type'] == "long" else "Sell"
+    tp_future = sl_future = None
+    if tp_missing:
+        # 저널에 익절 주문ID가 없으면 원래 orderLinkId 그대로(죽기 직전 접수됐으면 중복으로 확인됨)
+        # 있는데 거래소에 없으면(취소됨) 그 주문ID로 새 orderLinkId
+        prev_id = info.get('tp_order_id')
+        purpose = f"tp-{prev_id[-6:]}" if prev_id else "tp"
+        tp_future = _order_executor.submit(_with_retry, place_tp_limit_order, session, symbol, side, info['qty'],
+                                           info['tp_price'], link_id=order_link_id(info.get('trade_id'), purpose))
+    if sl_missing:
+        sl_future = _order_executor.submit(_with_retry, place_stop_loss, session, symbol, side, info['sl_price'])
+    entries = []
+    if tp_future is not None:
+        tp_result, tp_order_id, _, _ = tp_future.result()
+        set_info(trade_statuses, user_id, tp_order=tp_result, tp_order_id=tp_order_id, tp_missing=tp_result is None)
+        entries.append((user_id, "tp_placed", {"tp_order_id": tp_order_id, "tp_price": info['tp_price']}))
+    if sl_future is not None:
+        sl_result, sl_order_id, _, _ = sl_future.result()
+        set_info(trade_statuses, user_id, sl_order=sl_result, sl_order_id=sl_order_id, sl_missing=sl_result is None)
+        entries.append((user_id, "sl_placed", {"sl_order_id": sl_order_id, "sl_price": info['sl_price']}))
+    journal.append_many(entries)
+
+def trade_deadlines(entry_time, exit_time):
+    """
+    (사전준비, 진입, 청산) 마감시각(epoch 초, 거래소 시계 기준)
+    - 진입은 주문이 거래소에 도착하는 시각을 맞추도록 왕복지연/2 만큼 앞당김
+    """
+    kst = pytz.timezone("Asia/Seoul")
+    entry_dt_utc = kst.localize(datetime.strptime(entry_time, "%Y-%m-%d %H:%M")).astimezone(pytz.utc)
+    exit_dt_utc = kst.localize(datetime.strptime(exit_time, "%Y-%m-%d %H:%M")).astimezone(pytz.utc)
+    prearm_dt_utc = entry_dt_utc - timedelta(seconds=PREARM_SECONDS)
+    entry_lead = clock_sync.fire_lead()
+    return prearm_dt_utc.timestamp(), entry_dt_utc.timestamp() - entry_lead, exit_dt_utc.timestamp(), entry_lead
+
+def refresh_plan(session, trade_statuses, user_id, symbol, position_type, fixed_loss, plan):
+    """
+    사전준비값이 없거나 PREARM_REFRESH_SEC 지났으면 다시 계산
+    """
+    if plan is not None and time.time() - plan["prepared_at"] < PREARM_REFRESH_SEC:
+        return plan
+    try:
+        plan = prepare_entry(session, symbol, position_type, fixed_loss)
+        if trade_statuses[user_id]['info'].get('armed_at') is None:
+            set_info(trade_statuses, user_id, armed_at=now_kst_str())
+            journal.append(user_id, "armed", ref_price=plan["ref_price"], sl_price=plan["sl_price"], qty=plan["qty"])
+        set_info(trade_statuses, user_id, armed_refreshed_at=now_kst_str())
+    except Exception as e:
+        logging.error("[사전준비 실패] %s", e)
+    return plan
+
+def fire_entry(session, trade_statuses, user_id, symbol, position_type, fixed_loss, take_profit, plan, price=None):
+    """
+    진입 시각 도달: 현재가 재확인 → 시장가 진입(손절 동시 지정) → 익절/손절 보호주문
+    """
+    entry = send_entry(session, trade_statuses, user_id, symbol, position_type, fixed_loss, take_profit, plan, price)
+    protect_entry(session, trade_statuses, user_id, symbol, entry)
+
+def send_entry(session, trade_statuses, user_id, symbol, position_type, fixed_loss, take_profit, plan, price=None):
+    """
+    시장가 진입 주문까지만 수행, 보호주문에 필요한 값 반환
+    """
+    kst = pytz.timezone("Asia/Seoul")
+    fired_ts = time.time()
+    set_info(trade_statuses, user_id, fired_at=now_kst_str(), prearmed=plan is not None)
+    if plan is None:
+        plan = prepare_entry(session, symbol, position_type, fixed_loss)
+    else:
+        plan = finalize_entry(session, symbol, plan, price)
+    side = plan["side"]
+    executed_price = plan["ref_price"]
+    sl_price = plan["sl_price"]
+    qty = plan["qty"]
+
+    if take_profit not in [None, ""]:
+        tp_price = float(take_profit)
+    else:
+        tp_price = round(executed_price * (1 + TP_RATIO), 8) if position_type == "long" else round(executed_price * (1 - TP_RATIO), 8)
+
+    order_sent_ts = time.time()
+    entry_order = open_position(session, symbol, side, qty, stop_loss=sl_price if ATTACH_SL_ON_ENTRY else None)
+    order_ack_ts = time.time()
+    mark_stages(trade_statuses, user_id, order_sent=order_sent_ts, order_ack=order_ack_ts)
+    set_info(
+        trade_statuses, user_id,
+        entry_order=entry_order,
+        entry_at=clock_sync.now_utc().astimezone(kst).strftime("%Y-%m-%d %H:%M:%S"),
+        entry_price=executed_price,
+        stop_loss_msg=plan["stop_loss_msg"],
+        price_drift_pct=plan.get("price_drift_pct"),
+        levels_state=plan.get("levels_state"),
+        fire_to_send_ms=round((order_sent_ts - fired_ts) * 1000, 2),
+        fire_to_ack_ms=round((order_ack_ts - fired_ts) * 1000, 2),
+    )
+    return {
+        "side": side,
+        "qty": qty,
+        "entry_price": executed_price,
+        "tp_price": tp_price,
+        "sl_price": sl_price,
+        "entry_order": entry_order,
+        "order_ack_ts": order_ack_ts,
+    }
+
+def protect_entry(session, trade_statuses, user_id, symbol, entry):
+    """
+    진입 직후 익절/손절 동시 발송(손절이 진입 주문에 붙었으면 익절만) 후 저널 기록
+    """
+    side, qty, executed_price = entry["side"], entry["qty"], entry["entry_price"]
+    tp_price, sl_price = entry["tp_price"], entry["sl_price"]
+    entry_order, order_ack_ts = entry["entry_order"], entry["order_ack_ts"]
+    if not order_ok(entry_order) and not _filled_anyway(session, symbol):
+        # 진입 실패: 포지션이 없으니 보호주문 없이 종료(감시 루프가 남은 주문만 정리)
+        set_running(trade_statuses, user_id, False,
+                    error=entry_order if isinstance(entry_order, str) else f"진입실패: {entry_order}")
+        return
+    sl_attached = ATTACH_SL_ON_ENTRY and order_ok(entry_order)
+    protect = protect_position(session, symbol, side, qty, tp_price, sl_price, sl_attached=sl_attached,
+                               trade_id=trade_statuses[user_id]['info'].get('trade_id'))
+    # 무보호 구간: 진입 체결 응답 ~ 손절 확보(진입 주문에 손절이 붙었으면 0)
+    if sl_attached:
+        unprotected_ms = 0.0
+    elif protect["sl_done"] is not None and protect["sl_order"] is not None:
+        unprotected_ms = round((protect["sl_done"] - order_ack_ts) * 1000, 2)
+    else:
+        unprotected_ms = None
+    mark_stages(trade_statuses, user_id, tp_placed=protect["tp_done"],
+                sl_placed=order_ack_ts if sl_attached else protect["sl_done"])
+    set_info(
+        trade_statuses, user_id,
+        tp_order=protect["tp_order"],
+        sl_order=protect["sl_order"],
+        tp_order_id=protect["tp_order_id"],
+        sl_order_id=protect["sl_order_id"],
+        tp_price=tp_price,
+        sl_price=sl_price,
+        sl_attached=sl_attached,
+        tp_attempts=protect["tp_attempts"],
+        sl_attempts=protect["sl_attempts"],
+        unprotected_ms=unprotected_ms,
+        tp_placed_ms=round((protect["tp_done"] - order_ack_ts) * 1000, 2),
+    )
+    # 보호주문까지 끝난 뒤 한 번에 기록(진입~손절 확보 구간에 디스크 대기 없음)
+    # 진입 직후 기록 전에 죽어도 복구 시 거래소 포지션으로 진입 여부를 확인
+    journal.append_many([
+        (user_id, "entered", {"entered": True, "entry_ok": order_ok(entry_order), "side": side, "qty": qty,
+                              "entry_price": executed_price, "tp_price": tp_price, "sl_price": sl_price}),
+        (user_id, "tp_placed", {"tp_order_id": protect["tp_order_id"]}),
+        (user_id, "sl_placed", {"sl_order_id": protect["sl_order_id"], "sl_attached": sl_attached}),
+    ])
+
+def _filled_anyway(session, symbol):
+    """
+    진입 응답이 실패여도(타임아웃 등 응답 유실) 포지션이 생겼는지 1회 확인, 확인 못 하면 있다고 봄(보호주문 발송)
+    """
+    try:
+        res = session.get_positions(category="linear", symbol=symbol)
+        return any(float(p.get('size') or 0) > 0 for p in res['result']['list'])
+    except Exception as e:
+        logging.error("[진입 실패 후 포지션 확인 실패] %s", e)
+        return True
+
+def register_entry(session, trade_statuses, user_id, api_key, symbol, position_type, fixed_loss, take_profit,
+                   prearm_ts, entry_ts, wake, immediate=False, entry_fired=False, entry_lead=0.0):
+    """
+    공용 진입 디스패처에 진입 티켓 등록(즉시 진입/복구 재개 매매는 None → 직접 진입)
+    - 그룹은 명목 진입 시각(entry_ts + entry_lead)으로 묶음, 앞당김은 디스패처가 그룹마다 1번 적용
+    """
+    if not ENTRY_DISPATCH or immediate or entry_fired:
+        return None
+    # 순환 import 방지: 디스패처는 trade_worker 함수들을 사용
+    from entry_dispatcher import entry_dispatcher
+    return entry_dispatcher.register(prearm_ts, entry_ts + entry_lead, session, trade_statuses, user_id, symbol, position_type,
+                                     fixed_loss, take_profit, api_key, wake)
+
+def ticket_state(trade_statuses, user_id, ticket):
+    """
+    진입 티켓 확인: "wait"(대기) / "stopped"(진입 전 중단) / "entered"(진입 처리 끝)
+    - 진입 처리가 이미 시작된 뒤 중단되면 끝날 때까지 기다렸다가 감시 루프에서 강제 청산
+    """
+    if not trade_statuses[user_id]["running"]:
+        ticket.cancel()
+        if ticket.queued_ms is None:
+            return "stopped"
+    if ticket.done:
+        if ticket.error:
+            raise RuntimeError(ticket.error)
+        return "entered"
+    return "wait"
+
+def record_stream_exit(session, trade_statuses, user_id, symbol, watch):
+    # 실제 청산 체결가/체결시각 기록
+    exit_price = watch.exit_price if watch.exit_price is not None else get_price(session, symbol)
+    exit_ts = watch.exit_time_ms / 1000 if watch.exit_time_ms else clock_sync.now()
+    if watch.exit_time_ms:
+        mark_stages(trade_statuses, user_id, exit=exit_ts - clock_sync.offset, exit_detected=time.time())
+    else:
+        mark_stages(trade_statuses, user_id, exit_detected=time.time())
+    set_info(
+        trade_statuses, user_id,
+        exit_price=exit_price,
+        exit_vwap=watch.exit_vwap,
+        exit_at=ts_to_kst_str(exit_ts),
+        exit_source="stream",
+    )
+    journal.append(user_id, "exited", exit_price=exit_price, exit_source="stream")
+
+def poll_position_exit(session, trade_statuses, user_id, symbol, watch=None, pos_size=None):
+    """
+    REST로 포지션 조회, 사라졌으면 현재가로 청산 기록 후 True
+    - pos_size: 계정 전체 조회 등으로 이미 알고 있으면 조회 생략
+    """
+    if pos_size is None:
+        pos_size = get_position_size(session, symbol)
+    if pos_size > 0 and watch is not None:
+        watch.mark_open()
+    if pos_size == 0:
+        mark_stages(trade_statuses, user_id, exit_detected=time.time())
+        exit_price = get_price(session, symbol)
+        set_info(trade_statuses, user_id, exit_price=exit_price, exit_at=ts_to_kst_str(clock_sync.now()), exit_source="rest")
+        journal.append(user_id, "exited", exit_price=exit_price, exit_source="rest")
+        return True
+    return False
+
+# === 매매 1건 상태 머신(쓰레드/asyncio 엔진 공용) ===
+class TradeRun:
+    """
+    사전준비 → 진입 → (복구 시 보호주문 확인) → 청산 감시 단계를 한 곳에서 처리
+    - setup/step/fail/cleanup 은 블로킹 거래소 호출을 포함(asyncio 엔진은 쓰레드풀에서 실행)
+    - step: 한 번 진행 후 다음 대기 시간(None: 깨울 때까지) 반환, 매매가 끝나면 DONE
+    - 엔진은 wake 비우기 → step → wake 대기만 반복(대기 방식만 엔진마다 다름)
+    - 마감(arm/entry/exit)은 스케줄러 쓰레드가 due 에 넣고 wake.set()
+    """
+
+    DONE = "done"
+
+    def __init__(
+        self, user_id, trade_statuses,
+        api_key, api_secret,
+        position_type, symbol, fixed_loss, entry_time, exit_time,
+        take_profit=None, stop_loss=None,
+        immediate=False, recovered=None
+    ):
+        self.user_id = user_id
+        self.trade_statuses = trade_statuses
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.position_type = position_type
+        self.symbol = symbol
+        self.fixed_loss = fixed_loss
+        self.entry_time = entry_time
+        self.exit_time = exit_time
+        self.take_profit = take_profit
+        self.stop_loss = stop_loss
+        self.immediate = immediate
+        self.recovered = recovered
+        self.session = None
+        self.wake = None
+        self.due = set()
+        self.jobs = []
+        self.ticket = None
+        self.watch = None
+        self.watch_token = None
+        self.feed_symbol = None
+        self.plan = None
+        self.entry_fired = bool(recovered and recovered.get("entered"))
+        self.monitoring = False
+        self.next_rest_check = 0.0
+
+    def _trigger(self, name):
+        def fire():
+            self.due.add(name)
+            self.wake.set()
+        return fire
+
+    def setup(self, wake):
+        """
+        상태/저널 기록, 사전준비/진입/청산 마감 등록, private 스트림 감시 등록
+        - wake: set() 이 있는 객체(다른 쓰레드에서 호출됨)
+        """
+        user_id, trade_statuses = self.user_id, self.trade_statuses
+        self.wake = wake
+        self.session = session_pool.acquire(self.api_key, self.api_secret)
+        begin_trade(trade_statuses, user_id, self.api_key, self.api_secret, self.position_type, self.symbol,
+                    self.fixed_loss, self.entry_time, self.exit_time, self.take_profit, self.stop_loss,
+                    self.immediate, self.recovered)
+        prearm_ts, entry_ts, exit_ts, entry_lead = trade_deadlines(self.entry_time, self.exit_time)
+        if not self.immediate and not self.entry_fired:
+            mark_deadline(trade_statuses, user_id, entry_ts)
+        set_info(trade_statuses, user_id, entry_lead_ms=round(entry_lead * 1000, 3))
+        _wake_events[user_id] = wake
+
+        # 진입은 같은 시각 매매끼리 디스패처가 묶어서 처리(티켓이 끝나면 wake)
+        self.ticket = register_entry(self.session, trade_statuses, user_id, self.api_key, self.symbol, self.position_type,
+                                     self.fixed_loss, self.take_profit, prearm_ts, entry_ts, wake, self.immediate,
+                                     self.entry_fired, entry_lead)
+        if self.ticket is None:
+            self.jobs.append(scheduler.schedule(prearm_ts, self._trigger("arm"), f"{user_id}:arm"))
+            self.jobs.append(scheduler.schedule(entry_ts, self._trigger("entry"), f"{user_id}:entry"))
+        self.jobs.append(scheduler.schedule(exit_ts, self._trigger("exit"), f"{user_id}:exit"))
+
+        # private WebSocket 사용 시 포지션/체결 이벤트로 청산을 즉시 감지
+        if PRIVATE_WS_ENABLED:
+            try:
+                self.watch_token, self.watch = private_streams.watch(self.api_key, self.api_secret, self.symbol, wake)
+            except Exception as e:
+                logging.error("[private WS 연결 실패, REST 폴링으로 진행] %s", e)
+
+    def step(self):
+        if not self.monitoring:
+            timeout = self._entry_step()
+            if timeout is not self.DONE:
+                return timeout
+            self.monitoring = True
+            if self.recovered is not None and self.entry_fired:
+                resume_protection(self.session, self.trade_statuses, self.user_id, self.symbol)
+        return self._monitor_step()
+
+    def _entry_step(self):
+        trade_statuses, user_id = self.trade_statuses, self.user_id
+        if self.entry_fired:
+            return self.DONE
+        if self.ticket is not None:
+            state = ticket_state(trade_statuses, user_id, self.ticket)
+            if state == "entered":
+                self.entry_fired = True
+            return self.DONE if state in ("stopped", "entered") else None
+        if not trade_statuses[user_id]["running"]:
+            return self.DONE
+
+        # 사전준비 구간부터 공용 시세허브 구독(같은 심볼 유저끼리 공유)
+        if MARKET_WS_ENABLED and self.feed_symbol is None and (self.immediate or self.due & {"arm", "entry"}):
+            market_data.acquire(self.symbol)
+            self.feed_symbol = self.symbol
+
+        if self.immediate or "entry" in self.due:
+            fire_entry(self.session, trade_statuses, user_id, self.symbol, self.position_type, self.fixed_loss,
+                       self.take_profit, self.plan)
+            self.entry_fired = True
+            return self.DONE
+
+        # 진입 PREARM_SECONDS 전부터 손절가/수량을 미리 계산해두고 주기적으로 갱신
+        if "arm" in self.due:
+            self.plan = refresh_plan(self.session, trade_statuses, user_id, self.symbol, self.position_type,
+                                     self.fixed_loss, self.plan)
+            return PREARM_REFRESH_SEC
+        return None
+
+    def _monitor_step(self):
+        trade_statuses, user_id, watch = self.trade_statuses, self.user_id, self.watch
+        # 매매 중단 요청(강제종료) 또는 지정 종료시간 도달 시 모든 포지션/주문 일괄 종료
+        if not trade_statuses[user_id]['running'] or "exit" in self.due:
+            force_exit_position(user_id, self.symbol, self.position_type, self.api_key, self.api_secret, trade_statuses)
+            return self.DONE
+
+        # 포지션이 사라지면(청산됨) 기록 후 종료
+        if watch is not None and watch.closed:
+            record_stream_exit(self.session, trade_statuses, user_id, self.symbol, watch)
+            return self.DONE
+
+        # 스트림 사용 시 REST 조회는 WS_SAFETY_POLL_SEC마다 안전 확인용으로만(재연결 직후엔 바로)
+        if watch is None or watch.take_resync() or time.monotonic() >= self.next_rest_check:
+            self.next_rest_check = time.monotonic() + WS_SAFETY_POLL_SEC
+            if poll_position_exit(self.session, trade_statuses, user_id, self.symbol, watch):
+                return self.DONE
+        return 2 if watch is None else max(0.0, self.next_rest_check - time.monotonic())
+
+    def fail(self, e):
+        # asyncio 엔진은 예외를 잡은 쓰레드와 다른 쓰레드에서 호출하므로 exc_info 를 직접 넘김
+        logging.error("[trade_worker 전체 에러] %s", e, exc_info=e)
+        if self.user_id in self.trade_statuses:
+            set_running(self.trade_statuses, self.user_id, self.trade_statuses[self.user_id]['running'], error=str(e))
+
+    def cleanup(self):
+        """
+        마감/티켓/구독 해제, 남아있는 포지션/주문 강제종료(꼬임 방지), 종료 기록
+        """
+        trade_statuses, user_id = self.trade_statuses, self.user_id
+        for job in self.jobs:
+            job.cancel()
+        if self.ticket is not None and not self.ticket.done:
+            self.ticket.cancel()
+        if self.watch_token is not None:
+            private_streams.unwatch(self.watch_token)
+        if self.feed_symbol is not None:
+            market_data.release(self.feed_symbol)
+        _wake_events.pop(user_id, None)
+        try:
+            if user_id in trade_statuses:
+                if trade_statuses[user_id]['running']:
+                    force_exit_position(user_id, self.symbol, self.position_type, self.api_key, self.api_secret,
+                                        trade_statuses)
+                set_running(trade_statuses, user_id, False)
+                journal.append(user_id, "finished", error=trade_statuses[user_id].get('error'))
+        finally:
+            if self.session is not None:
+                session_pool.release(self.session)
 
 # === 실제 매매 쓰레드 ===
 def trade_worker(
@@ -231,173 +1085,28 @@ def trade_worker(
     api_key, api_secret,
     position_type, symbol, fixed_loss, entry_time, exit_time,
     take_profit=None, stop_loss=None,
-    immediate=False
+    immediate=False, recovered=None
 ):
     """
     사용자별 trade_statuses[user_id]에만 상태 기록/조회
+    - recovered: 재시작 복구 시 저널/거래소 대조 결과(진입 완료면 감시 루프부터 재개)
+    - 단계 처리는 TradeRun, 이 쓰레드는 마감/이벤트까지 잠들기만
     """
-    session = HTTP(testnet=False, api_key=api_key, api_secret=api_secret)
-    kst = pytz.timezone("Asia/Seoul")
+    wake = threading.Event()
+    run = TradeRun(user_id, trade_statuses, api_key, api_secret, position_type, symbol, fixed_loss, entry_time,
+                   exit_time, take_profit, stop_loss, immediate, recovered)
     try:
-        # 유저별 상태 딕셔너리 생성/초기화
-        trade_statuses[user_id] = {
-            "running": True,
-            "info": {
-                "position_type": position_type,
-                "symbol": symbol,
-                "fixed_loss": fixed_loss,
-                "entry_time": entry_time,
-                "exit_time": exit_time,
-                "take_profit": take_profit,
-                "stop_loss": stop_loss,
-                "entry_price": None,
-                "exit_price": None,
-                "entry_order": None,
-                "tp_order": None,
-                "sl_order": None,
-                "tp_order_id": None,
-                "sl_order_id": None,
-                "tp_price": None,
-                "sl_price": None,
-                "stop_loss_msg": None,
-                "exit_at": None,
-                "immediate": immediate
-            },
-            "error": None
-        }
-
-        entry_fired = False
-        entry_dt_kst = kst.localize(datetime.strptime(entry_time, "%Y-%m-%d %H:%M"))
-        exit_dt_kst = kst.localize(datetime.strptime(exit_time, "%Y-%m-%d %H:%M"))
-        entry_dt_utc = entry_dt_kst.astimezone(pytz.utc)
-        exit_dt_utc = exit_dt_kst.astimezone(pytz.utc)
-
-        while not entry_fired:
-            if not trade_statuses[user_id]["running"]:
-                break
-
-            now_utc = datetime.utcnow().replace(tzinfo=pytz.utc)
-
-            if immediate or now_utc >= entry_dt_utc:
-                side = "Buy" if position_type == "long" else "Sell"
-                executed_price = get_price(session, symbol)
-                tick_size = get_tick_size(session, symbol)
-                interval = "30"
-                tp_ratio = 0.02
-
-                if position_type == "long":
-                    lows = get_recent_lows(session, symbol, interval=interval)
-                    sl_price, scenario_msg, stop_pct = get_long_stop_loss(
-                        lows=lows,
-                        entry_price=executed_price,
-                        tick_size=tick_size,
-                        tick_offset=5,
-                        fallback_pct=0.01,
-                        take_profit_ratio=tp_ratio
-                    )
-                else:
-                    highs = get_recent_highs(session, symbol, interval=interval)
-                    sl_price, scenario_msg, stop_pct = get_short_stop_loss(
-                        highs=highs,
-                        entry_price=executed_price,
-                        tick_size=tick_size,
-                        tick_offset=5,
-                        fallback_pct=0.01,
-                        take_profit_ratio=tp_ratio
-                    )
-
-                loss_amount = float(fixed_loss)
-                raw_qty = loss_amount / abs(executed_price - sl_price)
-                qty = adjust_qty_by_lot_size(session, symbol, raw_qty)
-
-                entry_order = open_position(session, symbol, side, qty)
-                trade_statuses[user_id]['info']['entry_order'] = entry_order
-                trade_statuses[user_id]['info']['entry_at'] = datetime.now(kst).strftime("%Y-%m-%d %H:%M:%S")
-                trade_statuses[user_id]['info']['entry_price'] = executed_price
-
-                if take_profit not in [None, ""]:
-                    tp_price = float(take_profit)
-                else:
-                    tp_price = round(executed_price * (1 + tp_ratio), 8) if position_type == "long" else round(executed_price * (1 - tp_ratio), 8)
-
-                tp_result, tp_order_id = place_tp_limit_order(session, symbol, side, qty, tp_price)
-                sl_result, sl_order_id = place_stop_loss(session, symbol, side, sl_price)
-                trade_statuses[user_id]['info']['tp_order'] = tp_result
-                trade_statuses[user_id]['info']['sl_order'] = sl_result
-                trade_statuses[user_id]['info']['tp_order_id'] = tp_order_id
-                trade_statuses[user_id]['info']['sl_order_id'] = sl_order_id
-                trade_statuses[user_id]['info']['tp_price'] = tp_price
-                trade_statuses[user_id]['info']['sl_price'] = sl_price
-
-                entry_fired = True
-                break
-
-            time.sleep(1)
-
-        close_fired = False
-        position_closed = False
-
+        run.setup(wake)
         while True:
-            # 1) 매매 중단 요청(강제종료) 시 모든 포지션/주문 일괄 종료
-            if not trade_statuses[user_id]['running']:
-                force_exit_position(user_id, symbol, position_type, api_key, api_secret, trade_statuses)
-
-                # side = "Buy" if position_type == "long" else "Sell"
-                # qty = get_position_size(session, symbol)
-                # if qty > 0:
-                #     close_order = close_position(session, symbol, side, qty)
-                #     trade_statuses[user_id]['info']['exit_order'] = close_order
-                #     trade_statuses[user_id]['info']['exit_price'] = get_price(session, symbol)
-                #     trade_statuses[user_id]['info']['exit_at'] = now_kst.strftime("%Y-%m-%d %H:%M:%S")
-                # # TP/SL 예약주문 취소도 반드시
-                # tp_order_id = trade_statuses[user_id]['info'].get('tp_order_id')
-                # sl_order_id = trade_statuses[user_id]['info'].get('sl_order_id')
-                # cancel_order(session, symbol, tp_order_id)
-                # cancel_order(session, symbol, sl_order_id)
-                # close_fired = True
+            wake.clear()
+            timeout = run.step()
+            if timeout is TradeRun.DONE:
                 break
-            
-            now_utc = datetime.utcnow().replace(tzinfo=pytz.utc)
-            now_kst = now_utc.astimezone(kst)
-
-            # 2) 지정 종료시간 도달 시 자동 종료
-            if now_utc >= exit_dt_utc and not close_fired:
-                force_exit_position(user_id, symbol, position_type, api_key, api_secret, trade_statuses)
-
-                # side = "Buy" if position_type == "long" else "Sell"
-                # qty = get_position_size(session, symbol)
-                # if qty > 0:
-                #     close_order = close_position(session, symbol, side, qty)
-                #     trade_statuses[user_id]['info']['exit_order'] = close_order
-                #     trade_statuses[user_id]['info']['exit_price'] = get_price(session, symbol)
-                #     trade_statuses[user_id]['info']['exit_at'] = now_kst.strftime("%Y-%m-%d %H:%M:%S")
-                # # TP/SL 예약주문 취소도 반드시
-                # tp_order_id = trade_statuses[user_id]['info'].get('tp_order_id')
-                # sl_order_id = trade_statuses[user_id]['info'].get('sl_order_id')
-                # cancel_order(session, symbol, tp_order_id)
-                # cancel_order(session, symbol, sl_order_id)
-                # close_fired = True
-                break
-
-            # 3) 포지션이 사라지면(청산됨) 기록 후 종료
-            pos_size = get_position_size(session, symbol)
-            if pos_size == 0 and not position_closed:
-                exit_price = get_price(session, symbol)
-                trade_statuses[user_id]['info']['exit_price'] = exit_price
-                trade_statuses[user_id]['info']['exit_at'] = now_kst.strftime("%Y-%m-%d %H:%M:%S")
-                position_closed = True
-                break
-
-            time.sleep(2)
-
+            wake.wait(timeout)
     except Exception as e:
-        logging.exception(f"[trade_worker 전체 에러] {e}")
-        trade_statuses[user_id]['error'] = str(e)
+        run.fail(e)
     finally:
-        # 남아있는 포지션/주문 강제종료(꼬임 방지)
-        if trade_statuses[user_id]['running']:
-            force_exit_position(user_id, symbol, position_type, api_key, api_secret, trade_statuses)
-        trade_statuses[user_id]['running'] = False
+        run.cleanup()
 
 # === 스레드 실행 함수: user_id, trade_statuses 필수 ===
 def start_trade_thread(**kwargs):
@@ -405,6 +1114,14 @@ def start_trade_thread(**kwargs):
     trade_statuses = kwargs.get("trade_statuses")
     if user_id in trade_statuses and trade_statuses[user_id].get("running"):
         return False, "이미 매매 중입니다."
+    # 진입 전에 종목정보 전체 적재/주기적 갱신 시작(이미 동작 중이면 무시)
+    instrument_cache.start()
+    clock_sync.start()
+    if TRADE_ENGINE == "async":
+        # 순환 import 방지: asyncio 엔진은 trade_worker 함수들을 사용
+        from async_engine import engine
+        engine.submit(**kwargs)
+        return True, "매매 시작됨"
     th = threading.Thread(target=trade_worker, kwargs=kwargs)
     th.daemon = True
     th.start()